@@ -5,6 +5,7 @@ from ipr_sensor_command import IprSensorCommand
 from ipr_sensor_serial import IprSensorSerial
 from ipr_sensor_logging import IprSensorSerialLoggerThread
 from ipr_sensor_database import IprSensorDatabase
+from ipr_sensor_acquisition import IprSensorReaderThread, IprSensorSubscriber
 
 ipr_serial = IprSensorSerial()
 if not ipr_serial.user_connect_to_port():
@@ -15,11 +16,16 @@ ipr_cmd = IprSensorCommand(ipr_serial)
 # Create queue for thread communication
 data_queue = queue.Queue(maxsize=1000)
 
+# Create and start the serial reader thread, it feeds both the logger and the publisher
+reader = IprSensorReaderThread(serial_port=ipr_serial)
+reader.start()
+
 # Create and start logger thread
 logger = IprSensorSerialLoggerThread(
     serial_port=ipr_serial,
     data_queue=data_queue,
-    debug=True  # Set to False to disable console output
+    debug=True,  # Set to False to disable console output
+    subscriber=reader.subscribe("logger", IprSensorSubscriber.RAW)
 )
 logger.stop_logging()
 logger.start()
@@ -31,9 +37,22 @@ publisher = IprSensorDatabase(
     broker='dh1.iprnet.ca',
     port=8883,
     sensor_id=2,
-    serial_obj=ipr_serial
+    serial_obj=ipr_serial,
+    subscriber=reader.subscribe("publisher", IprSensorSubscriber.TELEGRAM)
 )
 
+
+def is_publishing():
+    """Check if the publisher is sending data"""
+    return publisher.is_running() and not publisher.is_paused()
+
+
+def stop_acquisition():
+    """Stop logging and release the serial port before a sensor command"""
+    if logger.is_logging():
+        logger.stop_logging()
+    reader.stop_reading()
+
 def main():
     # Main loop - process commands
     while True:
@@ -56,60 +75,57 @@ def main():
             print("[stop_recording]: Stop the sensor's recording")
             print("---- Database Related ----")
             print("[init_db_connect]: Connect to the database")
-            print("[start_recording_no_log]: Start recording sensor data to database without logging")
-            print("[stop_recording_no_log]: Stop the sensor's recording to database")
+            print("[start_recording_no_log]: Start sending sensor data to the database (can run with start_recording)")
+            print("[stop_recording_no_log]: Stop sending sensor data to the database")
 
         elif user_cmd == "":
             pass
 
         elif user_cmd == "init":
-            if logger.is_logging():
-                logger.stop_logging()
+            stop_acquisition()
             print(ipr_cmd.set_initialize())
             print(ipr_cmd.get_name())
 
         elif user_cmd == "get_name":
-            if logger.is_logging():
-                logger.stop_logging()
+            stop_acquisition()
             print(ipr_cmd.get_name())
 
         elif user_cmd == "set_name":
-            if logger.is_logging():
-                logger.stop_logging()
+            stop_acquisition()
             print(ipr_cmd.set_name())
 
         elif user_cmd == "get_time":
-            if logger.is_logging():
-                logger.stop_logging()
+            stop_acquisition()
             print(ipr_cmd.get_time())
 
         elif user_cmd == "set_time":
-            if logger.is_logging():
-                logger.stop_logging()
+            stop_acquisition()
             ipr_cmd.set_time_interactive()
 
         elif user_cmd == "set_tare":
-            if logger.is_logging():
-                logger.stop_logging()
+            stop_acquisition()
             ipr_cmd.set_tare()
 
         elif user_cmd == "start_recording":
-            ipr_cmd.start_sensor_transmit()
+            if not reader.is_reading():
+                ipr_cmd.start_sensor_transmit()
+                reader.start_reading()
             logger.start_logging()
             time.sleep(0.01)
 
         elif user_cmd == "stop_recording":
             if logger.is_logging():
                 logger.stop_logging()
-            ipr_cmd.stop_sensor_transmit()
+            if not is_publishing():
+                reader.stop_reading()
+                ipr_cmd.stop_sensor_transmit()
 
         # Functions related to remote database
         elif user_cmd == "init_db_connect":
-            if logger.is_logging():
-                logger.stop_logging()
-
             if not publisher.is_running():
-                ipr_cmd.start_sensor_transmit()
+                if not reader.is_reading():
+                    ipr_cmd.start_sensor_transmit()
+                    reader.start_reading()
                 # Start publishing
                 publisher.start()
                 publisher.pause()
@@ -118,6 +134,9 @@ def main():
 
         elif user_cmd == "start_recording_no_log":
             if publisher.is_running() and publisher.is_paused():
+                if not reader.is_reading():
+                    ipr_cmd.start_sensor_transmit()
+                    reader.start_reading()
                 publisher.resume()
 
             time.sleep(0.01)
@@ -125,6 +144,9 @@ def main():
         elif user_cmd == "stop_recording_no_log":
             if publisher.is_running():
                 publisher.stop()
+            if not logger.is_logging():
+                reader.stop_reading()
+                ipr_cmd.stop_sensor_transmit()
 
             time.sleep(0.01)
 
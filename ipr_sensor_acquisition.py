@@ -0,0 +1,277 @@
+import queue
+import threading
+
+from pyipr_sensor_lib.ipr_loss_detector import IPRLossDetector
+from pyipr_sensor_lib.ipr_telegram_framer import IPRTelegramFramer
+
+SUBSCRIBER_QUEUE_SIZE = 1000    # Items waiting per subscriber (one item per serial chunk)
+READER_WAIT_TIMEOUT = 0.1       # Maximum sleep of the reader thread, bounds the stop/pause latency
+
+
+class IprSensorSubscriber:
+    """
+    Bounded queue receiving the data of an IprSensorReaderThread.
+
+    RAW subscribers receive the serial data as read (bytes), e.g. for the file
+    logger. TELEGRAM subscribers receive lists of unescaped telegrams (bytes),
+    framed once by the reader, e.g. for the MQTT publisher. When the queue is
+    full the new data is dropped and counted, the reader never waits.
+    """
+
+    RAW = "raw"
+    TELEGRAM = "telegram"
+
+    def __init__(self, name, kind=TELEGRAM, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        """
+        Initialize the subscriber.
+
+        Args:
+            name (str): Name used in the status reports
+            kind (str): RAW or TELEGRAM
+            maxsize (int): Maximum number of items waiting in the queue
+        """
+        self.name = name
+        self.kind = kind
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._enabled = threading.Event()
+        self._enabled.set()
+
+        # Statistics, in bytes for RAW subscribers and telegrams for TELEGRAM subscribers
+        self.delivered_count = 0
+        self.dropped_count = 0
+        self.max_queue_depth = 0
+
+    def enable(self):
+        """Start receiving data"""
+        self._enabled.set()
+
+    def disable(self):
+        """Stop receiving data, the data already queued is kept"""
+        self._enabled.clear()
+
+    def is_enabled(self):
+        """Check if the subscriber receives data"""
+        return self._enabled.is_set()
+
+    def deliver(self, item, count):
+        """
+        Queue an item without waiting (called by the reader thread).
+
+        Args:
+            item: Raw bytes or list of telegrams
+            count (int): Number of bytes or telegrams in the item
+
+        Returns:
+            bool: True if queued, False if dropped because the queue is full
+        """
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped_count += count
+            return False
+        self.delivered_count += count
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return True
+
+    def get(self, timeout=None):
+        """
+        Get the next item.
+
+        Args:
+            timeout (float): Maximum time to wait in seconds (default: wait forever)
+
+        Returns:
+            Raw bytes or list of telegrams, or None on timeout
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        """
+        Get all the queued items without waiting.
+
+        Returns:
+            list: Queued items, oldest first
+        """
+        _items = list()
+        while True:
+            try:
+                _items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return _items
+
+    def get_status(self):
+        """
+        Get the subscriber statistics.
+
+        Returns:
+            dict: Name, kind, queue depth, delivered and dropped counts
+        """
+        return {
+            'name': self.name,
+            'kind': self.kind,
+            'enabled': self.is_enabled(),
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'delivered': self.delivered_count,
+            'dropped': self.dropped_count,
+        }
+
+
+class IprSensorReaderThread(threading.Thread):
+    """
+    Single thread reading the serial port and fanning the data out to subscribers.
+
+    The serial data is read once, in chunks, and framed once. Each subscriber
+    (file logger, MQTT publisher, live consumers...) gets its own copy through
+    its own bounded queue, so recording and publishing run at the same time.
+    Reading is paused with stop_reading() while commands use the serial port.
+    """
+
+    def __init__(self, serial_port, debug=False):
+        """
+        Initialize the reader thread.
+
+        Args:
+            serial_port: Your serial port object (IprSensorSerial)
+            debug (bool): Print status to console if True
+        """
+        super().__init__(daemon=True)
+        self.serial_port = serial_port
+        self.debug = debug
+
+        self._subscribers = list()
+        self._subscribers_lock = threading.Lock()
+        self._framer = IPRTelegramFramer()
+        self.loss_detector = IPRLossDetector()  # Telegrams lost by the radio link, from the sequence field
+
+        # Control flags
+        self._stop_event = threading.Event()
+        self._reading_enabled = threading.Event()  # Start with reading disabled
+        self._idle = threading.Event()  # Set while the thread does not use the serial port
+        self._idle.set()
+
+    def subscribe(self, name, kind=IprSensorSubscriber.TELEGRAM, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        """
+        Create a new subscriber.
+
+        Args:
+            name (str): Name used in the status reports
+            kind (str): IprSensorSubscriber.RAW or IprSensorSubscriber.TELEGRAM
+            maxsize (int): Maximum number of items waiting in its queue
+
+        Returns:
+            IprSensorSubscriber: The subscriber, enabled
+        """
+        _subscriber = IprSensorSubscriber(name, kind, maxsize)
+        self.add_subscriber(_subscriber)
+        return _subscriber
+
+    def add_subscriber(self, subscriber):
+        """Start delivering data to an existing subscriber"""
+        with self._subscribers_lock:
+            self._subscribers = self._subscribers + [subscriber]
+
+    def remove_subscriber(self, subscriber):
+        """Stop delivering data to a subscriber"""
+        with self._subscribers_lock:
+            self._subscribers = [_sub for _sub in self._subscribers if _sub is not subscriber]
+
+    def run(self):
+        """Main thread loop - this runs continuously"""
+        while not self._stop_event.is_set():
+            self._idle.clear()
+            if not self._reading_enabled.is_set():
+                self._idle.set()
+                self._reading_enabled.wait(READER_WAIT_TIMEOUT)  # Wait while paused
+                continue
+
+            try:
+                if self.serial_port.wait_for_data(READER_WAIT_TIMEOUT) and self.serial_port.read_chunk():
+                    self._dispatch()
+            except Exception as e:
+                print(f"Error reading serial: {e}")
+                self._stop_event.wait(0.1)
+
+        self._idle.set()
+
+    def _dispatch(self):
+        """Frame the received chunk and deliver it to the enabled subscribers"""
+        _subscribers = [_sub for _sub in self._subscribers if _sub.is_enabled()]
+        rx_buffer = self.serial_port.rx_buffer
+        _views = rx_buffer.get_read_views()
+
+        _telegrams = list()
+        for _view in _views:
+            _telegrams.extend(self._framer.feed(_view))
+        _lost = self.loss_detector.update_telegrams(_telegrams)
+        if _lost and self.debug:
+            print(f"✗ {_lost} telegrams lost")
+
+        if any(_sub.kind == IprSensorSubscriber.RAW for _sub in _subscribers):
+            _raw = b''.join(_views)  # Copy, the ring buffer is reused
+            for _sub in _subscribers:
+                if _sub.kind == IprSensorSubscriber.RAW:
+                    _sub.deliver(_raw, len(_raw))
+
+        rx_buffer.consume(sum(len(_view) for _view in _views))
+
+        if _telegrams:
+            for _sub in _subscribers:
+                if _sub.kind == IprSensorSubscriber.TELEGRAM:
+                    _sub.deliver(_telegrams, len(_telegrams))
+
+    # Control methods
+    def start_reading(self):
+        """Start reading the serial port"""
+        self.loss_detector.reset_continuity()  # The time gap of the pause is not a loss
+        self._reading_enabled.set()
+        if self.debug:
+            print("Serial reader enabled")
+
+    def stop_reading(self, timeout=1.0):
+        """
+        Stop reading the serial port (thread keeps running).
+
+        Returns once the thread released the port, so commands can use it.
+
+        Args:
+            timeout (float): Maximum time to wait for the thread
+
+        Returns:
+            bool: True if the port is released
+        """
+        self._reading_enabled.clear()
+        _released = self._idle.wait(timeout) if self.is_alive() else True
+        self._framer.reset()
+        self.loss_detector.reset_continuity()
+        if self.debug:
+            print("Serial reader disabled")
+        return _released
+
+    def shutdown(self):
+        """Stop the thread completely"""
+        self._stop_event.set()
+        self._reading_enabled.set()  # Wake the thread if paused
+
+    def is_reading(self):
+        """Check if currently reading"""
+        return self._reading_enabled.is_set()
+
+    def get_status(self):
+        """
+        Get the reader and subscribers status.
+
+        Returns:
+            dict: Reader state and list of subscriber statistics
+        """
+        return {
+            'reading': self.is_reading(),
+            'telegrams': self._framer.telegram_count,
+            'discarded_bytes': self._framer.discarded_bytes,
+            'lost_telegrams': self.loss_detector.get_loss_count(),
+            'losses': self.loss_detector.get_summary(),
+            'subscribers': [_sub.get_status() for _sub in self._subscribers],
+        }
@@ -81,7 +81,8 @@ class IprSensorCommand:
                 if len(window) == 3 and window[0] == b'\r' and window[1] == b'\n' and window[2] == b'>':
                     break
             else:
-                time.sleep(0.01)  # Small delay if no data to prevent CPU spinning
+                # Sleep until the next bytes arrive
+                self.ipr_serial_port.wait_for_data(max(0.0, timeout - (time.time() - start_time)))
         else:
             # Timeout occurred
             print(f"⚠ Warning: Timeout waiting for sensor response")
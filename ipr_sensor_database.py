@@ -2,16 +2,196 @@
 import paho.mqtt.client as mqtt
 from paho.mqtt.enums import CallbackAPIVersion
 import struct
-import zlib
 import time
 import math
+import os
+import queue
 import random
 import threading
 import ssl
-
+from collections import deque
+
+from pyipr_sensor_lib.ipr_adaptive_controller import IPRAdaptiveController
+from pyipr_sensor_lib.ipr_batch_builder import IPRHighFreqBatch
+from pyipr_sensor_lib.ipr_disk_spool import IPRDiskSpool, MAX_SPOOL_SIZE
+from pyipr_sensor_lib.ipr_payload_codec import (IPRPayloadCodec, LAYOUT_ENV, LAYOUT_HIGH_FREQ, LAYOUT_RAW_TELEGRAMS,
+                                                LEVEL_RANGES)
+from pyipr_sensor_lib.ipr_raw_batch import IPRRawTelegramBatch
 from pyipr_sensor_lib.ipr_sensor_decoder import IPRSensorDecoder
+from pyipr_sensor_lib.ipr_timebase import IPRTimebase
 from pyipr_sensor_lib.ipr_serial_interface import IPRSerialInterface
 
+PUBLISH_QUEUE_SIZE = 8       # Messages waiting for the publisher worker, beyond this new batches are dropped
+PUBLISH_STOP_TIMEOUT = 5.0   # Time given to the publisher worker to send the queued messages on stop
+PUBLISH_WAIT_TIMEOUT = 0.1   # Publisher worker wake-up period to check for stop
+READ_WAIT_TIMEOUT = 0.1      # Longest wait for telegrams, so pause/stop and batch deadlines are handled
+MAX_BATCH_LATENCY = 1.0      # Default time (s) between the first sample of a batch and its publication
+SPOOL_ROOT = "Spool_data"    # Messages waiting for the broker, one directory per sensor
+REPLAY_RATE = 64 * 1024      # Spooled bytes replayed per second, on top of the live data
+MQTT_RECONNECT_MAX_DELAY = 60  # Longest delay (s) between two connection attempts to the broker
+MAX_INFLIGHT = 16            # QoS 1 messages published and not acknowledged yet, beyond this they are spooled
+ACK_WAIT_TIMEOUT = 2.0       # Time given to the broker on stop to acknowledge the messages in flight
+ACK_TIMEOUT = 60.0           # Messages not acknowledged within this time (s) while connected are spooled again
+ACK_LATENCY_BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)  # Upper bounds of the histogram
+
+# Messages of the publisher worker queue
+MESSAGE_DATA = "data"
+MESSAGE_ENV = "env"
+MESSAGE_RAW = "raw"
+MESSAGE_RESUME = "resume"  # Publishing resumed after a pause, the timebase restarts
+
+
+class IprSensorAckTracker:
+    """
+    QoS 1 messages in flight, by MQTT message id, and publish-to-acknowledge latency.
+
+    register() is called by the publisher worker after each publish and
+    acknowledge() by the paho network thread (on_publish), which may run
+    first: early acknowledgements are kept until the message is registered.
+
+    Expired messages (take_expired()) are spooled again while paho still
+    holds them and resends them after a reconnection, so the broker may get
+    them twice: like any QoS 1 message, the receivers must accept duplicates.
+    Their late acknowledgements are ignored, so they are not credited to the
+    next message reusing the same id.
+    """
+
+    def __init__(self, max_inflight=MAX_INFLIGHT):
+        """
+        Initialize the tracker.
+
+        Args:
+            max_inflight (int): Maximum number of messages in flight
+        """
+        self.max_inflight = max_inflight
+        self._lock = threading.Lock()
+        self._inflight = dict()  # Message id -> (topic, payload, publish time)
+        self._early_acks = dict()  # Message id -> acknowledge time, for the messages not registered yet
+        self._expired_mids = set()  # Ids of the expired messages, until acknowledged late or reused
+
+        # Statistics
+        self.acked_count = 0
+        self.resent_count = 0
+        self.late_ack_count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.histogram = [0] * (len(ACK_LATENCY_BUCKETS_MS) + 1)  # Last bucket: above the last bound
+
+    def _record_latency(self, latency):
+        """Account for the acknowledge latency of a message (s)"""
+        self.acked_count += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        _latency_ms = latency * 1e3
+        _bucket = 0
+        while _bucket < len(ACK_LATENCY_BUCKETS_MS) and _latency_ms > ACK_LATENCY_BUCKETS_MS[_bucket]:
+            _bucket += 1
+        self.histogram[_bucket] += 1
+
+    def has_room(self):
+        """Check if another message can be published"""
+        return len(self._inflight) < self.max_inflight
+
+    def get_inflight_count(self):
+        """Get the number of messages waiting for their acknowledgement"""
+        return len(self._inflight)
+
+    def register(self, mid, topic, payload, publish_time):
+        """
+        Track a published message.
+
+        Args:
+            mid (int): MQTT message id returned by publish()
+            topic (str): MQTT topic
+            payload (bytes): Encoded payload, kept until acknowledged
+            publish_time (float): time.monotonic() just before the publish
+        """
+        with self._lock:
+            self._expired_mids.discard(mid)  # Id reused by paho: its acknowledgements are for this message
+            _ack_time = self._early_acks.pop(mid, None)
+            if _ack_time is None or _ack_time < publish_time:
+                # Not acknowledged yet (an acknowledgement older than the publish is stale)
+                self._inflight[mid] = (topic, payload, publish_time)
+            else:
+                self._record_latency(_ack_time - publish_time)
+
+    def acknowledge(self, mid):
+        """
+        Account for the acknowledgement of a message.
+
+        Args:
+            mid (int): MQTT message id
+        """
+        _now = time.monotonic()
+        with self._lock:
+            _entry = self._inflight.pop(mid, None)
+            if _entry is None:
+                if mid in self._expired_mids:
+                    self._expired_mids.discard(mid)
+                    self.late_ack_count += 1
+                else:
+                    self._early_acks[mid] = _now
+            else:
+                self._record_latency(_now - _entry[2])
+
+    def rearm(self):
+        """Restart the latency of the messages in flight, resent by paho after a reconnection"""
+        _now = time.monotonic()
+        with self._lock:
+            self.resent_count += len(self._inflight)
+            self._inflight = {_mid: (_topic, _payload, _now)
+                              for _mid, (_topic, _payload, _time) in self._inflight.items()}
+            self._early_acks.clear()
+
+    def take_expired(self, timeout):
+        """
+        Stop tracking the messages waiting for their acknowledgement for too long.
+
+        Args:
+            timeout (float): Maximum time (s) since the publish (or the last reconnection)
+
+        Returns:
+            list: (topic, payload) of the expired messages, in publish order
+        """
+        _limit = time.monotonic() - timeout
+        with self._lock:
+            _expired = [_mid for _mid, (_topic, _payload, _time) in self._inflight.items() if _time < _limit]
+            self._expired_mids.update(_expired)
+            return [self._inflight.pop(_mid)[:2] for _mid in _expired]
+
+    def take_unacknowledged(self):
+        """
+        Stop tracking the messages in flight.
+
+        Returns:
+            list: (topic, payload) of the messages never acknowledged, in publish order
+        """
+        with self._lock:
+            _messages = [(_topic, _payload) for _topic, _payload, _time in self._inflight.values()]
+            self._inflight.clear()
+            self._early_acks.clear()
+            self._expired_mids.clear()
+        return _messages
+
+    def get_status(self):
+        """
+        Get the acknowledgement statistics.
+
+        Returns:
+            dict: Messages in flight and acknowledged, latency (ms) mean, max and histogram
+        """
+        _labels = [f"<={_bound}" for _bound in ACK_LATENCY_BUCKETS_MS] + [f">{ACK_LATENCY_BUCKETS_MS[-1]}"]
+        return {
+            'inflight': len(self._inflight),
+            'max_inflight': self.max_inflight,
+            'acked': self.acked_count,
+            'resent': self.resent_count,
+            'late_acks': self.late_ack_count,
+            'mean_latency_ms': self.latency_sum / self.acked_count * 1e3 if self.acked_count else None,
+            'max_latency_ms': self.latency_max * 1e3,
+            'latency_histogram_ms': dict(zip(_labels, self.histogram)),
+        }
+
 
 class IprSensorDatabase:
     """Threaded MQTT sensor data publisher with start/pause/stop control"""
@@ -20,7 +200,10 @@ class IprSensorDatabase:
                  # user='ipr_sensor_admin', password='iprsensor2025',
                  user='sensor_user', password='xPBXWR1HaI15y8FSXBn6PmJiIwUFiy40',
                  sensor_id=1, sample_rate=1000, env_sample_rate=1,
-                 serial_obj=0):
+                 serial_obj=0, subscriber=None, codec=None,
+                 batch_size=None, max_latency=MAX_BATCH_LATENCY,
+                 spool_dir=None, spool_max_size=MAX_SPOOL_SIZE, replay_rate=REPLAY_RATE,
+                 max_inflight=MAX_INFLIGHT, ack_timeout=ACK_TIMEOUT, controller=None, raw_mode=False):
 
         # MQTT Configuration
         self.broker = broker
@@ -30,8 +213,15 @@ class IprSensorDatabase:
         self.sensor_id = sensor_id
         self.sample_rate = sample_rate
         self.env_sample_rate = env_sample_rate
+
+        # A batch is published when it holds batch_size samples or its first sample is max_latency seconds old
+        self.batch_size = batch_size or sample_rate
+        self.max_latency = max_latency
         # self.com_port = com_port
 
+        # Pass-through: the raw telegrams are published on sensor/<id>/raw and decoded by the server
+        self.raw_mode = raw_mode
+
         # Thread control
         self._thread = None
         self._stop_event = threading.Event()
@@ -45,8 +235,51 @@ class IprSensorDatabase:
         self.serial_obj = serial_obj
         self.ipr_obj = None
 
+        # TELEGRAM subscriber of an IprSensorReaderThread, replaces the direct serial reads if given
+        self.subscriber = subscriber
+        self._pending_telegrams = deque()
+
+        # Payload encoding (pre-filters + compression), identified by a header in every message
+        self.codec = codec if codec is not None else IPRPayloadCodec()
+
+        # Publisher worker: encodes and publishes the completed batches, so the acquisition never waits for it
+        self._publish_thread = None
+        self._publish_stop_event = threading.Event()
+        self._publish_queue = queue.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+        self._free_batches = queue.SimpleQueue()  # Batches already published, recycled by the acquisition
+
+        # Store-and-forward: messages are spooled to disk while the broker is unreachable, then replayed
+        self.spool_dir = spool_dir or os.path.join(SPOOL_ROOT, f"sensor_{sensor_id}")
+        self.spool_max_size = spool_max_size
+        self.replay_rate = replay_rate
+        self.spool = None
+        self._replay_budget = 0.0
+        self._replay_time = None
+
+        # QoS 1 acknowledgements: bounded window of messages in flight
+        self.max_inflight = max_inflight
+        self.ack_timeout = ack_timeout
+        self.ack_tracker = IprSensorAckTracker(max_inflight)
+        self._was_connected = False
+
+        # Optional IPRAdaptiveController (True: default bounds), adjusts batch_size, max_latency,
+        # the codec level and the decimation
+        self.controller = IPRAdaptiveController() if controller is True else controller
+        self.decimation = 1  # Only one strain sample out of decimation is published
+        self._adapt_reference = None  # (time, worker CPU time, acked count, latency sum) of the last adjustment
+        if self.controller is not None:
+            # Start from the batch settings and codec level given here, within the levels of the backend
+            self.controller.seed(min(self.max_latency, self.batch_size / self.sample_rate), self.codec.level,
+                                 LEVEL_RANGES[self.codec.backend])
+
+        # Device to host clock mapping, one anchor per received chunk of telegrams
+        self.timebase = IPRTimebase()
+        self._chunk_host_ns = None
+        self._is_chunk_end = False
+
         # Statistics
         self.sample_count = 0
+        self._reset_metrics()
         self.is_connected = False
         self._last_error = None
 
@@ -73,17 +306,26 @@ class IprSensorDatabase:
         """Callback for when the client connects to the broker"""
         if reason_code == 0:
             print(f"✓ Connected successfully to {self.broker}:{self.port}")
+            if self._was_connected:
+                self.ack_tracker.rearm()  # paho resends the messages not acknowledged before the disconnection
+            self._was_connected = True
             self.is_connected = True
         else:
             print(f"✗ Failed to connect: {reason_code}")
             self.is_connected = False
 
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        """Callback for when the client loses the broker, paho reconnects in the background"""
+        if self.is_connected:
+            print(f"✗ Disconnected from {self.broker}:{self.port} ({reason_code}), spooling data to disk")
+        self.is_connected = False
+
     def _on_publish(self, client, userdata, mid, reason_code, properties):
-        """Callback for when a message is published"""
-        pass
+        """Callback for when the broker acknowledges a message (QoS 1)"""
+        self.ack_tracker.acknowledge(mid)
 
     def _setup_mqtt(self):
-        """Initialize MQTT client"""
+        """Initialize MQTT client, the connection is retried in the background until the broker is reachable"""
         try:
             self.client = mqtt.Client(callback_api_version=CallbackAPIVersion.VERSION2)
             self.client.username_pw_set(self.user, self.password)
@@ -93,9 +335,12 @@ class IprSensorDatabase:
             self.client.tls_insecure_set(True)
 
             self.client.on_connect = self._on_connect
+            self.client.on_disconnect = self._on_disconnect
             self.client.on_publish = self._on_publish
+            self.client.reconnect_delay_set(min_delay=1, max_delay=MQTT_RECONNECT_MAX_DELAY)
+            self.client.max_inflight_messages_set(self.max_inflight)
 
-            self.client.connect(self.broker, self.port, 60)
+            self.client.connect_async(self.broker, self.port, 60)
             self.client.loop_start()
             time.sleep(1)
             return True
@@ -104,25 +349,29 @@ class IprSensorDatabase:
             self._last_error = str(e)
             return False
 
-    def _generate_strain_data(self):
-        """Get strain sensor data"""
-        return {
-            'strain_x': self.ipr_obj.get_strain_xyz(0),
-            'strain_y': self.ipr_obj.get_strain_xyz(1),
-            'strain_z': self.ipr_obj.get_strain_xyz(2),
-            'strain_p1': 0,
-            'strain_p2': 0,
-            'strain_pdeg': random.uniform(-180, 180)
-        }
+    def _add_high_freq_sample(self, batch):
+        """
+        Write the current strain packet and the simulated acceleration into the batch.
 
-    def _generate_accel_data(self):
-        """Simulate accelerometer data"""
+        Args:
+            batch (IPRHighFreqBatch): Batch being built
+        """
         t = time.time()
-        return {
-            'accel_x': 0.2 * math.sin(2 * math.pi * 5 * t) + 0.02 * random.gauss(0, 1),
-            'accel_y': 0.2 * math.cos(2 * math.pi * 5 * t) + 0.02 * random.gauss(0, 1),
-            'accel_z': 9.81 + 0.05 * random.gauss(0, 1)
-        }
+        ipr_obj = self.ipr_obj
+        batch.add(
+            ipr_obj.get_strain_xyz(0),
+            ipr_obj.get_strain_xyz(1),
+            ipr_obj.get_strain_xyz(2),
+            0,
+            0,
+            random.uniform(-180, 180),
+            # Simulated accelerometer data
+            0.2 * math.sin(2 * math.pi * 5 * t) + 0.02 * random.gauss(0, 1),
+            0.2 * math.cos(2 * math.pi * 5 * t) + 0.02 * random.gauss(0, 1),
+            9.81 + 0.05 * random.gauss(0, 1),
+            ipr_obj.get_timestamp(),
+            self._chunk_host_ns if self._is_chunk_end else None
+        )
 
     def _generate_env_data(self):
         """Get environmental sensor data"""
@@ -133,18 +382,6 @@ class IprSensorDatabase:
             'pressure': self.ipr_obj.get_environment(1)
         }
 
-    def _pack_high_freq_data(self, strain_x, strain_y, strain_z, strain_p1,
-                             strain_p2, strain_pdeg, accel_x, accel_y,
-                             accel_z, timestamp_ns):
-        """Pack high-frequency data (1000 Hz): 9 floats + timestamp"""
-        return struct.pack(
-            '<9fQ',
-            strain_x, strain_y, strain_z,
-            strain_p1, strain_p2, strain_pdeg,
-            accel_x, accel_y, accel_z,
-            timestamp_ns
-        )
-
     def _pack_env_data(self, v_batt, temperature, humidity, pressure,
                        timestamp_ns, sensor_id):
         """Pack environmental data (1 Hz): 4 floats + timestamp + sensor_id"""
@@ -155,10 +392,374 @@ class IprSensorDatabase:
             sensor_id
         )
 
+    def _read_telegram(self, timeout=READ_WAIT_TIMEOUT):
+        """
+        Get the next telegram, from the subscriber if any, else from the serial port.
+
+        Args:
+            timeout (float): Longest wait for the subscriber data (the serial port reads block until a telegram)
+
+        Returns:
+            bytes: Unescaped telegram, or None if the subscriber got nothing within the timeout
+        """
+        if self.subscriber is None:
+            telegram = self.serial_obj.serial_ipr_read_telegram_bytes()
+            self._chunk_host_ns = time.time_ns()
+            self._is_chunk_end = True
+            return telegram
+
+        if not self._pending_telegrams:
+            telegrams = self.subscriber.get(timeout=timeout)
+            if not telegrams:
+                return None
+            self._chunk_host_ns = time.time_ns()  # Reception time of the whole chunk
+            self._pending_telegrams.extend(telegrams)
+        telegram = self._pending_telegrams.popleft()
+        self._is_chunk_end = not self._pending_telegrams
+        return telegram
+
+    def _read_raw_telegrams(self, batch, timeout=READ_WAIT_TIMEOUT):
+        """
+        Append the next received telegrams to a raw batch, without decoding them.
+
+        Args:
+            batch (IPRRawTelegramBatch): Batch being built
+            timeout (float): Longest wait for the subscriber data (the serial port reads block until a telegram)
+
+        Returns:
+            int: Number of telegrams added
+        """
+        if self.subscriber is None:
+            telegrams = [self.serial_obj.serial_ipr_read_telegram_bytes()]
+        else:
+            telegrams = self.subscriber.get(timeout=timeout)
+            if not telegrams:
+                return 0
+        self._chunk_host_ns = time.time_ns()
+        batch.add_telegrams(telegrams, self._chunk_host_ns)
+        return len(telegrams)
+
+    def _get_batch_timestamps(self, device_timestamps, anchors):
+        """
+        Compute the host timestamps of a batch of samples from their device timestamps.
+
+        Args:
+            device_timestamps (array-like): Raw 27-bit device timestamps of the samples
+            anchors (list): (sample index, host reception time ns) of the last sample of each chunk
+
+        Returns:
+            numpy.ndarray: int64 host timestamps in ns
+        """
+        unwrapped = self.timebase.unwrap(device_timestamps)
+        for index, host_ns in anchors:
+            self.timebase.add_anchor(unwrapped[index], host_ns, refit=False)
+        self.timebase.fit()
+        return self.timebase.to_host_ns(unwrapped)
+
+    def _publish_high_freq_batch(self, batch):
+        """
+        Timestamp, encode and publish a batch of high-frequency samples.
+
+        Args:
+            batch (IPRHighFreqBatch): Samples to send
+
+        Returns:
+            tuple: (result of the MQTT publish or None if spooled, packed batch size, encoded batch size)
+        """
+        start = time.perf_counter()
+        batch.set_timestamps(self._get_batch_timestamps(batch.get_device_timestamps(), batch.anchors))
+        payload = batch.get_payload()
+        compressed = self.codec.encode(payload, LAYOUT_HIGH_FREQ)
+        self.last_encode_time = time.perf_counter() - start
+        result = self._send(f'sensor/{self.sensor_id}/data', compressed)
+        return result, len(payload), len(compressed)
+
+    def _publish_raw_batch(self, batch):
+        """
+        Encode and publish a batch of raw telegrams, decoded by the server.
+
+        Args:
+            batch (IPRRawTelegramBatch): Telegrams to send
+
+        Returns:
+            tuple: (result of the MQTT publish or None if spooled, packed batch size, encoded batch size)
+        """
+        start = time.perf_counter()
+        payload = batch.get_payload(self.sensor_id)
+        compressed = self.codec.encode(payload, LAYOUT_RAW_TELEGRAMS)
+        self.last_encode_time = time.perf_counter() - start
+        result = self._send(f'sensor/{self.sensor_id}/raw', compressed)
+        return result, len(payload), len(compressed)
+
+    def _reset_metrics(self):
+        """Reset the publisher worker statistics"""
+        self.published_batches = 0
+        self.dropped_messages = 0
+        self.max_queue_depth = 0
+        self.max_stall_time = 0.0     # Longest hand-off of a message by the acquisition (s)
+        self.last_encode_time = 0.0   # Timestamping and encoding of the last batch (s)
+        self.max_publish_time = 0.0   # Longest timestamp + encode + publish of a batch (s)
+
+    def _get_free_batch(self):
+        """Get an empty batch, recycled if one was already published"""
+        try:
+            return self._free_batches.get_nowait()
+        except queue.Empty:
+            return IPRRawTelegramBatch() if self.raw_mode else IPRHighFreqBatch(self.batch_size)
+
+    def _hand_off(self, message):
+        """
+        Queue a message for the publisher worker, without waiting.
+
+        Args:
+            message (tuple): (MESSAGE_DATA or MESSAGE_RAW, batch), (MESSAGE_ENV, packet, env_data)
+                             or (MESSAGE_RESUME,)
+
+        Returns:
+            bool: True if queued, False if the queue is full and the message was dropped
+        """
+        start = time.perf_counter()
+        try:
+            self._publish_queue.put_nowait(message)
+            queued = True
+        except queue.Full:
+            self.dropped_messages += 1
+            queued = False
+        self.max_stall_time = max(self.max_stall_time, time.perf_counter() - start)
+        self.max_queue_depth = max(self.max_queue_depth, self._publish_queue.qsize())
+        return queued
+
+    def _hand_off_batch(self, batch):
+        """
+        Queue a completed batch for the publisher worker.
+
+        Args:
+            batch (IPRHighFreqBatch or IPRRawTelegramBatch): Completed batch
+
+        Returns:
+            IPRHighFreqBatch or IPRRawTelegramBatch: Empty batch to fill next (the same one if the queue was full)
+        """
+        if not self._hand_off((MESSAGE_RAW if self.raw_mode else MESSAGE_DATA, batch)):
+            print(f"✗ Publisher queue full, {len(batch)} {'telegrams' if self.raw_mode else 'samples'} dropped")
+            batch.clear()
+            return batch
+        return self._get_free_batch()
+
+    def _publish_data(self, batch):
+        """Publish a batch of high-frequency samples and recycle it"""
+        try:
+            start = time.perf_counter()
+            result, batch_size, compressed_size = self._publish_high_freq_batch(batch)
+            self.max_publish_time = max(self.max_publish_time, time.perf_counter() - start)
+            self.published_batches += 1
+
+            if result is None:
+                print(f"[DATA] Spooled {len(batch)} samples | {compressed_size} bytes | "
+                      f"{self.spool.get_pending_size()} bytes waiting for the broker")
+            elif result.rc == mqtt.MQTT_ERR_SUCCESS:
+                compression_ratio = batch_size / compressed_size
+                # Per second of data
+                bandwidth_kbps = (compressed_size * 8) / 1024 * self.sample_rate / (len(batch) * self.decimation)
+                print(f"[DATA] Sent {len(batch)} samples | "
+                      f"{batch_size} → {compressed_size} bytes | "
+                      f"{compression_ratio:.1f}x compression | "
+                      f"{bandwidth_kbps:.1f} kbps")
+        finally:
+            batch.clear()
+            self._free_batches.put(batch)
+
+    def _publish_raw(self, batch):
+        """Publish a batch of raw telegrams and recycle it"""
+        try:
+            start = time.perf_counter()
+            result, batch_size, compressed_size = self._publish_raw_batch(batch)
+            self.max_publish_time = max(self.max_publish_time, time.perf_counter() - start)
+            self.published_batches += 1
+
+            if result is None:
+                print(f"[RAW] Spooled {len(batch)} telegrams | {compressed_size} bytes | "
+                      f"{self.spool.get_pending_size()} bytes waiting for the broker")
+            elif result.rc == mqtt.MQTT_ERR_SUCCESS:
+                print(f"[RAW] Sent {len(batch)} telegrams | "
+                      f"{batch_size} → {compressed_size} bytes | "
+                      f"{batch_size / compressed_size:.1f}x compression | "
+                      f"{compressed_size / len(batch):.1f} bytes/telegram")
+        finally:
+            batch.clear()
+            self._free_batches.put(batch)
+
+    def _publish_env(self, env_packet, env_data):
+        """Publish an environmental packet"""
+        compressed_env = self.codec.encode(env_packet, LAYOUT_ENV)
+        result = self._send(f'sensor/{self.sensor_id}/env', compressed_env)
+
+        if result is not None and result.rc == mqtt.MQTT_ERR_SUCCESS:
+            print(f"[ENV] Batt:{env_data['v_batt']:.2f}V "
+                  f"Temp:{env_data['temperature']:.1f}°C "
+                  f"Humidity:{env_data['humidity']:.1f}% "
+                  f"Pressure:{env_data['pressure']:.1f}hPa")
+
+    def _send(self, topic, payload):
+        """
+        Publish a message, or spool it to disk if the broker is unreachable or the in-flight window is full.
+
+        Args:
+            topic (str): MQTT topic
+            payload (bytes): Encoded payload
+
+        Returns:
+            MQTTMessageInfo: Result of the MQTT publish, or None if the message was spooled
+        """
+        if self.is_connected and self.ack_tracker.has_room():
+            publish_time = time.monotonic()
+            result = self.client.publish(topic, payload, qos=1)
+            if result.rc != mqtt.MQTT_ERR_QUEUE_SIZE:
+                # paho keeps a QoS 1 message until acknowledged, even if the connection was just lost
+                # (MQTT_ERR_NO_CONN): it is resent after the reconnection, so it must not be spooled too
+                self.ack_tracker.register(result.mid, topic, payload, publish_time)
+                return result
+        self.spool.append(topic, payload)
+        return None
+
+    def _requeue_expired(self):
+        """Spool again the messages never acknowledged while connected, so they free the in-flight window"""
+        if not self.is_connected:
+            return
+        expired = self.ack_tracker.take_expired(self.ack_timeout)
+        for topic, payload in expired:
+            self.spool.append(topic, payload)
+        if expired:
+            print(f"✗ {len(expired)} messages not acknowledged within {self.ack_timeout:g} s, spooled again")
+
+    def _apply_controller(self):
+        """Use the settings of the adaptive controller"""
+        controller = self.controller
+        self.decimation = controller.decimation
+        self.max_latency = controller.batch_duration
+        self.batch_size = max(1, int(round(self.sample_rate * controller.batch_duration / controller.decimation)))
+        self.codec.level = controller.level
+        print(f"[ADAPT] {controller.state}: batches of {controller.batch_duration:.2f} s | "
+              f"compression level {controller.level} | decimation {controller.decimation}")
+
+    def _adapt(self):
+        """Feed the adaptive controller with the uplink load of the last interval"""
+        if self.controller is None:
+            return
+        now = time.monotonic()
+        # CPU time of this worker thread, which compresses the data: saturated at 1 whatever the number of cores
+        reference = (now, time.thread_time(), self.ack_tracker.acked_count, self.ack_tracker.latency_sum)
+        if self._adapt_reference is None:
+            self._adapt_reference = reference
+            return
+        last_time, last_cpu_time, last_acked, last_latency_sum = self._adapt_reference
+        if now - last_time < self.controller.interval:
+            return
+        self._adapt_reference = reference
+
+        if not self.is_connected:
+            return  # Everything goes to the spool, nothing to measure
+        acked = reference[2] - last_acked
+        ack_latency_ms = (reference[3] - last_latency_sum) / acked * 1e3 if acked else None
+        cpu_usage = (reference[1] - last_cpu_time) / (now - last_time)
+        queue_fill = max(self._publish_queue.qsize() / PUBLISH_QUEUE_SIZE,
+                         self.ack_tracker.get_inflight_count() / self.max_inflight)
+        if self.controller.update(queue_fill, ack_latency_ms, cpu_usage):
+            self._apply_controller()
+
+    def _replay_spool(self):
+        """Publish spooled messages while connected, limited to replay_rate bytes per second"""
+        now = time.monotonic()
+        if self._replay_time is not None:
+            # At most one second of budget saved up, so a long idle time does not allow a burst
+            self._replay_budget = min(float(self.replay_rate),
+                                      self._replay_budget + (now - self._replay_time) * self.replay_rate)
+        self._replay_time = now
+
+        while self.is_connected and self._replay_budget > 0 and self.ack_tracker.has_room():
+            message = self.spool.peek()
+            if message is None:
+                break
+            topic, payload = message
+            publish_time = time.monotonic()
+            result = self.client.publish(topic, payload, qos=1)
+            if result.rc == mqtt.MQTT_ERR_QUEUE_SIZE:
+                break  # Dropped by paho, replayed on the next pass
+            # Held by paho until acknowledged, even without connection (MQTT_ERR_NO_CONN): never replayed again
+            self.ack_tracker.register(result.mid, topic, payload, publish_time)
+            self.spool.advance()
+            self._replay_budget -= len(payload)
+            if result.rc != mqtt.MQTT_ERR_SUCCESS:
+                break
+
+    def _publish_loop(self):
+        """Publisher worker loop, until stopped and the queue is empty"""
+        while True:
+            try:
+                self._requeue_expired()
+                self._replay_spool()
+                self._adapt()
+            except Exception as e:
+                print(f"✗ Error replaying spooled data: {e}")
+            try:
+                message = self._publish_queue.get(timeout=PUBLISH_WAIT_TIMEOUT)
+            except queue.Empty:
+                if self._publish_stop_event.is_set():
+                    break
+                continue
+            try:
+                if message[0] == MESSAGE_DATA:
+                    self._publish_data(message[1])
+                elif message[0] == MESSAGE_RAW:
+                    self._publish_raw(message[1])
+                elif message[0] == MESSAGE_RESUME:
+                    self.timebase.reset()
+                else:
+                    self._publish_env(message[1], message[2])
+            except Exception as e:
+                print(f"✗ Error publishing sensor data: {e}")
+
+    def _start_publish_worker(self):
+        """Start the publisher worker thread"""
+        self._publish_queue = queue.Queue(maxsize=PUBLISH_QUEUE_SIZE)
+        self._publish_stop_event.clear()
+        self.spool = IPRDiskSpool(self.spool_dir, max_size=self.spool_max_size)
+        if not self.spool.is_empty():
+            print(f"{self.spool.get_pending_size()} bytes of spooled data to replay")
+        self._replay_budget = 0.0
+        self._replay_time = None
+        self._adapt_reference = None
+        if self.controller is not None:
+            self._apply_controller()
+        self._publish_thread = threading.Thread(target=self._publish_loop, daemon=True)
+        self._publish_thread.start()
+
+    def _stop_publish_worker(self):
+        """Let the publisher worker send the queued messages, then stop it"""
+        if self._publish_thread is None:
+            return
+        self._publish_stop_event.set()
+        self._publish_thread.join(timeout=PUBLISH_STOP_TIMEOUT)
+        if self._publish_thread.is_alive():
+            print("Warning: Publisher worker did not stop within timeout")
+        else:
+            # Give the broker some time to acknowledge, then keep the rest on disk for the next start
+            deadline = time.monotonic() + ACK_WAIT_TIMEOUT
+            while self.is_connected and self.ack_tracker.get_inflight_count() and time.monotonic() < deadline:
+                time.sleep(PUBLISH_WAIT_TIMEOUT / 10)
+            unacknowledged = self.ack_tracker.take_unacknowledged()
+            for topic, payload in unacknowledged:
+                self.spool.append(topic, payload)
+            if unacknowledged:
+                print(f"{len(unacknowledged)} messages not acknowledged, kept in the spool")
+            self.spool.close()  # Whatever was not replayed stays on disk for the next start
+        self._publish_thread = None
+
     def _run(self):
         """Main thread loop"""
         # Initialize variables at the top to avoid UnboundLocalError
-        buffer_high_freq = []
+        buffer_high_freq = self._get_free_batch()  # Timestamped by the publisher worker
+        batch_deadline = None  # Publication time of the batch, set by its first sample
+        decimation_count = 0
         last_env_time = 0
 
         try:
@@ -178,46 +779,64 @@ class IprSensorDatabase:
                         pass
                 return
 
+            self._start_publish_worker()
+
             print(f"Sensor ID: {self.sensor_id}")
             print(f"High-frequency data: {self.sample_rate} Hz (strain + accel)")
             print(f"Environmental data: {self.env_sample_rate} Hz")
+            print(f"Batches: up to {self.batch_size} samples or {self.max_latency * 1000:.0f} ms")
+            if self.raw_mode:
+                print("Raw mode: telegrams published undecoded on "
+                      f"sensor/{self.sensor_id}/raw (environmental data included)")
             print("Thread started. Use pause()/resume()/stop() to control\n")
 
-            sample_interval = 1.0 / self.sample_rate
-
             while not self._stop_event.is_set():
                 # Check if paused
-                self._pause_event.wait()
-
-                # Check again if we should stop (in case stopped while paused)
-                if self._stop_event.is_set():
-                    break
-
-                start_time = time.time()
-                timestamp_ns = int(time.time_ns())
+                if not self._pause_event.is_set():
+                    # Send the samples received before the pause with the current timebase
+                    if buffer_high_freq:
+                        buffer_high_freq = self._hand_off_batch(buffer_high_freq)
+                        batch_deadline = None
+                    self._pause_event.wait()
+
+                    # Check again if we should stop (in case stopped while paused)
+                    if self._stop_event.is_set():
+                        break
+
+                    # The device counter may have rolled over any number of times during the pause
+                    self._pending_telegrams.clear()
+                    try:
+                        self._publish_queue.put((MESSAGE_RESUME,), timeout=PUBLISH_STOP_TIMEOUT)
+                    except queue.Full:
+                        print("✗ Publisher queue full, timebase not reset after the pause")
 
                 try:
-                    self.ipr_obj.analyse_packet(self.serial_obj.serial_ipr_read_telegram())
-
-                    if self.ipr_obj.ipr_decoder_is_packet_valid():
+                    # Wait for data at most until the batch is due
+                    timeout = READ_WAIT_TIMEOUT
+                    if batch_deadline is not None:
+                        timeout = min(timeout, max(0.0, batch_deadline - time.monotonic()))
+                    if self.raw_mode:
+                        # Pass-through: every telegram (strain, environment...) goes in the batch as received
+                        count = self._read_raw_telegrams(buffer_high_freq, timeout)
+                        if count and batch_deadline is None:
+                            batch_deadline = time.monotonic() + self.max_latency
+                        self.sample_count += count
+                        telegram = None
+                    else:
+                        telegram = self._read_telegram(timeout)
+
+                    if telegram is not None:
+                        self.ipr_obj.analyse_packet(telegram)
+
+                    if telegram is not None and self.ipr_obj.ipr_decoder_is_packet_valid():
                         if self.ipr_obj.get_packet_type() == self.ipr_obj.TYPE_STRAIN:
-                            strain_data = self._generate_strain_data()
-                            accel_data = self._generate_accel_data()
-
-                            packet = self._pack_high_freq_data(
-                                strain_data['strain_x'],
-                                strain_data['strain_y'],
-                                strain_data['strain_z'],
-                                strain_data['strain_p1'],
-                                strain_data['strain_p2'],
-                                strain_data['strain_pdeg'],
-                                accel_data['accel_x'],
-                                accel_data['accel_y'],
-                                accel_data['accel_z'],
-                                timestamp_ns
-                            )
-                            buffer_high_freq.append(packet)
-                            self.sample_count += 1
+                            decimation_count += 1
+                            if decimation_count >= self.decimation:
+                                decimation_count = 0
+                                if batch_deadline is None:
+                                    batch_deadline = time.monotonic() + self.max_latency
+                                self._add_high_freq_sample(buffer_high_freq)
+                                self.sample_count += 1
 
                         # Send environmental data
                         if time.time() - last_env_time >= (1.0 / self.env_sample_rate):
@@ -228,69 +847,38 @@ class IprSensorDatabase:
                                     env_data['temperature'],
                                     env_data['humidity'],
                                     env_data['pressure'],
-                                    timestamp_ns,
+                                    self._chunk_host_ns,
                                     self.sensor_id
                                 )
-
-                                compressed_env = zlib.compress(env_packet, level=6)
-                                result = self.client.publish(
-                                    f'sensor/{self.sensor_id}/env',
-                                    compressed_env,
-                                    qos=1
-                                )
-
-                                if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                                    print(f"[ENV] Batt:{env_data['v_batt']:.2f}V "
-                                          f"Temp:{env_data['temperature']:.1f}°C "
-                                          f"Humidity:{env_data['humidity']:.1f}% "
-                                          f"Pressure:{env_data['pressure']:.1f}hPa")
-
+                                self._hand_off((MESSAGE_ENV, env_packet, env_data))
                                 last_env_time = time.time()
 
-                    # Send high-frequency batch
-                    if len(buffer_high_freq) >= self.sample_rate:
-                        batch = b''.join(buffer_high_freq)
-                        compressed = zlib.compress(batch, level=6)
-
-                        result = self.client.publish(
-                            f'sensor/{self.sensor_id}/data',
-                            compressed,
-                            qos=1
-                        )
-
-                        if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                            compression_ratio = len(batch) / len(compressed)
-                            bandwidth_kbps = (len(compressed) * 8) / 1024
-                            print(f"[DATA] Sent {len(buffer_high_freq)} samples | "
-                                  f"{len(batch)} → {len(compressed)} bytes | "
-                                  f"{compression_ratio:.1f}x compression | "
-                                  f"{bandwidth_kbps:.1f} kbps")
-
-                        buffer_high_freq = []
+                    # Send high-frequency batch, when full or due
+                    if batch_deadline is not None and (len(buffer_high_freq) >= self.batch_size or
+                                                       time.monotonic() >= batch_deadline):
+                        buffer_high_freq = self._hand_off_batch(buffer_high_freq)
+                        batch_deadline = None
 
                 except Exception as e:
                     print(f"✗ Error reading/publishing sensor data: {e}")
                     # Continue running, just skip this iteration
 
-                # Maintain sample rate
-                elapsed = time.time() - start_time
-                sleep_time = max(0, sample_interval - elapsed)
-                time.sleep(sleep_time)
-
         except Exception as e:
             print(f"✗ Fatal error in sensor thread: {e}")
             self._last_error = str(e)
 
         finally:
-            # Cleanup - send remaining data
-            if buffer_high_freq and self.client:
+            # Cleanup - send remaining data, then let the worker publish what is queued
+            if buffer_high_freq and self._publish_thread is not None:
+                final_count = len(buffer_high_freq)
+                unit = 'telegrams' if self.raw_mode else 'samples'
                 try:
-                    batch = b''.join(buffer_high_freq)
-                    compressed = zlib.compress(batch, level=6)
-                    self.client.publish(f'sensor/{self.sensor_id}/data', compressed, qos=1)
-                    print(f"Sent final {len(buffer_high_freq)} samples")
-                except Exception as e:
-                    print(f"Error sending final data: {e}")
+                    self._publish_queue.put((MESSAGE_RAW if self.raw_mode else MESSAGE_DATA, buffer_high_freq),
+                                            timeout=PUBLISH_STOP_TIMEOUT)
+                    print(f"Sent final {final_count} {unit}")
+                except queue.Full:
+                    print(f"Error sending final data: publisher queue full, {final_count} {unit} dropped")
+            self._stop_publish_worker()
 
             # Close MQTT connection
             if self.client:
@@ -318,7 +906,15 @@ class IprSensorDatabase:
         self._stop_event.clear()
         self._pause_event.set()
         self.sample_count = 0
+        self._reset_metrics()
         self._last_error = None
+        self.timebase = IPRTimebase()
+        self.ack_tracker = IprSensorAckTracker(self.max_inflight)
+        self._was_connected = False
+        if self.subscriber is not None:
+            self._pending_telegrams.clear()
+            self.subscriber.drain()
+            self.subscriber.enable()
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
         return True
@@ -330,6 +926,8 @@ class IprSensorDatabase:
             return False
 
         self._pause_event.clear()
+        if self.subscriber is not None:
+            self.subscriber.disable()
         print("Data publishing paused")
         return True
 
@@ -339,6 +937,9 @@ class IprSensorDatabase:
             print("Thread is not running")
             return False
 
+        if self.subscriber is not None:
+            self.subscriber.drain()  # Drop the data queued before the pause
+            self.subscriber.enable()
         self._pause_event.set()
         print("Data publishing resumed")
         return True
@@ -349,6 +950,8 @@ class IprSensorDatabase:
             return False
 
         print("Stopping sensor thread...")
+        if self.subscriber is not None:
+            self.subscriber.disable()
         self._stop_event.set()
         self._pause_event.set()  # Unpause if paused, so thread can exit
         self._thread.join(timeout=5)
@@ -370,6 +973,30 @@ class IprSensorDatabase:
         """Get the last error message"""
         return self._last_error
 
+    def get_status(self):
+        """
+        Get the publisher statistics.
+
+        Returns:
+            dict: Thread state, sample count, publisher worker metrics (queue depth, times in ms) and spool statistics
+        """
+        return {
+            'running': self.is_running(),
+            'paused': self.is_paused(),
+            'samples': self.sample_count,
+            'queue_depth': self._publish_queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'published_batches': self.published_batches,
+            'dropped_messages': self.dropped_messages,
+            'max_stall_ms': self.max_stall_time * 1e3,
+            'last_encode_ms': self.last_encode_time * 1e3,
+            'max_publish_ms': self.max_publish_time * 1e3,
+            'connected': self.is_connected,
+            'spool': self.spool.get_status() if self.spool is not None else None,
+            'acks': self.ack_tracker.get_status(),
+            'adaptive': self.controller.get_status() if self.controller is not None else None,
+        }
+
 
 # # Example usage
 # if __name__ == "__main__":
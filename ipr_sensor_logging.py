@@ -5,102 +5,323 @@ import time
 from datetime import datetime
 
 MAX_FILE_SIZE = 150e6           # 150 MB (~2.5h)
-SAVE_FILE_EVERY_SIZE = 100e3    # 100 kB
+WRITE_BLOCK_SIZE = 64 * 1024    # 64 kB, written at once on block aligned file offsets
+FLUSH_INTERVAL = 1.0            # Partial block written after 1 s
+FSYNC_INTERVAL = 10.0           # File synced to the SD card at least every 10 s...
+FSYNC_SIZE = 4 * 1024 * 1024    # ...or every 4 MB
+WRITE_QUEUE_SIZE = 64           # Blocks waiting to be written (4 MB, ~45 s of data)
+WAIT_TIMEOUT = 0.1              # Maximum sleep of the logger thread, bounds the stop/pause latency
+WRITER_RESTART_DELAY = 1.0      # Delay before restarting a failed writer thread (disk full, SD card removed...)
+
+
+class IprSensorLogWriter(threading.Thread):
+    """
+    Thread writing the logged data to file in large blocks.
+
+    The reader thread calls write() with the data it receives. The data is
+    accumulated into blocks of WRITE_BLOCK_SIZE bytes, which are handed to this
+    thread and written at once, so the SD card sees few, large and aligned
+    writes. A partial block is handed over after flush_interval seconds (poll()),
+    and the file is synced after fsync_size bytes or fsync_interval seconds.
+    Files are rotated once they reach max_file_size; rotation, writes and syncs
+    all happen in this thread and never stall the reader. If the thread fails
+    (error set), the blocks handed over are dropped and counted instead.
+    """
+
+    def __init__(self, path_logfile, filename_factory, block_size=WRITE_BLOCK_SIZE,
+                 flush_interval=FLUSH_INTERVAL, fsync_interval=FSYNC_INTERVAL, fsync_size=FSYNC_SIZE,
+                 max_file_size=MAX_FILE_SIZE, queue_size=WRITE_QUEUE_SIZE):
+        """
+        Initialize the writer thread.
+
+        Args:
+            path_logfile (str): Directory of the log files
+            filename_factory: Function returning the name of a new log file
+            block_size (int): Size of the blocks written at once
+            flush_interval (float): Maximum age (s) of the data kept in a partial block
+            fsync_interval (float): Maximum time (s) between two file syncs, 0 to disable
+            fsync_size (int): Maximum number of bytes between two file syncs, 0 to disable
+            max_file_size (int): File size triggering a rotation
+            queue_size (int): Number of blocks waiting to be written
+        """
+        super().__init__(daemon=True)
+        self.path_logfile = path_logfile
+        self.filename_factory = filename_factory
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.fsync_size = fsync_size
+        self.max_file_size = max_file_size
+
+        self._queue = queue.Queue(maxsize=queue_size)
+
+        # Reader side
+        self._block = bytearray()
+        self._block_start_time = None
+        self._stream_offset = 0  # Bytes handed to the writer thread
+
+        # Writer side
+        self.logfile_name = None
+        self._file = None
+        self._file_size = 0
+        self._unsynced_size = 0
+        self._last_sync_time = time.monotonic()
+
+        # Statistics
+        self.bytes_written = 0
+        self.blocks_written = 0
+        self.fsync_count = 0
+        self.file_count = 0
+        self.stall_time = 0.0  # Time the reader waited for a free queue slot
+        self.dropped_blocks = 0  # Blocks lost because the writer thread failed
+        self.dropped_bytes = 0
+        self.error = None  # Error which stopped the writer thread
+
+    # Reader side
+    def write(self, data):
+        """
+        Add received data to the current block.
+
+        Args:
+            data (bytes-like): Data to log
+        """
+        _data = memoryview(data)
+        while len(_data):
+            if self._block_start_time is None:
+                self._block_start_time = time.monotonic()
+            # Fill up to the next block boundary of the stream
+            _missing = self.block_size - (self._stream_offset + len(self._block)) % self.block_size
+            _part = _data[:_missing]
+            self._block += _part
+            _data = _data[len(_part):]
+            if len(_part) == _missing:
+                self._submit_block()
+
+    def poll(self):
+        """Hand over the partial block if it is older than flush_interval."""
+        if self._block and time.monotonic() - self._block_start_time >= self.flush_interval:
+            self._submit_block()
+
+    def close(self):
+        """Write the pending data, sync and close the file, then stop the thread."""
+        if self._block:
+            self._submit_block()
+        if self._put(None):
+            self.join()
+
+    def _put(self, item):
+        """
+        Queue an item for the writer thread, waiting for a free slot while the thread runs.
+
+        Returns:
+            bool: True if queued, False if the writer thread has stopped
+        """
+        while self.is_alive():
+            try:
+                self._queue.put(item, timeout=WAIT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _submit_block(self):
+        """Hand the current block to the writer thread, or drop it if the thread has stopped."""
+        _start = time.monotonic()
+        if not self._put(self._block):
+            self.dropped_blocks += 1
+            self.dropped_bytes += len(self._block)
+        self.stall_time += time.monotonic() - _start
+        self._stream_offset += len(self._block)
+        self._block = bytearray()
+        self._block_start_time = None
+
+    def queue_depth(self):
+        """
+        Get the number of blocks waiting to be written.
+
+        Returns:
+            int: Number of blocks in the queue
+        """
+        return self._queue.qsize()
+
+    # Writer side
+    def run(self):
+        """Write the blocks, sync and rotate the files"""
+        try:
+            while True:
+                try:
+                    _block = self._queue.get(timeout=self.fsync_interval if self.fsync_interval > 0 else None)
+                except queue.Empty:
+                    _block = b''
+
+                if _block is None:
+                    break
+
+                if _block:
+                    if self._file is None:
+                        self._open_new_file()
+                    self._file.write(_block)
+                    self._file_size += len(_block)
+                    self._unsynced_size += len(_block)
+                    self.bytes_written += len(_block)
+                    self.blocks_written += 1
+
+                if self._file is not None:
+                    _sync_due = (self.fsync_size > 0 and self._unsynced_size >= self.fsync_size) or \
+                                (self.fsync_interval > 0 and self._unsynced_size > 0 and
+                                 time.monotonic() - self._last_sync_time >= self.fsync_interval)
+                    if _sync_due:
+                        self._sync()
+                    if self._file_size >= self.max_file_size:
+                        self._close_file()
+
+        except Exception as e:
+            self.error = str(e)
+            print(f"Fatal error in log writer thread: {e}")
+
+        finally:
+            try:
+                self._close_file()
+            except Exception as e:
+                print(f"Error closing log file: {e}")
+                self._file = None
+
+    def _open_new_file(self):
+        """Open the next log file"""
+        self.logfile_name = self.filename_factory()
+        os.makedirs(self.path_logfile, exist_ok=True)  # The storage may have been remounted
+        self._file = open(self.path_logfile + self.logfile_name, "ab", buffering=0)
+        self._file_size = self._file.tell()
+        self.file_count += 1
+
+    def _sync(self):
+        """Push the written data to the storage"""
+        os.fsync(self._file.fileno())
+        self._unsynced_size = 0
+        self._last_sync_time = time.monotonic()
+        self.fsync_count += 1
+
+    def _close_file(self):
+        """Sync and close the current log file"""
+        if self._file is not None:
+            if self._unsynced_size:
+                self._sync()
+            self._file.close()
+            self._file = None
 
 
 class IprSensorSerialLoggerThread(threading.Thread):
     """Thread that continuously reads from serial port and logs to file"""
 
-    def __init__(self, serial_port, data_queue, debug=False):
+    def __init__(self, serial_port, data_queue, debug=False, subscriber=None, path_logfile=None):
         """
         Initialize the logger thread.
 
         Args:
-            serial_port: Your serial port object (with read() method)
+            serial_port: Your serial port object (IprSensorSerial, with wait_for_data() and read_chunk() methods)
             data_queue (queue.Queue): Queue for passing data to main thread
             debug (bool): Print data to console if True
+            subscriber (IprSensorSubscriber): RAW subscriber of an IprSensorReaderThread. If given,
+                                              the data is taken from it instead of the serial port
+            path_logfile (str): Directory of the log files (default: Logging_data/ in the working directory)
         """
         super().__init__(daemon=True)
         self.serial_port = serial_port
         self.data_queue = data_queue
         self.debug = debug
+        self.subscriber = subscriber
+        self.path_logfile = path_logfile
 
         # Control flags
         self._stop_event = threading.Event()
         self._logging_enabled = threading.Event()
         self._logging_enabled.set()  # Start with logging enabled
 
+        # Failures of the file writer, restarted after WRITER_RESTART_DELAY
+        self.writer_error = None
+        self.writer_restart_count = 0
+
     def run(self):
         """Main thread loop - this runs continuously"""
-        log_file_handle = None
-        logfile_size_counter = 0
+        log_writer = None
 
         # Prepare the folder to save the data
-        current_directory = os.getcwd()
-        path_logfile = current_directory + "/Logging_data/"
+        if self.path_logfile is None:
+            path_logfile = os.getcwd() + "/Logging_data/"
+        else:
+            path_logfile = os.path.join(self.path_logfile, "")
         os.makedirs(path_logfile, exist_ok=True)
         print("Saving the logging file to: {}".format(path_logfile))
 
         try:
             while not self._stop_event.is_set():
                 if self._logging_enabled.is_set():
-                    # Logging is enabled - open file if needed
-                    if log_file_handle is None:
-                        # Get new filename
-                        logfile_name = self.get_new_filename()
-                        log_file_handle = open(path_logfile + logfile_name, "ab")
+                    # Logging is enabled - start the file writer if needed
+                    if log_writer is None:
+                        log_writer = IprSensorLogWriter(path_logfile, self.get_new_filename)
+                        log_writer.start()
 
                     # Read from serial port
                     try:
-                        # Read data from sensor
-                        data = self.serial_port.read(1)
-
-                        if data:
-                            # Write data to file
-                            log_file_handle.write(data)
-                        else:
-                            time.sleep(0.001)  # No data, small delay
-
-                        # Check file size every x KB
-                        if logfile_size_counter >= SAVE_FILE_EVERY_SIZE:
-                            logfile_size_counter = 0
-                            # Check file size once in a while
-                            filesize = os.path.getsize(path_logfile + logfile_name)
-                            if filesize >= MAX_FILE_SIZE:
-                                f.close()
-                                logfile_name = self.get_new_filename()
-                                f = open(path_logfile + logfile_name, "ab")
-                        else:
-                            logfile_size_counter += 1
+                        wait_timeout = min(WAIT_TIMEOUT, log_writer.flush_interval)
+                        if self.subscriber is not None:
+                            # The serial port is read by an IprSensorReaderThread
+                            data = self.subscriber.get(wait_timeout)
+                            if data:
+                                log_writer.write(data)
+                        # Sleep until bytes arrive, then move them all to the receive buffer
+                        elif self.serial_port.wait_for_data(wait_timeout) and self.serial_port.read_chunk():
+                            rx_buffer = self.serial_port.rx_buffer
+                            for view in rx_buffer.get_read_views():
+                                log_writer.write(view)
+                                rx_buffer.consume(len(view))
+                        log_writer.poll()
+
+                        if not log_writer.is_alive():
+                            # The writer failed: the data received until its restart is dropped
+                            print(f"✗ Log writer stopped ({log_writer.error}), "
+                                  f"restarting in {WRITER_RESTART_DELAY:g} s")
+                            self.writer_error = log_writer.error
+                            self.writer_restart_count += 1
+                            log_writer.close()
+                            log_writer = None
+                            self._stop_event.wait(WRITER_RESTART_DELAY)
 
                     except Exception as e:
                         print(f"Error reading serial: {e}")
                         time.sleep(0.1)
                 else:
-                    # Logging disabled - close file if open
-                    if log_file_handle is not None:
-                        log_file_handle.close()
-                        log_file_handle = None
-                    time.sleep(0.01)  # Wait while paused
+                    # Logging disabled - write pending data and close file
+                    if log_writer is not None:
+                        if self.subscriber is not None:
+                            for data in self.subscriber.drain():
+                                log_writer.write(data)
+                        log_writer.close()
+                        log_writer = None
+                    self._logging_enabled.wait(WAIT_TIMEOUT)  # Wait while paused
 
             # Thread stopping - close file if open
-            if log_file_handle is not None:
-                log_file_handle.close()
+            if log_writer is not None:
+                log_writer.close()
 
         except Exception as e:
             print(f"Fatal error in logger thread: {e}")
-            if log_file_handle is not None:
-                log_file_handle.close()
+            if log_writer is not None:
+                log_writer.close()
 
     # Control methods
     def start_logging(self):
         """Enable logging"""
         self._logging_enabled.set()
+        if self.subscriber is not None:
+            self.subscriber.enable()
         print("Sensor recording enabled")
 
     def stop_logging(self):
         """Disable logging (thread keeps running)"""
         self._logging_enabled.clear()
+        if self.subscriber is not None:
+            self.subscriber.disable()
         print("Sensor recording disabled")
 
     def shutdown(self):
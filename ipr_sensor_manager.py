@@ -0,0 +1,319 @@
+import os
+import queue
+import sys
+
+from ipr_sensor_command import IprSensorCommand
+from ipr_sensor_serial import IprSensorSerial
+from ipr_sensor_logging import IprSensorSerialLoggerThread
+from ipr_sensor_database import IprSensorDatabase
+from ipr_sensor_acquisition import IprSensorReaderThread, IprSensorSubscriber
+
+LOGGING_ROOT = "Logging_data"   # Parent directory of the per-sensor log directories
+MAX_SENSORS = 8                 # Sensors checked at full rate, simulated on pseudo-terminals (not real ports)
+MQTT_BROKER = 'dh1.iprnet.ca'
+MQTT_PORT = 8883
+
+
+class IprSensorChannel:
+    """
+    Acquisition path of one sensor: serial port, reader, file logger and MQTT publisher.
+
+    Each channel has its own serial port, its own reader thread (framing done
+    once per sensor), its own log directory and its own MQTT sensor_id, so
+    the sensors never share a buffer, a file or a topic.
+    """
+
+    def __init__(self, port, sensor_id, path_logfile, broker=MQTT_BROKER, mqtt_port=MQTT_PORT, debug=False):
+        """
+        Initialize the channel and connect its serial port.
+
+        Args:
+            port (str): Serial port name (e.g., 'COM3' or '/dev/ttyUSB0')
+            sensor_id (int): MQTT sensor ID, used in the topics sensor/<sensor_id>/...
+            path_logfile (str): Directory of the log files of this sensor
+            broker (str): MQTT broker address
+            mqtt_port (int): MQTT broker port
+            debug (bool): Print status to console if True
+        """
+        self.port = port
+        self.sensor_id = sensor_id
+        self.path_logfile = path_logfile
+
+        self.serial = IprSensorSerial(port)
+        self.command = IprSensorCommand(self.serial)
+
+        self.reader = IprSensorReaderThread(serial_port=self.serial, debug=debug)
+        self.logger = IprSensorSerialLoggerThread(
+            serial_port=self.serial,
+            data_queue=queue.Queue(maxsize=1000),
+            debug=debug,
+            subscriber=self.reader.subscribe(f"logger_{sensor_id}", IprSensorSubscriber.RAW),
+            path_logfile=path_logfile
+        )
+        self.publisher = IprSensorDatabase(
+            broker=broker,
+            port=mqtt_port,
+            sensor_id=sensor_id,
+            serial_obj=self.serial,
+            subscriber=self.reader.subscribe(f"publisher_{sensor_id}", IprSensorSubscriber.TELEGRAM)
+        )
+        self.publisher.subscriber.disable()
+
+    def is_connected(self):
+        """Check if the serial port is open"""
+        return self.serial.is_open
+
+    def start(self):
+        """Start the reader and logger threads, both idle"""
+        self.logger.stop_logging()
+        self.reader.start()
+        self.logger.start()
+
+    def is_publishing(self):
+        """Check if the publisher is sending data"""
+        return self.publisher.is_running() and not self.publisher.is_paused()
+
+    def _start_transmit(self):
+        """Start the sensor stream and the reader if not already running"""
+        if not self.reader.is_reading():
+            self.command.start_sensor_transmit()
+            self.reader.start_reading()
+
+    def _stop_transmit(self):
+        """Stop the reader and the sensor stream once nothing uses them"""
+        if self.reader.is_reading() and not self.logger.is_logging() and not self.is_publishing():
+            self.reader.stop_reading()
+            self.command.stop_sensor_transmit()
+
+    def stop_acquisition(self):
+        """Stop logging and release the serial port before a sensor command"""
+        if self.logger.is_logging():
+            self.logger.stop_logging()
+        self.reader.stop_reading()
+
+    def start_recording(self):
+        """Start logging the sensor data to file"""
+        self._start_transmit()
+        self.logger.start_logging()
+
+    def stop_recording(self):
+        """Stop logging the sensor data"""
+        if self.logger.is_logging():
+            self.logger.stop_logging()
+        self._stop_transmit()
+
+    def start_publishing(self):
+        """Connect to the broker if needed and publish the sensor data"""
+        self._start_transmit()
+        if not self.publisher.is_running():
+            self.publisher.start()
+        elif self.publisher.is_paused():
+            self.publisher.resume()
+
+    def stop_publishing(self):
+        """Stop publishing the sensor data"""
+        if self.publisher.is_running():
+            self.publisher.stop()
+        self._stop_transmit()
+
+    def shutdown(self):
+        """Stop every thread of the channel and close the serial port"""
+        self.stop_publishing()
+        self.stop_recording()
+        self.reader.shutdown()
+        self.logger.shutdown()
+        self.logger.join(timeout=5)
+        self.reader.join(timeout=5)
+        self.serial.disconnect()
+
+    def get_status(self):
+        """
+        Get the channel status.
+
+        Returns:
+            dict: Port, sensor ID, logger and publisher state, publisher, reader and serial statistics
+        """
+        return {
+            'port': self.port,
+            'sensor_id': self.sensor_id,
+            'connected': self.is_connected(),
+            'logger': self.logger.get_status(),
+            'publishing': self.is_publishing(),
+            'publisher': self.publisher.get_status(),
+            'reader': self.reader.get_status(),
+            'serial': self.serial.get_read_statistics(),
+        }
+
+
+class IprSensorManager:
+    """
+    Acquisition of several sensors from one host process.
+
+    Opens one IprSensorChannel per serial port and runs them concurrently.
+    The log files of each sensor go to <logging_root>/sensor_<sensor_id>/ and
+    its data is published on the MQTT topics sensor/<sensor_id>/..., so the
+    sensors stay separated end to end. The threads of a channel sleep on the
+    serial port descriptor between reads, so idle sensors cost no CPU.
+    """
+
+    def __init__(self, logging_root=None, broker=MQTT_BROKER, mqtt_port=MQTT_PORT, debug=False):
+        """
+        Initialize the manager.
+
+        Args:
+            logging_root (str): Parent directory of the per-sensor log directories
+                                (default: Logging_data/ in the working directory)
+            broker (str): MQTT broker address
+            mqtt_port (int): MQTT broker port
+            debug (bool): Print status to console if True
+        """
+        self.logging_root = logging_root if logging_root is not None else os.path.join(os.getcwd(), LOGGING_ROOT)
+        self.broker = broker
+        self.mqtt_port = mqtt_port
+        self.debug = debug
+        self.channels = dict()  # {sensor_id: IprSensorChannel}
+
+    def add_sensor(self, port, sensor_id):
+        """
+        Open a sensor and start its (idle) reader and logger threads.
+
+        Args:
+            port (str): Serial port name
+            sensor_id (int): MQTT sensor ID, must be unique
+
+        Returns:
+            IprSensorChannel: The channel, or None if the port cannot be opened
+        """
+        if sensor_id in self.channels:
+            print(f"✗ Sensor ID {sensor_id} already used by {self.channels[sensor_id].port}")
+            return None
+        if any(_channel.port == port for _channel in self.channels.values()):
+            print(f"✗ Port {port} already opened")
+            return None
+        if len(self.channels) >= MAX_SENSORS:
+            print(f"Warning: more than {MAX_SENSORS} sensors was never checked, data loss is possible")
+
+        _path_logfile = os.path.join(self.logging_root, f"sensor_{sensor_id}")
+        _channel = IprSensorChannel(port, sensor_id, _path_logfile, self.broker, self.mqtt_port, self.debug)
+        if not _channel.is_connected():
+            return None
+        _channel.start()
+        self.channels[sensor_id] = _channel
+        return _channel
+
+    def remove_sensor(self, sensor_id):
+        """Stop a sensor and close its serial port"""
+        _channel = self.channels.pop(sensor_id, None)
+        if _channel is not None:
+            _channel.shutdown()
+
+    def _select(self, sensor_ids):
+        """Get the channels of the given sensor IDs (default: all)"""
+        if sensor_ids is None:
+            return list(self.channels.values())
+        return [self.channels[_id] for _id in sensor_ids if _id in self.channels]
+
+    def start_recording(self, sensor_ids=None):
+        """Start logging the given sensors (default: all)"""
+        for _channel in self._select(sensor_ids):
+            _channel.start_recording()
+
+    def stop_recording(self, sensor_ids=None):
+        """Stop logging the given sensors (default: all)"""
+        for _channel in self._select(sensor_ids):
+            _channel.stop_recording()
+
+    def start_publishing(self, sensor_ids=None):
+        """Start publishing the given sensors (default: all)"""
+        for _channel in self._select(sensor_ids):
+            _channel.start_publishing()
+
+    def stop_publishing(self, sensor_ids=None):
+        """Stop publishing the given sensors (default: all)"""
+        for _channel in self._select(sensor_ids):
+            _channel.stop_publishing()
+
+    def shutdown(self):
+        """Stop all the sensors"""
+        for _sensor_id in list(self.channels):
+            self.remove_sensor(_sensor_id)
+
+    def get_status(self):
+        """
+        Get the status of all the sensors.
+
+        Returns:
+            dict: {sensor_id: channel status}
+        """
+        return {_sensor_id: _channel.get_status() for _sensor_id, _channel in self.channels.items()}
+
+    def print_status(self):
+        """Print one line per sensor with the data counts and losses"""
+        for _sensor_id, _status in self.get_status().items():
+            _reader = _status['reader']
+            _dropped = sum(_sub['dropped'] for _sub in _reader['subscribers'])
+            print(f"[{_sensor_id}] {_status['port']} | {_status['logger']} | "
+                  f"publishing: {_status['publishing']} | "
+                  f"{_status['serial']['bytes_read']} bytes | {_reader['telegrams']} telegrams | "
+                  f"overflows: {_status['serial']['rx_overflow_count']} | dropped: {_dropped} | "
+                  f"lost: {_reader['lost_telegrams']}")
+
+
+def main():
+    """
+    Run several sensors from the command line.
+
+    Usage: python ipr_sensor_manager.py PORT:SENSOR_ID [PORT:SENSOR_ID ...]
+    """
+    if len(sys.argv) < 2:
+        print(main.__doc__)
+        return
+
+    manager = IprSensorManager()
+    for _argument in sys.argv[1:]:
+        _port, _separator, _sensor_id = _argument.rpartition(':')
+        if not _separator or not _sensor_id.isdigit():
+            print(f"Invalid sensor {_argument}, expected PORT:SENSOR_ID")
+            continue
+        manager.add_sensor(_port, int(_sensor_id))
+
+    if not manager.channels:
+        print("No sensor connected, the script will terminate")
+        return
+
+    try:
+        while True:
+            user_cmd = input("> ").split()
+            if not user_cmd:
+                continue
+            # Optional list of sensor IDs after the command, default: all the sensors
+            sensor_ids = [int(_id) for _id in user_cmd[1:] if _id.isdigit()] or None
+
+            if user_cmd[0] == "menu" or user_cmd[0] == "?":
+                print("Available commands (optionally followed by sensor IDs):")
+                print("[start_recording]: Start recording sensor data to BIN files")
+                print("[stop_recording]: Stop recording")
+                print("[start_publishing]: Start sending sensor data to the database")
+                print("[stop_publishing]: Stop sending sensor data to the database")
+                print("[status]: Display the acquisition status of each sensor")
+                print("[quit_program]: Quit the program")
+            elif user_cmd[0] == "start_recording":
+                manager.start_recording(sensor_ids)
+            elif user_cmd[0] == "stop_recording":
+                manager.stop_recording(sensor_ids)
+            elif user_cmd[0] == "start_publishing":
+                manager.start_publishing(sensor_ids)
+            elif user_cmd[0] == "stop_publishing":
+                manager.stop_publishing(sensor_ids)
+            elif user_cmd[0] == "status":
+                manager.print_status()
+            elif user_cmd[0] == "quit_program":
+                break
+            else:
+                print("Invalid command")
+    finally:
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import asyncio
+import inspect
+
+from pyipr_sensor_lib.ipr_sensor_decoder import IPRSensorDecoder
+from pyipr_sensor_lib.ipr_stream_reader import decode_record
+from pyipr_sensor_lib.ipr_telegram_framer import IPRTelegramFramer
+
+PIPELINE_QUEUE_SIZE = 256       # Items per queue (one item per serial chunk)
+SOURCE_WAIT_TIMEOUT = 0.1       # Maximum wait of the serial source for new bytes
+SOURCE_POLL_INTERVAL = 0.001    # Polling period for ports without file descriptor
+
+# Stages a sink can be attached to
+STAGE_RAW = "raw"               # Serial data as read (bytes)
+STAGE_TELEGRAMS = "telegrams"   # Lists of unescaped telegrams (bytes)
+STAGE_RECORDS = "records"       # Lists of decoded records (dict, see decode_record())
+
+# Queue policies when full
+POLICY_BLOCK = "block"              # Wait for room, the upstream stages slow down (backpressure)
+POLICY_DROP_NEWEST = "drop_newest"  # Drop the new item
+POLICY_DROP_OLDEST = "drop_oldest"  # Drop the oldest queued item to make room
+
+
+class IprPipelineQueue:
+    """Bounded asyncio queue with a policy applied when it is full, and statistics."""
+
+    def __init__(self, maxsize=PIPELINE_QUEUE_SIZE, policy=POLICY_BLOCK):
+        """
+        Initialize the queue.
+
+        Args:
+            maxsize (int): Maximum number of items waiting
+            policy (str): POLICY_BLOCK, POLICY_DROP_NEWEST or POLICY_DROP_OLDEST
+        """
+        self.policy = policy
+        self._queue = asyncio.Queue(maxsize=maxsize)
+
+        # Statistics, in bytes for raw data and in telegrams/records otherwise
+        self.put_count = 0
+        self.dropped_count = 0
+        self.max_depth = 0
+        self.blocked_time = 0.0
+
+    async def put(self, item, count):
+        """
+        Queue an item according to the queue policy.
+
+        Args:
+            item: Item to queue
+            count (int): Number of bytes, telegrams or records in the item
+
+        Returns:
+            bool: True if queued, False if dropped
+        """
+        if self._queue.full():
+            if self.policy == POLICY_DROP_NEWEST:
+                self.dropped_count += count
+                return False
+            elif self.policy == POLICY_DROP_OLDEST:
+                _dropped_item, _dropped_count = self._queue.get_nowait()
+                self.dropped_count += _dropped_count
+            else:
+                _loop = asyncio.get_running_loop()
+                _start = _loop.time()
+                await self._queue.put((item, count))
+                self.blocked_time += _loop.time() - _start
+                self._update_statistics(count)
+                return True
+
+        self._queue.put_nowait((item, count))
+        self._update_statistics(count)
+        return True
+
+    def _update_statistics(self, count):
+        self.put_count += count
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    async def get(self):
+        """
+        Wait for the next item.
+
+        Returns:
+            The oldest queued item
+        """
+        _item, _count = await self._queue.get()
+        return _item
+
+    def get_status(self):
+        """
+        Get the queue statistics.
+
+        Returns:
+            dict: Policy, depth, queued/dropped counts and time spent blocked
+        """
+        return {
+            'policy': self.policy,
+            'depth': self._queue.qsize(),
+            'max_depth': self.max_depth,
+            'put': self.put_count,
+            'dropped': self.dropped_count,
+            'blocked_time_s': self.blocked_time,
+        }
+
+
+class IprSensorPipeline:
+    """
+    asyncio acquisition pipeline of one sensor: serial source -> framer -> decoder -> sinks.
+
+    Every stage is a coroutine and the stages are connected by bounded queues.
+    The inner queues block when full, so a slow stage slows down the serial
+    source (backpressure). Each sink has its own queue with its own policy, so
+    a slow sink only loses its own data when its policy drops. The sinks run as
+    tasks of the same event loop, no thread is added, and one event loop can
+    run the pipelines of several sensors (see run_pipelines()).
+
+    The serial source waits on the port file descriptor with loop.add_reader()
+    and reads with IprSensorSerial.read_chunk().
+    """
+
+    def __init__(self, serial_port, name="sensor", queue_size=PIPELINE_QUEUE_SIZE):
+        """
+        Initialize the pipeline.
+
+        Args:
+            serial_port: Your serial port object (IprSensorSerial), already connected
+            name (str): Name of the sensor, used in the status reports
+            queue_size (int): Size of the queues between the stages
+        """
+        self.serial_port = serial_port
+        self.name = name
+        self.queue_size = queue_size
+
+        self._sinks = list()  # [(name, stage, queue, consumer)]
+        self._framer = IPRTelegramFramer()
+        self._decoder = None
+        self._tasks = list()
+        self._stop_event = None
+
+        # Statistics
+        self.invalid_data_number = 0
+
+    def add_sink(self, name, consumer, stage=STAGE_RECORDS, maxsize=PIPELINE_QUEUE_SIZE,
+                 policy=POLICY_DROP_NEWEST):
+        """
+        Attach a consumer to a stage of the pipeline. Must be called before run().
+
+        Args:
+            name (str): Name of the sink, used in the status reports
+            consumer: Function or coroutine function called with each item of the stage
+                      (raw bytes, list of telegrams or list of records)
+            stage (str): STAGE_RAW, STAGE_TELEGRAMS or STAGE_RECORDS
+            maxsize (int): Size of the sink queue
+            policy (str): Policy of the sink queue when full
+        """
+        self._sinks.append((name, stage, IprPipelineQueue(maxsize, policy), consumer))
+
+    async def run(self):
+        """Run the pipeline until stop() is called"""
+        self._stop_event = asyncio.Event()
+        self._decoder = IPRSensorDecoder()
+        _raw_queue = IprPipelineQueue(self.queue_size, POLICY_BLOCK)
+        _telegram_queue = None  # Only decode if a sink needs records
+
+        self._tasks = [asyncio.ensure_future(self._source(_raw_queue))]
+        if any(_stage == STAGE_RECORDS for _name, _stage, _queue, _consumer in self._sinks):
+            _telegram_queue = IprPipelineQueue(self.queue_size, POLICY_BLOCK)
+            self._tasks.append(asyncio.ensure_future(self._decode(_telegram_queue)))
+        self._tasks.append(asyncio.ensure_future(self._frame(_raw_queue, _telegram_queue)))
+        self._tasks += [asyncio.ensure_future(self._sink(_queue, _consumer))
+                        for _name, _stage, _queue, _consumer in self._sinks]
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            for _task in self._tasks:
+                _task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = list()
+
+    def stop(self):
+        """Stop the pipeline (to be called from the event loop thread)"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+    async def _publish(self, stage, item, count):
+        """Deliver an item to the sinks of a stage"""
+        for _name, _stage, _queue, _consumer in self._sinks:
+            if _stage == stage:
+                await _queue.put(item, count)
+
+    async def _source(self, raw_queue):
+        """Read the serial port when bytes arrive"""
+        _loop = asyncio.get_running_loop()
+        _data_ready = asyncio.Event()
+        _fd = getattr(self.serial_port.serial_connection, 'fd', None)
+        if _fd is not None:
+            _loop.add_reader(_fd, _data_ready.set)
+
+        try:
+            while True:
+                if self.serial_port.read_chunk():
+                    rx_buffer = self.serial_port.rx_buffer
+                    _views = rx_buffer.get_read_views()
+                    _chunk = b''.join(_views)  # Copy, the ring buffer is reused
+                    rx_buffer.consume(len(_chunk))
+                    await raw_queue.put(_chunk, len(_chunk))
+                    await self._publish(STAGE_RAW, _chunk, len(_chunk))
+                    await asyncio.sleep(0)  # put() only waits on a full queue, let the consumers run
+                elif _fd is not None:
+                    _data_ready.clear()
+                    try:
+                        await asyncio.wait_for(_data_ready.wait(), SOURCE_WAIT_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await asyncio.sleep(SOURCE_POLL_INTERVAL)
+        finally:
+            if _fd is not None:
+                _loop.remove_reader(_fd)
+
+    async def _frame(self, raw_queue, telegram_queue):
+        """Split the serial data into telegrams"""
+        while True:
+            _chunk = await raw_queue.get()
+            _telegrams = self._framer.feed(_chunk)
+            if _telegrams:
+                if telegram_queue is not None:
+                    await telegram_queue.put(_telegrams, len(_telegrams))
+                await self._publish(STAGE_TELEGRAMS, _telegrams, len(_telegrams))
+
+    async def _decode(self, telegram_queue):
+        """Decode the telegrams into records"""
+        while True:
+            _telegrams = await telegram_queue.get()
+            _records = list()
+            for _telegram in _telegrams:
+                _record = decode_record(self._decoder, _telegram)
+                if _record is None:
+                    self.invalid_data_number += 1
+                else:
+                    _records.append(_record)
+            if _records:
+                await self._publish(STAGE_RECORDS, _records, len(_records))
+
+    @staticmethod
+    async def _sink(queue, consumer):
+        """Feed a consumer from its queue"""
+        _is_coroutine = inspect.iscoroutinefunction(consumer)
+        while True:
+            _item = await queue.get()
+            try:
+                if _is_coroutine:
+                    await consumer(_item)
+                else:
+                    consumer(_item)
+            except Exception as e:
+                print(f"✗ Error in pipeline sink: {e}")
+
+    def get_status(self):
+        """
+        Get the pipeline statistics.
+
+        Returns:
+            dict: Telegram counts and the statistics of every sink queue
+        """
+        return {
+            'name': self.name,
+            'telegrams': self._framer.telegram_count,
+            'discarded_bytes': self._framer.discarded_bytes,
+            'invalid_telegrams': self.invalid_data_number,
+            'sinks': {_name: _queue.get_status() for _name, _stage, _queue, _consumer in self._sinks},
+        }
+
+
+async def run_pipelines(pipelines):
+    """
+    Run the pipelines of several sensors in the current event loop.
+
+    Args:
+        pipelines (list): IprSensorPipeline objects
+    """
+    await asyncio.gather(*(_pipeline.run() for _pipeline in pipelines))
@@ -0,0 +1,115 @@
+RING_BUFFER_SIZE = 1024 * 1024  # 1 MB (~11 s of data at 921600 baud)
+
+
+class IprSensorRingBuffer:
+    """
+    Fixed-size byte ring buffer, allocated once and reused for the whole session.
+
+    A producer fills it in place (e.g. with serial.Serial.readinto) through
+    get_write_view()/commit_write(), and the consumers (framing, file writing)
+    get the pending data as memoryviews with get_read_views() before releasing
+    it with consume(). Intended for one producer and one consumer thread.
+    """
+
+    def __init__(self, capacity=RING_BUFFER_SIZE):
+        """
+        Initialize the ring buffer.
+
+        Args:
+            capacity (int): Size of the buffer in bytes (default: 1 MB)
+        """
+        self.capacity = int(capacity)
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+
+        # Absolute positions, the index in the buffer is position % capacity
+        self._read_position = 0
+        self._write_position = 0
+
+    def __len__(self):
+        """Number of bytes waiting to be consumed."""
+        return self._write_position - self._read_position
+
+    def free_space(self):
+        """
+        Get the number of bytes which can still be written.
+
+        Returns:
+            int: Free space in bytes
+        """
+        return self.capacity - len(self)
+
+    def get_write_view(self, max_bytes):
+        """
+        Get the next contiguous free area of the buffer.
+
+        Args:
+            max_bytes (int): Maximum size of the area
+
+        Returns:
+            memoryview: Writable area, empty if the buffer is full
+        """
+        _index = self._write_position % self.capacity
+        _size = min(max_bytes, self.free_space(), self.capacity - _index)
+        return self._view[_index:_index + _size]
+
+    def commit_write(self, num_bytes):
+        """
+        Mark bytes written in the area returned by get_write_view() as available.
+
+        Args:
+            num_bytes (int): Number of bytes written
+        """
+        self._write_position += num_bytes
+
+    def write(self, data):
+        """
+        Copy data into the buffer.
+
+        Args:
+            data (bytes-like): Data to append
+
+        Returns:
+            int: Number of bytes copied, smaller than len(data) if the buffer is full
+        """
+        _data = memoryview(data).cast('B')
+        _written = 0
+        while _written < len(_data):
+            _area = self.get_write_view(len(_data) - _written)
+            if not len(_area):
+                break
+            _area[:] = _data[_written:_written + len(_area)]
+            self.commit_write(len(_area))
+            _written += len(_area)
+        return _written
+
+    def get_read_views(self, max_bytes=None):
+        """
+        Get the pending data without consuming it.
+
+        Args:
+            max_bytes (int): Maximum number of bytes to return (default: everything)
+
+        Returns:
+            list: One or two memoryviews (two when the data wraps around the buffer end)
+        """
+        _size = len(self) if max_bytes is None else min(max_bytes, len(self))
+        _index = self._read_position % self.capacity
+        _first_size = min(_size, self.capacity - _index)
+        _views = [self._view[_index:_index + _first_size]] if _first_size else []
+        if _size > _first_size:
+            _views.append(self._view[:_size - _first_size])
+        return _views
+
+    def consume(self, num_bytes):
+        """
+        Release data returned by get_read_views().
+
+        Args:
+            num_bytes (int): Number of bytes to release
+        """
+        self._read_position += min(num_bytes, len(self))
+
+    def clear(self):
+        """Discard all pending data."""
+        self._read_position = self._write_position
@@ -1,15 +1,26 @@
+import selectors
+import time
+from collections import deque
+
 import serial
 import serial.tools.list_ports
 
+from ipr_sensor_ring_buffer import IprSensorRingBuffer, RING_BUFFER_SIZE
+from pyipr_sensor_lib.ipr_telegram_framer import IPRTelegramFramer
+
 # Global configuration flags for debugging purposes
 DEBUG_MODE = False  # Enable/disable general debug information
 DEBUG_SERIAL_RECEIVE = False  # Enable/disable serial data reception debugging
 
+READ_CHUNK_SIZE = 4096  # Maximum number of bytes moved per driver call in chunked mode
+WAIT_POLL_INTERVAL = 0.001  # Polling period of wait_for_data() when the port has no file descriptor
+
 
 class IprSensorSerial:
     """Basic serial port communication class"""
 
-    def __init__(self, port=None, baudrate=921600, timeout=0.5):
+    def __init__(self, port=None, baudrate=921600, timeout=0.5,
+                 read_chunk_size=READ_CHUNK_SIZE, rx_buffer_size=RING_BUFFER_SIZE):
         """
         Initialize serial port connection.
 
@@ -18,6 +29,8 @@ class IprSensorSerial:
                        If None, will try to auto-detect
             baudrate (int): Baud rate (default: 921600)
             timeout (float): Read timeout in seconds (default: 1)
+            read_chunk_size (int): Maximum number of bytes per driver call in chunked mode
+            rx_buffer_size (int): Size of the receive ring buffer used in chunked mode
         """
         self.port = port
         self.baudrate = baudrate
@@ -25,6 +38,20 @@ class IprSensorSerial:
         self.serial_connection = None
         self.is_open = False
 
+        # Chunked reading: bytes are moved from the driver into a reusable ring buffer
+        self.read_chunk_size = read_chunk_size
+        self.rx_buffer = IprSensorRingBuffer(rx_buffer_size)
+
+        # Selector waking the readers when bytes arrive, see wait_for_data()
+        self._selector = None
+
+        # Read statistics, see get_read_statistics()
+        self.reset_read_statistics()
+
+        # Bytes-native framing of the binary stream
+        self._telegram_framer = IPRTelegramFramer()
+        self._telegram_queue = deque()
+
         # Try to initialize connection
         if port:
             self.connect()
@@ -92,6 +119,7 @@ class IprSensorSerial:
             print("Error: No port specified")
             return False
 
+        self._close_selector()
         try:
             self.serial_connection = serial.Serial(
                 port=self.port,
@@ -117,6 +145,7 @@ class IprSensorSerial:
 
     def disconnect(self):
         """Close the serial connection"""
+        self._close_selector()
         if self.serial_connection and self.is_open:
             try:
                 self.serial_connection.close()
@@ -130,21 +159,24 @@ class IprSensorSerial:
 
     def read(self, num_bytes=1):
         """
-        Read bytes from serial port.
+        Read bytes from serial port without waiting.
 
         Args:
-            num_bytes (int): Number of bytes to read (default: 1)
+            num_bytes (int): Maximum number of bytes to read (default: 1)
 
         Returns:
-            bytes: Data read from port, or None if error/timeout
+            bytes: Data read from port (at most num_bytes), or None if error/no data
         """
         if not self.is_open or not self.serial_connection:
             print("✗ Serial port not open")
             return None
 
         try:
-            if self.serial_connection.in_waiting > 0:
-                data = self.serial_connection.read(1)
+            waiting = self.serial_connection.in_waiting
+            if waiting > 0:
+                data = self.serial_connection.read(min(num_bytes, waiting))
+                self.read_calls += 1
+                self.bytes_read += len(data)
                 if DEBUG_MODE:
                     print(data)
                 return data if data else None
@@ -157,6 +189,140 @@ class IprSensorSerial:
             print(f"✗ Unexpected read error: {e}")
             return None
 
+    def read_chunk(self, max_bytes=None, block=False):
+        """
+        Drain the bytes waiting in the driver into the receive ring buffer (rx_buffer).
+
+        The data is read in place, without any allocation. Consumers then get it
+        with rx_buffer.get_read_views() and release it with rx_buffer.consume().
+
+        Args:
+            max_bytes (int): Maximum number of bytes to read (default: read_chunk_size)
+            block (bool): If True and no byte is waiting, wait up to the port
+                          timeout for bytes to arrive (see wait_for_data())
+
+        Returns:
+            int: Number of bytes added to rx_buffer (0 if no data, full buffer or error)
+        """
+        if not self.is_open or not self.serial_connection:
+            print("✗ Serial port not open")
+            return 0
+
+        if max_bytes is None:
+            max_bytes = self.read_chunk_size
+
+        try:
+            waiting = self.serial_connection.in_waiting
+            if waiting == 0:
+                if not block or not self.wait_for_data():
+                    return 0
+                waiting = self.serial_connection.in_waiting
+
+            total = 0
+            to_read = min(waiting, max_bytes)
+            while total < to_read:
+                area = self.rx_buffer.get_write_view(to_read - total)
+                if not len(area):
+                    self.rx_overflow_count += 1  # Consumers are late, leave the data in the driver
+                    break
+                count = self.serial_connection.readinto(area)
+                self.read_calls += 1
+                if not count:
+                    break
+                self.rx_buffer.commit_write(count)
+                total += count
+
+            self.bytes_read += total
+            if DEBUG_SERIAL_RECEIVE and total:
+                print(f"{total} bytes received")
+            return total
+
+        except serial.SerialException as e:
+            print(f"✗ Read error: {e}")
+            return 0
+        except Exception as e:
+            print(f"✗ Unexpected read error: {e}")
+            return 0
+
+    def wait_for_data(self, timeout=None):
+        """
+        Wait until bytes are waiting in the driver.
+
+        The wait is done by the OS on the port file descriptor, so the caller
+        sleeps without using any CPU and wakes up as soon as bytes arrive. Ports
+        without file descriptor (Windows) fall back to polling.
+
+        Args:
+            timeout (float): Maximum time to wait in seconds (default: port timeout)
+
+        Returns:
+            bool: True if bytes are waiting, False on timeout or error
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        if not self.is_open or not self.serial_connection:
+            time.sleep(timeout)  # Keep the callers from spinning on a closed port
+            return False
+
+        try:
+            if self.serial_connection.in_waiting > 0:
+                return True
+
+            if self._selector is None and getattr(self.serial_connection, 'fd', None) is not None:
+                self._selector = selectors.DefaultSelector()
+                self._selector.register(self.serial_connection.fd, selectors.EVENT_READ)
+
+            if self._selector is not None:
+                return bool(self._selector.select(timeout)) and self.serial_connection.in_waiting > 0
+
+            deadline = time.monotonic() + timeout
+            while self.serial_connection.in_waiting == 0:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(WAIT_POLL_INTERVAL)
+            return True
+
+        except Exception as e:
+            print(f"✗ Error waiting for data: {e}")
+            return False
+
+    def _close_selector(self):
+        """Release the selector of the port file descriptor"""
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+
+    def reset_read_statistics(self):
+        """Restart the measurement of the read throughput and CPU usage"""
+        self.bytes_read = 0
+        self.read_calls = 0
+        self.rx_overflow_count = 0
+        self._statistics_start_time = time.perf_counter()
+        self._statistics_start_cpu = time.process_time()
+
+    def get_read_statistics(self):
+        """
+        Get the read throughput and CPU usage since the last reset_read_statistics().
+
+        The CPU time is the one of the whole process, so measure with the reader
+        running alone to compare read modes.
+
+        Returns:
+            dict: bytes, driver calls, elapsed time, throughput and CPU time per byte
+        """
+        elapsed = time.perf_counter() - self._statistics_start_time
+        cpu_time = time.process_time() - self._statistics_start_cpu
+        return {
+            'bytes_read': self.bytes_read,
+            'read_calls': self.read_calls,
+            'rx_overflow_count': self.rx_overflow_count,
+            'elapsed_s': elapsed,
+            'throughput_bps': self.bytes_read / elapsed if elapsed > 0 else 0.0,
+            'bytes_per_call': self.bytes_read / self.read_calls if self.read_calls else 0.0,
+            'cpu_ns_per_byte': cpu_time * 1e9 / self.bytes_read if self.bytes_read else 0.0,
+        }
+
     def write(self, data):
         """
         Write data to serial port.
@@ -269,4 +435,21 @@ class IprSensorSerial:
                 _start_char_found = True
             else:
                 _telegram.append(data)
-        return ''.join(_telegram)
\ No newline at end of file
+        return ''.join(_telegram)
+
+    def serial_ipr_read_telegram_bytes(self):
+        """
+        Read a complete telegram from the serial port in binary mode.
+        The bytes waiting in the driver are read in chunks (see read_chunk()) and split
+        on the Start of Frame (SOF) character (0x08); the 0x07 escape sequences are
+        already removed.
+
+        Returns:
+            bytes: Complete unescaped telegram
+        """
+        while not self._telegram_queue:
+            self.read_chunk(block=True)
+            for _view in self.rx_buffer.get_read_views():
+                self._telegram_queue.extend(self._telegram_framer.feed(_view))
+                self.rx_buffer.consume(len(_view))
+        return self._telegram_queue.popleft()
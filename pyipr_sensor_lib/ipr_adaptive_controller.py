@@ -0,0 +1,175 @@
+"""
+Adaptive batching and compression of the MQTT publisher.
+
+The controller gets the load of the uplink every few seconds (fill of the
+send queues, acknowledge latency, CPU usage of the thread compressing the
+data) and moves three settings within configured bounds:
+
+- the batch duration: longer batches compress better and need fewer
+  messages, shorter ones bring the data sooner
+- the compression level: a higher level saves bandwidth as long as the CPU
+  has headroom
+- the decimation factor (only 1 unless max_decimation is raised): last
+  resort when the link cannot carry the full rate
+
+On a congested link the settings are degraded one step at a time, in that
+order of preference: compression level first (if the CPU allows it), then
+batch duration, then decimation. Once the link has been idle for a few
+intervals, the decimation then the batch duration are restored one step at a
+time, so a good LAN link ends up with short batches and the full rate. The
+compression level is only lowered when the CPU is busy.
+"""
+CONTROL_INTERVAL = 2.0      # Time (s) between two adjustments
+CONGESTED_FILL = 0.5        # Queue or in-flight window fill above which the link is congested
+IDLE_FILL = 0.25            # Fill below which the link is idle
+LATENCY_LOW_MS = 100        # Acknowledge latency below which the link is idle
+LATENCY_HIGH_MS = 1000      # Acknowledge latency above which the link is congested
+CPU_HIGH = 0.8              # CPU usage (one core) above which the compression level is lowered
+CPU_HEADROOM = 0.5          # CPU usage (one core) below which the compression level can be raised
+IDLE_INTERVALS = 3          # Idle intervals needed before restoring one setting
+INITIAL_DURATION = 1.0      # Batch duration (s) at start, unless seeded by the publisher
+INITIAL_LEVEL = 6           # Compression level at start, unless seeded by the publisher
+
+
+class IPRAdaptiveController:
+    """Batch duration, compression level and decimation chosen from the uplink load"""
+
+    def __init__(self, min_duration=0.1, max_duration=10.0, min_level=1, max_level=9, max_decimation=1,
+                 initial_duration=None, initial_level=None, interval=CONTROL_INTERVAL,
+                 latency_low_ms=LATENCY_LOW_MS, latency_high_ms=LATENCY_HIGH_MS):
+        """
+        Initialize the controller.
+
+        Args:
+            min_duration (float): Shortest batch duration (s)
+            max_duration (float): Longest batch duration (s)
+            min_level (int): Lowest compression level
+            max_level (int): Highest compression level (bounded by the codec backend)
+            max_decimation (int): Highest decimation factor, 1 to always publish every sample
+            initial_duration (float): Batch duration at start (s), default: the publisher settings (see seed())
+            initial_level (int): Compression level at start, default: the codec level (see seed())
+            interval (float): Time (s) between two adjustments, measured by the caller
+            latency_low_ms (float): Acknowledge latency of an idle link
+            latency_high_ms (float): Acknowledge latency of a congested link
+        """
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.min_level = min_level
+        self.max_level = max_level
+        self.max_decimation = max(1, int(max_decimation))
+        self.interval = interval
+        self.latency_low_ms = latency_low_ms
+        self.latency_high_ms = latency_high_ms
+
+        self._initial_duration = initial_duration
+        self._initial_level = initial_level
+        self.batch_duration = INITIAL_DURATION if initial_duration is None else initial_duration
+        self.level = INITIAL_LEVEL if initial_level is None else initial_level
+        self._clamp()
+        self.decimation = 1
+
+        self.state = "starting"
+        self.adjustment_count = 0
+        self._idle_intervals = 0
+
+    def _clamp(self):
+        """Keep the batch duration and the compression level within their bounds"""
+        self.batch_duration = min(max(self.batch_duration, self.min_duration), self.max_duration)
+        self.level = min(max(self.level, self.min_level), self.max_level)
+
+    def seed(self, duration, level, level_range=None):
+        """
+        Start from the settings of the publisher, unless initial values were given to the constructor.
+
+        Args:
+            duration (float): Batch duration of the publisher (s)
+            level (int): Compression level of the codec
+            level_range (tuple): Lowest and highest level of the codec backend, narrowing min_level and max_level
+        """
+        if level_range is not None:
+            _lowest, _highest = level_range
+            self.min_level = min(max(self.min_level, _lowest), _highest)
+            self.max_level = min(max(self.max_level, self.min_level), _highest)
+        if self._initial_duration is None:
+            self.batch_duration = duration
+        if self._initial_level is None:
+            self.level = level
+        self._clamp()
+
+    def _degrade(self, cpu_usage):
+        """One step towards less bandwidth"""
+        if self.level < self.max_level and cpu_usage < CPU_HEADROOM:
+            self.level += 1
+        elif self.batch_duration < self.max_duration:
+            self.batch_duration = min(self.batch_duration * 2, self.max_duration)
+        elif self.decimation < self.max_decimation:
+            self.decimation = min(self.decimation * 2, self.max_decimation)
+        else:
+            return False
+        return True
+
+    def _restore(self):
+        """One step back towards the full rate and a low latency"""
+        if self.decimation > 1:
+            self.decimation = max(self.decimation // 2, 1)
+        elif self.batch_duration > self.min_duration:
+            self.batch_duration = max(self.batch_duration / 2, self.min_duration)
+        else:
+            return False
+        return True
+
+    def update(self, queue_fill, ack_latency_ms, cpu_usage):
+        """
+        Adjust the settings to the load measured over the last interval.
+
+        Args:
+            queue_fill (float): Fill of the send queues, 0 (empty) to 1 (full)
+            ack_latency_ms (float): Mean acknowledge latency over the interval, None if nothing was acknowledged
+            cpu_usage (float): CPU usage of the compressing thread over the interval, 0 to 1 (one core)
+
+        Returns:
+            bool: True if a setting changed
+        """
+        _changed = False
+
+        if cpu_usage > CPU_HIGH and self.level > self.min_level:
+            # Compression is too expensive for this CPU
+            self.level -= 1
+            _changed = True
+
+        _is_congested = queue_fill > CONGESTED_FILL or \
+            (ack_latency_ms is not None and ack_latency_ms > self.latency_high_ms)
+        _is_idle = queue_fill < IDLE_FILL and (ack_latency_ms is None or ack_latency_ms < self.latency_low_ms)
+
+        if _is_congested:
+            self.state = "congested"
+            self._idle_intervals = 0
+            _changed = self._degrade(cpu_usage) or _changed
+        elif _is_idle:
+            self.state = "idle"
+            self._idle_intervals += 1
+            if self._idle_intervals >= IDLE_INTERVALS:
+                self._idle_intervals = 0
+                _changed = self._restore() or _changed
+        else:
+            self.state = "steady"
+            self._idle_intervals = 0
+
+        if _changed:
+            self.adjustment_count += 1
+        return _changed
+
+    def get_status(self):
+        """
+        Get the current settings.
+
+        Returns:
+            dict: Link state, batch duration (s), compression level, decimation factor and adjustment count
+        """
+        return {
+            'state': self.state,
+            'batch_duration': self.batch_duration,
+            'level': self.level,
+            'decimation': self.decimation,
+            'adjustments': self.adjustment_count,
+        }
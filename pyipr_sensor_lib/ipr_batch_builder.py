@@ -0,0 +1,117 @@
+"""
+Preallocated batch buffer of the high-frequency MQTT payloads.
+
+A batch is a sequence of fixed-size rows, 9 float32 values (strain x, y, z,
+p1, p2, pdeg, accel x, y, z) followed by the uint64 host timestamp in ns
+('<9fQ', 44 bytes per sample). The rows are written with a precompiled
+struct.Struct.pack_into() straight into a bytearray allocated once, so adding
+a sample allocates neither a dict nor a bytes object. The timestamps are only
+known once the batch is complete (see IPRTimebase): the whole column is filled
+at once through a NumPy view of the same buffer. clear() recycles the buffer
+for the next batch.
+"""
+import struct
+
+import numpy as np
+
+HIGH_FREQ_FORMAT = '<9fQ'   # 9 floats + host timestamp (ns)
+HIGH_FREQ_STRUCT = struct.Struct(HIGH_FREQ_FORMAT)
+HIGH_FREQ_VALUE_COUNT = 9
+HIGH_FREQ_DTYPE = np.dtype([('values', '<f4', (HIGH_FREQ_VALUE_COUNT,)), ('timestamp', '<u8')])
+
+
+class IPRHighFreqBatch:
+    """Fixed-size rows of high-frequency samples in a reusable buffer"""
+
+    def __init__(self, capacity=1000):
+        """
+        Initialize the batch.
+
+        Args:
+            capacity (int): Number of samples preallocated, the buffer grows if it is exceeded
+        """
+        self.count = 0
+        self.anchors = list()  # (sample index, host reception time ns), see IPRTimebase.add_anchor()
+        self._allocate(max(1, int(capacity)))
+
+    def _allocate(self, capacity):
+        """Allocate the buffers, keeping the samples already written"""
+        _buffer = bytearray(capacity * HIGH_FREQ_STRUCT.size)
+        _device_timestamps = np.zeros(capacity, dtype=np.int64)
+        if self.count:
+            _size = self.count * HIGH_FREQ_STRUCT.size
+            _buffer[:_size] = self._buffer[:_size]
+            _device_timestamps[:self.count] = self._device_timestamps[:self.count]
+        self.capacity = capacity
+        self._buffer = _buffer
+        self._rows = np.frombuffer(_buffer, dtype=HIGH_FREQ_DTYPE)
+        self._device_timestamps = _device_timestamps
+
+    def __len__(self):
+        return self.count
+
+    def is_full(self):
+        """Check if the preallocated capacity is reached"""
+        return self.count >= self.capacity
+
+    def add(self, strain_x, strain_y, strain_z, strain_p1, strain_p2, strain_pdeg,
+            accel_x, accel_y, accel_z, device_timestamp, anchor_ns=None):
+        """
+        Write one sample at the end of the batch.
+
+        Args:
+            strain_x, strain_y, strain_z, strain_p1, strain_p2, strain_pdeg (float): Strain values
+            accel_x, accel_y, accel_z (float): Acceleration values
+            device_timestamp (int): Raw 27-bit device timestamp of the sample
+            anchor_ns (int): Host reception time (ns) if the sample is the last of a received chunk
+        """
+        if self.count >= self.capacity:
+            self._allocate(2 * self.capacity)
+        HIGH_FREQ_STRUCT.pack_into(self._buffer, self.count * HIGH_FREQ_STRUCT.size,
+                                   strain_x, strain_y, strain_z, strain_p1, strain_p2, strain_pdeg,
+                                   accel_x, accel_y, accel_z, 0)
+        self._device_timestamps[self.count] = device_timestamp
+        if anchor_ns is not None:
+            self.anchors.append((self.count, anchor_ns))
+        self.count += 1
+
+    def get_device_timestamps(self):
+        """
+        Get the device timestamps of the samples.
+
+        Returns:
+            numpy.ndarray: View of the raw device timestamps, valid until clear()
+        """
+        return self._device_timestamps[:self.count]
+
+    def set_timestamps(self, timestamps_ns):
+        """
+        Fill the host timestamp column of every sample.
+
+        Args:
+            timestamps_ns (array-like): Host timestamps in ns, one per sample
+        """
+        self._rows['timestamp'][:self.count] = timestamps_ns
+
+    def get_rows(self):
+        """
+        Get the samples as a structured array.
+
+        Returns:
+            numpy.ndarray: View ('values', 'timestamp') of the buffer, valid until clear()
+        """
+        return self._rows[:self.count]
+
+    def get_payload(self):
+        """
+        Get the packed samples.
+
+        Returns:
+            memoryview: '<9fQ' rows of the batch, valid until clear() (copy it to keep it)
+        """
+        return memoryview(self._buffer)[:self.count * HIGH_FREQ_STRUCT.size]
+
+    def clear(self):
+        """Empty the batch, the buffer is reused"""
+        self.count = 0
+        self.anchors.clear()
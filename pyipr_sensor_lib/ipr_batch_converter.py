@@ -0,0 +1,255 @@
+"""
+Parallel conversion of IPR binary recordings to NumPy files.
+
+Every .bin file is decoded by IPRBatchDecoder in a worker process and saved
+as a compressed .npz file holding one structured array per packet type
+("STRAIN", "ENVIRONMENT", "ACCELERATION"). Run from the command line:
+
+    python -m pyipr_sensor_lib.ipr_batch_converter INPUT_DIR OUTPUT_DIR [WORKERS]
+"""
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from pyipr_sensor_lib.ipr_batch_decoder import IPRBatchDecoder
+
+BINARY_EXTENSION = ".bin"
+OUTPUT_EXTENSION = ".npz"
+TEMPORARY_SUFFIX = ".part"  # Output being written, renamed once complete
+
+
+def natural_sort_key(filename):
+    """
+    Sort key putting numbered names in numeric order ("..._9-5-2.bin" before "..._10-0-0.bin").
+
+    Args:
+        filename (str): File name
+
+    Returns:
+        list: Alternating text and integer parts of the name
+    """
+    return [int(_part) if _part.isdigit() else _part for _part in re.split(r'(\d+)', filename)]
+
+
+def get_output_path(bin_path, output_dir):
+    """
+    Get the path of the converted file of a recording.
+
+    Args:
+        bin_path (str): Path of the binary recording
+        output_dir (str): Directory of the converted files
+
+    Returns:
+        str: output_dir/<recording name>.npz
+    """
+    _name = os.path.splitext(os.path.basename(bin_path))[0]
+    return os.path.join(output_dir, _name + OUTPUT_EXTENSION)
+
+
+def is_converted(bin_path, output_path):
+    """
+    Check if a recording was already converted.
+
+    The output is written under a temporary name and renamed once complete, so
+    an existing output is always complete. It is only reused if it is newer
+    than the recording (a recording still being written is converted again).
+
+    Args:
+        bin_path (str): Path of the binary recording
+        output_path (str): Path of its converted file
+
+    Returns:
+        bool: True if the conversion can be skipped
+    """
+    return os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(bin_path)
+
+
+def convert_file(bin_path, output_path):
+    """
+    Decode a binary recording and save it as a compressed .npz file.
+
+    Runs in a worker process, so it only takes and returns picklable values.
+
+    Args:
+        bin_path (str): Path of the binary recording
+        output_path (str): Path of the .npz file to write
+
+    Returns:
+        dict: Input path, output path, input size, record count per packet type,
+              invalid telegram count and decoding time
+    """
+    _start = time.perf_counter()
+    _decoder = IPRBatchDecoder()
+    _directory, _filename = os.path.split(bin_path)
+    _records = _decoder.load_from_binary_file(os.path.join(_directory, ''), _filename)
+
+    _temporary_path = output_path + TEMPORARY_SUFFIX
+    with open(_temporary_path, 'wb') as file:
+        np.savez_compressed(file, **_records)
+    os.replace(_temporary_path, output_path)
+
+    return {
+        'input': bin_path,
+        'output': output_path,
+        'size': os.path.getsize(bin_path),
+        'records': {_name: int(_array.size) for _name, _array in _records.items()},
+        'invalid': _decoder.invalid_data_number,
+        'duration_s': time.perf_counter() - _start,
+        'skipped': False,
+    }
+
+
+class IPRBatchConverter:
+    """
+    Converts many binary recordings in parallel, one file per worker process.
+
+    Files are spread over a ProcessPoolExecutor (one worker per core by
+    default). Progress is reported as the files complete, while the results
+    are returned in the order of the input files. Files already converted are
+    skipped, so an interrupted conversion resumes where it stopped.
+    """
+
+    def __init__(self, output_dir, workers=None, resume=True, verbose=True):
+        """
+        Initialize the converter.
+
+        Args:
+            output_dir (str): Directory of the converted files (created if needed)
+            workers (int): Number of worker processes (default: number of cores)
+            resume (bool): Skip the recordings already converted
+            verbose (bool): Print the progress to console
+        """
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.resume = resume
+        self.verbose = verbose
+
+    @staticmethod
+    def list_recordings(input_dir):
+        """
+        List the binary recordings of a directory.
+
+        Args:
+            input_dir (str): Directory to scan
+
+        Returns:
+            list: Paths of the .bin files, in natural name order
+        """
+        _names = [_name for _name in os.listdir(input_dir) if _name.endswith(BINARY_EXTENSION)]
+        return [os.path.join(input_dir, _name) for _name in sorted(_names, key=natural_sort_key)]
+
+    def convert_directory(self, input_dir, progress_callback=None):
+        """
+        Convert every binary recording of a directory.
+
+        Args:
+            input_dir (str): Directory of the .bin files
+            progress_callback: Optional function called as progress_callback(done, total, result)
+
+        Returns:
+            list: One result dict per recording (see convert_file()), in natural name order
+        """
+        return self.convert(self.list_recordings(input_dir), progress_callback)
+
+    def convert(self, bin_paths, progress_callback=None):
+        """
+        Convert binary recordings in parallel.
+
+        Args:
+            bin_paths (list): Paths of the binary recordings
+            progress_callback: Optional function called as progress_callback(done, total, result)
+                               each time a recording completes
+
+        Returns:
+            list: One result dict per recording (see convert_file()), in the order of bin_paths.
+                  Recordings which failed have an 'error' entry instead of the record counts.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        _total = len(bin_paths)
+        _results = [None] * _total
+        _done = 0
+        _start = time.perf_counter()
+        _converted_size = 0
+
+        # Skip what is already converted
+        _pending = list()
+        for _index, _bin_path in enumerate(bin_paths):
+            _output_path = get_output_path(_bin_path, self.output_dir)
+            if self.resume and is_converted(_bin_path, _output_path):
+                _results[_index] = {'input': _bin_path, 'output': _output_path, 'skipped': True}
+                _done += 1
+            else:
+                _pending.append((_index, _bin_path, _output_path))
+
+        if self.verbose:
+            print(f"{_total} recordings, {_done} already converted, {len(_pending)} to convert "
+                  f"with {self.workers} workers")
+
+        # Largest files first, so the last running worker does not hold up the end
+        _pending.sort(key=lambda _item: os.path.getsize(_item[1]), reverse=True)
+
+        _executor = ProcessPoolExecutor(max_workers=self.workers)
+        _futures = dict()
+        try:
+            _futures = {_executor.submit(convert_file, _bin_path, _output_path): (_index, _bin_path, _output_path)
+                        for _index, _bin_path, _output_path in _pending}
+            for _future in as_completed(_futures):
+                _index, _bin_path, _output_path = _futures[_future]
+                try:
+                    _result = _future.result()
+                    _converted_size += _result['size']
+                except Exception as e:
+                    _result = {'input': _bin_path, 'output': _output_path, 'skipped': False, 'error': str(e)}
+                _results[_index] = _result
+                _done += 1
+
+                if self.verbose:
+                    self._print_progress(_done, _total, _result, _converted_size, time.perf_counter() - _start)
+                if progress_callback is not None:
+                    progress_callback(_done, _total, _result)
+
+        except KeyboardInterrupt:
+            print("Conversion interrupted, run it again to resume")
+            for _future in _futures:
+                _future.cancel()  # Pending recordings only, the ones being converted are completed
+            _executor.shutdown(wait=True)
+            raise
+
+        _executor.shutdown(wait=True)
+        return _results
+
+    @staticmethod
+    def _print_progress(done, total, result, converted_size, elapsed):
+        """Print one line per completed recording"""
+        _name = os.path.basename(result['input'])
+        if 'error' in result:
+            print(f"[{done}/{total}] ✗ {_name}: {result['error']}")
+            return
+        _throughput = converted_size / elapsed / 1e6 if elapsed > 0 else 0.0
+        _records = sum(result['records'].values())
+        print(f"[{done}/{total}] ✓ {_name}: {_records} records, {result['invalid']} invalid | "
+              f"{result['duration_s']:.1f} s | {_throughput:.1f} MB/s overall")
+
+
+def main():
+    """
+    Convert a directory of recordings from the command line.
+
+    Usage: python -m pyipr_sensor_lib.ipr_batch_converter INPUT_DIR OUTPUT_DIR [WORKERS]
+    """
+    if len(sys.argv) < 3:
+        print(main.__doc__)
+        return
+
+    _workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    _results = IPRBatchConverter(sys.argv[2], _workers).convert_directory(sys.argv[1])
+    _errors = [_result for _result in _results if 'error' in _result]
+    print(f"Done: {len(_results) - len(_errors)} converted, {len(_errors)} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,429 @@
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from pyipr_sensor_lib.ipr_parser import IPRParser
+from pyipr_sensor_lib.ipr_telegram_framer import SOF_BYTE, ESCAPE_BYTE, ESCAPED_SOF, ESCAPED_ESCAPE
+
+# Number of bytes kept per telegram, enough for the longest (strain) packet
+TELEGRAM_WIDTH = IPRParser.MIN_TELEGRAM_SIZE_STRAIN
+
+# Size of the blocks read from a binary file
+READ_BLOCK_SIZE = 4 * 1024 * 1024  # 4 MB, decoding needs about 30 times the block size
+
+# Smallest byte range decoded by a worker process in parallel mode
+MIN_SPLIT_SIZE = 1024 * 1024  # 1 MB
+
+# Header fields shared by all packet types (see IPRParser.parser_get_header)
+_HEADER_FIELDS = [('id', 'u1'), ('crc', 'u1'), ('sequence', 'u1'), ('timestamp', 'u4')]
+
+STRAIN_DTYPE = np.dtype(_HEADER_FIELDS + [
+    ('raw_x', 'u2'), ('raw_y', 'u2'), ('raw_z', 'u2'),
+    ('raw_p1', 'u2'), ('raw_p2', 'u2'), ('raw_pdeg', 'u2'),
+    ('strain_x', 'f4'), ('strain_y', 'f4'), ('strain_z', 'f4'),
+    ('strain_p1', 'f4'), ('strain_p2', 'f4'), ('strain_pdeg', 'f4'),
+])
+
+ENVIRONMENT_DTYPE = np.dtype(_HEADER_FIELDS + [
+    ('raw_v_batt', 'u2'), ('raw_pressure', 'u2'), ('raw_humidity', 'u2'), ('raw_temperature', 'u2'),
+    ('v_batt', 'f4'), ('pressure', 'f4'), ('humidity', 'f4'), ('temperature', 'f4'),
+])
+
+ACCELERATION_DTYPE = np.dtype(_HEADER_FIELDS + [
+    ('raw_x', 'u2'), ('raw_y', 'u2'), ('raw_z', 'u2'),
+    ('accel_x', 'f4'), ('accel_y', 'f4'), ('accel_z', 'f4'),
+])
+
+# Packet type name -> (telegram ID, minimum size in bytes, record dtype)
+PACKET_TYPES = {
+    "STRAIN": (0x00, IPRParser.MIN_TELEGRAM_SIZE_STRAIN, STRAIN_DTYPE),
+    "ENVIRONMENT": (0x01, IPRParser.MIN_TELEGRAM_SIZE_ENVIRONMENT, ENVIRONMENT_DTYPE),
+    "ACCELERATION": (0x02, IPRParser.MIN_TELEGRAM_SIZE_ACCELERATION, ACCELERATION_DTYPE),
+}
+
+
+def convert_numeric_to_scale(values, in_min, in_max, out_min, out_max):
+    """
+    Vectorized version of IPRParser.convert_numeric_to_scale().
+
+    Args:
+        values (numpy.ndarray): Raw sensor values
+        in_min: Minimum input range
+        in_max: Maximum input range
+        out_min: Minimum output range
+        out_max: Maximum output range
+
+    Returns:
+        numpy.ndarray: Scaled values (float32), 0 where the raw value is 0
+    """
+    _slope = (out_max - out_min) / (in_max - in_min)
+    _offset = out_min - _slope
+    _interpolation = np.where(values != 0, _slope * values.astype(np.float64) + _offset, 0.0)
+    return _interpolation.astype(np.float32)
+
+
+def frame_buffer(buffer, width=TELEGRAM_WIDTH, final=True):
+    """
+    Split a raw binary stream into telegrams and undo the 0x07 escapes, all at once.
+
+    Follows the same rules as IPRTelegramFramer: every 0x08 ends a telegram,
+    0x07 0x55 becomes 0x08, 0x07 0xAA becomes 0x07 and any other escaped byte is
+    dropped. Empty telegrams are skipped.
+
+    Args:
+        buffer (bytes-like): Raw data as written by IprSensorSerialLoggerThread
+        width (int): Number of bytes kept per telegram
+        final (bool): If True, the data after the last 0x08 is returned as a
+                      telegram too, otherwise it is ignored
+
+    Returns:
+        tuple: (numpy.ndarray (N, width) of uint8 zero padded telegrams,
+                numpy.ndarray (N,) of unescaped telegram lengths)
+    """
+    _data = np.frombuffer(buffer, dtype=np.uint8)
+    _size = _data.size
+    if _size == 0:
+        return np.zeros((0, width), dtype=np.uint8), np.zeros(0, dtype=np.int64)
+
+    # Per-byte temporaries: 32-bit indexes unless the buffer is larger than 2 GB
+    _index_dtype = np.int32 if _size < 2 ** 31 else np.int64
+    _is_sof = _data == SOF_BYTE
+    _is_escape = _data == ESCAPE_BYTE
+
+    # In a run of 0x07 bytes, every other byte starts an escape sequence
+    _run_start = _is_escape.copy()
+    _run_start[1:] &= ~_is_escape[:-1]
+    _run_start_index = np.where(_run_start, np.arange(_size, dtype=_index_dtype), _index_dtype(0))
+    np.maximum.accumulate(_run_start_index, out=_run_start_index)
+    # Even distance to the run start: the byte and the run start have the same index parity
+    _is_odd = np.zeros(_size, dtype=bool)
+    _is_odd[1::2] = True
+    _is_active_escape = _is_escape & (_is_odd == (_run_start_index & 1).astype(bool))
+    del _run_start, _run_start_index, _is_odd
+
+    # The byte following an escape is its code, a SOF always stays a frame boundary
+    _is_code = np.zeros(_size, dtype=bool)
+    _is_code[1:] = _is_active_escape[:-1]
+    _is_code &= ~_is_sof
+
+    _values = _data.copy()
+    _values[_is_code & (_data == ESCAPED_SOF)] = SOF_BYTE
+    _values[_is_code & (_data == ESCAPED_ESCAPE)] = ESCAPE_BYTE
+    _is_dropped_code = _is_code & (_data != ESCAPED_SOF) & (_data != ESCAPED_ESCAPE)
+
+    _is_content = ~(_is_sof | _is_active_escape | _is_dropped_code)
+    del _is_escape, _is_active_escape, _is_code, _is_dropped_code
+    if not final:
+        # Data after the last SOF belongs to a telegram which is not complete yet
+        _is_content[_size - np.argmax(_is_sof[::-1]) if _is_sof.any() else 0:] = False
+
+    _segment = np.cumsum(_is_sof, dtype=_index_dtype)[_is_content]
+    _values = _values[_is_content]
+    if _values.size == 0:
+        return np.zeros((0, width), dtype=np.uint8), np.zeros(0, dtype=np.int64)
+
+    # Position of each byte inside its telegram
+    _is_start = np.empty(_values.size, dtype=bool)
+    _is_start[0] = True
+    np.not_equal(_segment[1:], _segment[:-1], out=_is_start[1:])
+    del _segment
+    _starts = np.flatnonzero(_is_start).astype(_index_dtype)
+    _lengths = np.diff(np.append(_starts, _values.size)).astype(np.int64)
+    _row = np.repeat(np.arange(_starts.size, dtype=_index_dtype), _lengths)
+    _column = np.arange(_values.size, dtype=_index_dtype)
+    _column -= np.repeat(_starts, _lengths)
+
+    _matrix = np.zeros((_starts.size, width), dtype=np.uint8)
+    _in_width = _column < width
+    _matrix[_row[_in_width], _column[_in_width]] = _values[_in_width]
+    return _matrix, _lengths
+
+
+def find_split_offsets(buffer, split_size):
+    """
+    Cut a raw binary stream into byte ranges on real frame boundaries.
+
+    Every 0x08 of the stream is a Start of Frame, the escape rules never produce
+    one inside a telegram (0x08 is sent as 0x07 0x55), and an escape sequence
+    never spans a SOF. Each nominal cut is therefore moved just after the next
+    0x08, and every range decodes exactly like the same bytes inside the whole
+    stream.
+
+    Args:
+        buffer (bytes-like or mmap.mmap): Raw data as written by IprSensorSerialLoggerThread
+        split_size (int): Nominal size of the ranges
+
+    Returns:
+        list: (start, end) byte offsets of the consecutive ranges covering the buffer
+    """
+    _size = len(buffer)
+    _sof = bytes([SOF_BYTE])
+    _ranges = list()
+    _start = 0
+    while _start < _size:
+        _cut = _start + max(1, split_size)
+        _sof_index = buffer.find(_sof, _cut - 1) if _cut < _size else -1
+        _end = _size if _sof_index < 0 else _sof_index + 1
+        _ranges.append((_start, _end))
+        _start = _end
+    return _ranges
+
+
+def decode_file_range(path, start, end, final):
+    """
+    Decode a byte range of a binary recording (worker process of the parallel mode).
+
+    Args:
+        path (str): Path of the binary recording
+        start (int): Offset of the first byte, just after a SOF or 0
+        end (int): Offset after the last byte, just after a SOF or the end of the file
+        final (bool): True for the last range of the file
+
+    Returns:
+        tuple: (dict packet type name -> structured array, number of invalid telegrams)
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        _buffer = file.read(end - start)
+    _decoder = IPRBatchDecoder()
+    _records = _decoder.decode_buffer(_buffer, final=final)
+    return _records, _decoder.invalid_data_number
+
+
+class IPRBatchDecoder:
+    """
+    Vectorized decoder turning whole IPR recordings into NumPy structured arrays.
+
+    Telegrams are decoded all at once instead of one IPRParser per packet. The
+    result holds one structured array per packet type ("STRAIN", "ENVIRONMENT"
+    and "ACCELERATION") with the header fields (id, crc, sequence, timestamp),
+    the raw values and the values scaled to real-world units. Values are
+    identical to the ones produced by IPRSensorDecoder.analyse_packet().
+    """
+
+    def __init__(self, read_block_size=READ_BLOCK_SIZE):
+        """
+        Initialize the batch decoder.
+
+        Args:
+            read_block_size (int): Size of the blocks read from binary files
+        """
+        self.read_block_size = read_block_size
+        self.invalid_data_number = 0  # Telegrams rejected by the last decode
+        self.discarded_bytes = 0  # Data without any SOF dropped by the last iter_decode_stream()
+
+    @staticmethod
+    def empty_result():
+        """
+        Get a result without any record.
+
+        Returns:
+            dict: Packet type name -> empty structured array
+        """
+        return {_name: np.zeros(0, dtype=_dtype) for _name, (_id, _size, _dtype) in PACKET_TYPES.items()}
+
+    def decode_buffer(self, buffer, final=True):
+        """
+        Decode every telegram of a raw binary buffer.
+
+        Args:
+            buffer (bytes-like): Raw data as written by IprSensorSerialLoggerThread
+            final (bool): If True, the data after the last 0x08 is decoded too
+
+        Returns:
+            dict: Packet type name -> structured array of decoded records
+        """
+        self.invalid_data_number = 0
+        _matrix, _lengths = frame_buffer(buffer, final=final)
+        return self.decode_telegrams(_matrix, _lengths)
+
+    def decode_telegrams(self, matrix, lengths):
+        """
+        Decode telegrams already framed by frame_buffer().
+
+        Args:
+            matrix (numpy.ndarray): (N, width) uint8 zero padded telegrams
+            lengths (numpy.ndarray): (N,) unescaped telegram lengths
+
+        Returns:
+            dict: Packet type name -> structured array of decoded records
+        """
+        _byte = [matrix[:, i].astype(np.uint32) for i in range(matrix.shape[1])]
+
+        # Header (see IPRParser.parser_get_header)
+        _id = _byte[0] & 0x03
+        _crc = (_byte[0] & 0x04) >> 2
+        _crc_computed = ((_byte[0] & 0x02) >> 1) ^ (_byte[0] & 0x01)
+        _is_valid = (_crc == _crc_computed) & (lengths >= IPRParser.MIN_TELEGRAM_SIZE)
+        self.invalid_data_number += int(np.count_nonzero(~_is_valid))
+
+        _result = dict()
+        for _name, (_packet_id, _min_size, _dtype) in PACKET_TYPES.items():
+            _selected = _is_valid & (_id == _packet_id) & (lengths >= _min_size)
+            _b = [_column[_selected] for _column in _byte]
+            _records = np.zeros(_b[0].size, dtype=_dtype)
+            _records['id'] = _packet_id
+            _records['crc'] = _crc[_selected]
+            _records['sequence'] = _b[0] & 0x38
+            _records['timestamp'] = (((_b[4] & 0x01) << 26) + (_b[3] << 18) + (_b[2] << 10) +
+                                     (_b[1] << 2) + ((_b[0] & 0xC0) >> 6))
+            if _name == "STRAIN":
+                self._decode_strain(_b, _records)
+            elif _name == "ENVIRONMENT":
+                self._decode_environment(_b, _records)
+            else:
+                self._decode_acceleration(_b, _records)
+            _result[_name] = _records
+        return _result
+
+    @staticmethod
+    def _decode_strain(b, records):
+        """Vectorized IPRParser.parser_get_strain() and strain scaling."""
+        records['raw_x'] = ((b[5] & 0x3F) << 7) + ((b[4] & 0xFE) >> 1)
+        records['raw_y'] = ((b[7] & 0x07) << 10) + (b[6] << 2) + ((b[5] & 0xC0) >> 6)
+        records['raw_z'] = (b[8] << 5) + ((b[7] & 0xF8) >> 3)
+        records['raw_p1'] = ((b[10] & 0x1F) << 8) + b[9]
+        records['raw_p2'] = ((b[12] & 0x03) << 11) + ((b[11] & 0x1F) << 3) + ((b[10] & 0xE0) >> 5)
+        records['raw_pdeg'] = ((b[13] & 0x7F) << 6) + ((b[12] & 0xFC) >> 2)
+
+        for _raw, _scaled in (('raw_x', 'strain_x'), ('raw_y', 'strain_y'), ('raw_z', 'strain_z'),
+                              ('raw_p1', 'strain_p1'), ('raw_p2', 'strain_p2')):
+            records[_scaled] = convert_numeric_to_scale(records[_raw], 1, 8191, -3000, 3000)
+        records['strain_pdeg'] = convert_numeric_to_scale(records['raw_pdeg'], 1, 8191, -90, 90)
+
+    @staticmethod
+    def _decode_environment(b, records):
+        """Vectorized IPRParser.parser_get_environment() and environment scaling."""
+        records['raw_v_batt'] = ((b[5] & 0x02) << 7) + ((b[4] & 0xFE) >> 1)
+        records['raw_pressure'] = (b[6] << 6) + ((b[5] & 0xFC) >> 2)
+        records['raw_humidity'] = ((b[8] & 0x03) << 8) + b[7]
+        records['raw_temperature'] = ((b[9] & 0x1F) << 6) + ((b[8] & 0xFC) >> 2)
+
+        records['v_batt'] = convert_numeric_to_scale(records['raw_v_batt'], 1, 511, 0, 4)
+        records['pressure'] = convert_numeric_to_scale(records['raw_pressure'], 1, 16383, 0, 1200)
+        records['humidity'] = convert_numeric_to_scale(records['raw_humidity'], 1, 1023, 0, 100)
+        records['temperature'] = convert_numeric_to_scale(records['raw_temperature'], 1, 2047, -60, 115)
+
+    @staticmethod
+    def _decode_acceleration(b, records):
+        """Vectorized IPRParser.parser_get_acceleration() and acceleration scaling."""
+        records['raw_x'] = ((b[5] & 0x1F) << 7) + ((b[4] & 0xFE) >> 1)
+        records['raw_y'] = ((b[7] & 0x01) << 11) + (b[6] << 3) + ((b[5] & 0xE0) >> 5)
+        records['raw_z'] = ((b[8] & 0x1F) << 7) + ((b[7] & 0xFE) >> 1)
+
+        for _raw, _scaled in (('raw_x', 'accel_x'), ('raw_y', 'accel_y'), ('raw_z', 'accel_z')):
+            records[_scaled] = convert_numeric_to_scale(records[_raw], 1, 4095, -16, 16)
+
+    def iter_decode_stream(self, stream):
+        """
+        Decode a binary stream block by block.
+
+        Blocks are cut on SOF bytes and the incomplete telegram at the end of a
+        block is carried to the next one, so the memory used stays bounded by
+        read_block_size whatever the size of the recording. Data without any
+        SOF over more than read_block_size is line noise: it is dropped and
+        counted in discarded_bytes (and as one invalid telegram).
+
+        Args:
+            stream: Binary stream object (with read() method)
+
+        Yields:
+            dict: Packet type name -> structured array of the records of one block
+        """
+        _invalid_data_number = 0
+        _pending = bytearray()
+        self.discarded_bytes = 0
+
+        while True:
+            _block = stream.read(self.read_block_size)
+            _is_last = not _block
+            if _is_last:
+                _data = _pending
+            else:
+                # Keep the incomplete telegram after the last SOF for the next block
+                _new_data_start = len(_pending)
+                _pending += _block
+                _last_sof = _pending.rfind(SOF_BYTE, _new_data_start)
+                if _last_sof < 0:
+                    if len(_pending) > self.read_block_size:
+                        self.discarded_bytes += len(_pending)
+                        _invalid_data_number += 1
+                        _pending.clear()
+                    continue
+                _data = _pending[:_last_sof + 1]
+                del _pending[:_last_sof + 1]
+
+            _records = self.decode_buffer(_data, final=_is_last)
+            _invalid_data_number += self.invalid_data_number
+            self.invalid_data_number = _invalid_data_number
+            yield _records
+
+            if _is_last:
+                break
+
+    def load_from_binary_file(self, filepath, filename):
+        """
+        Decode a whole binary recording into structured arrays.
+
+        Args:
+            filepath (str): Path to the directory containing the file
+            filename (str): Name of the binary file to process
+
+        Returns:
+            dict: Packet type name -> structured array of decoded records
+        """
+        _parts = {_name: list() for _name in PACKET_TYPES}
+
+        with open(filepath + filename, 'rb') as file:
+            for _block_records in self.iter_decode_stream(file):
+                for _name, _records in _block_records.items():
+                    _parts[_name].append(_records)
+
+        return {_name: np.concatenate(_records) for _name, _records in _parts.items()}
+
+    def load_from_binary_file_parallel(self, filepath, filename, workers=None):
+        """
+        Decode a whole binary recording on several cores.
+
+        The file is cut into byte ranges on real frame boundaries (see
+        find_split_offsets()), the ranges are decoded in worker processes and
+        the results are concatenated in file order. The result is identical to
+        load_from_binary_file().
+
+        Args:
+            filepath (str): Path to the directory containing the file
+            filename (str): Name of the binary file to process
+            workers (int): Number of worker processes (default: number of cores)
+
+        Returns:
+            dict: Packet type name -> structured array of decoded records
+        """
+        _path = filepath + filename
+        _workers = workers or os.cpu_count() or 1
+        _size = os.path.getsize(_path)
+        if _size == 0:
+            self.invalid_data_number = 0
+            return self.empty_result()
+
+        # One range per worker, small enough to bound the memory of each worker
+        _split_size = min(self.read_block_size, max(MIN_SPLIT_SIZE, -(-_size // _workers)))
+        with open(_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            _ranges = find_split_offsets(buffer, _split_size)
+
+        if len(_ranges) == 1 or _workers == 1:
+            return self.load_from_binary_file(filepath, filename)
+
+        _parts = {_name: list() for _name in PACKET_TYPES}
+        self.invalid_data_number = 0
+        with ProcessPoolExecutor(max_workers=min(_workers, len(_ranges))) as executor:
+            _futures = [executor.submit(decode_file_range, _path, _start, _end, _end == _size)
+                        for _start, _end in _ranges]
+            for _future in _futures:  # In file order
+                _records, _invalid_data_number = _future.result()
+                self.invalid_data_number += _invalid_data_number
+                for _name, _array in _records.items():
+                    _parts[_name].append(_array)
+
+        return {_name: np.concatenate(_records) for _name, _records in _parts.items()}
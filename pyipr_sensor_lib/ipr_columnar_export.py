@@ -0,0 +1,305 @@
+"""
+Columnar export of IPR binary recordings.
+
+A recording is decoded once, block by block, and its strain, environment and
+acceleration series are written to a directory holding one columnar file per
+packet type:
+
+- <TYPE>.parquet when pyarrow is installed: compressed Parquet row groups,
+  with the min/max statistics of every column kept by Parquet itself
+- <TYPE>.npz otherwise: a zip archive with one compressed array per column
+  and per chunk ("<column>/<chunk>"), plus a "statistics" array holding the
+  number of rows and the min/max of every column of each chunk
+
+Besides the decoded fields, every record gets a 'timestamp_unwrapped' column:
+the device timestamp unwrapped across the 27-bit counter rollovers, so time
+ranges can be selected from the statistics without reading the data.
+"""
+import os
+import zipfile
+
+import numpy as np
+
+from pyipr_sensor_lib.ipr_batch_decoder import IPRBatchDecoder, PACKET_TYPES
+from pyipr_sensor_lib.ipr_timebase import unwrap_timestamps
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = None
+    pq = None
+
+FORMAT_PARQUET = "parquet"
+FORMAT_NPZ = "npz"
+
+ROW_GROUP_SIZE = 65536  # Rows per row group / chunk
+EXPORT_BLOCK_SIZE = 4 * 1024 * 1024  # 4 MB of raw data decoded at once
+PARQUET_COMPRESSION = "zstd"
+
+UNWRAPPED_TIMESTAMP = 'timestamp_unwrapped'
+
+
+def get_default_format():
+    """
+    Get the best export format available.
+
+    Returns:
+        str: FORMAT_PARQUET if pyarrow is installed, else FORMAT_NPZ
+    """
+    return FORMAT_PARQUET if pyarrow is not None else FORMAT_NPZ
+
+
+def add_unwrapped_timestamp(records, previous):
+    """
+    Unwrap the device timestamps of a block of records.
+
+    Args:
+        records (numpy.ndarray): Structured array with a 'timestamp' field
+        previous (tuple): Unwrap state returned for the previous block, or None (see unwrap_timestamps())
+
+    Returns:
+        tuple: (structured array with the extra UNWRAPPED_TIMESTAMP field, new previous tuple)
+    """
+    _dtype = np.dtype(records.dtype.descr + [(UNWRAPPED_TIMESTAMP, 'u8')])
+    _result = np.zeros(records.size, dtype=_dtype)
+    for _name in records.dtype.names:
+        _result[_name] = records[_name]
+    if records.size == 0:
+        return _result, previous
+
+    _result[UNWRAPPED_TIMESTAMP], previous = unwrap_timestamps(records['timestamp'], previous)
+    return _result, previous
+
+
+class _ParquetWriter:
+    """Writes the row groups of one packet type to a Parquet file"""
+
+    def __init__(self, path, compression=PARQUET_COMPRESSION):
+        self.path = path
+        self.compression = compression
+        self._writer = None
+
+    def write_chunk(self, records):
+        _table = pyarrow.table({_name: records[_name] for _name in records.dtype.names})
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, _table.schema, compression=self.compression,
+                                            write_statistics=True)
+        self._writer.write_table(_table, row_group_size=records.size)
+
+    def close(self, dtype):
+        if self._writer is None:
+            # No record: still write the schema
+            _empty = np.zeros(0, dtype=dtype)
+            pq.write_table(pyarrow.table({_name: _empty[_name] for _name in dtype.names}), self.path)
+        else:
+            self._writer.close()
+
+
+class _NpzWriter:
+    """Writes the chunks of one packet type to a compressed .npz archive"""
+
+    def __init__(self, path):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        self._statistics = list()
+
+    def _write_array(self, name, array):
+        with self._zip.open(name + '.npy', mode='w', force_zip64=True) as file:
+            np.lib.format.write_array(file, np.ascontiguousarray(array), allow_pickle=False)
+
+    def write_chunk(self, records):
+        _chunk = len(self._statistics)
+        _statistics = [records.size]
+        for _name in records.dtype.names:
+            self._write_array(f"{_name}/{_chunk:06d}", records[_name])
+            _statistics += [records[_name].min(), records[_name].max()]
+        self._statistics.append(tuple(_statistics))
+
+    def close(self, dtype):
+        _fields = [('rows', 'u8')]
+        for _name in dtype.names:
+            _fields += [(_name + '_min', dtype[_name]), (_name + '_max', dtype[_name])]
+        self._write_array("statistics", np.array(self._statistics, dtype=_fields))
+        self._zip.close()
+
+
+class IPRColumnarExporter:
+    """
+    Streaming exporter of IPR binary recordings to a chunked columnar format.
+
+    The recording is read and decoded EXPORT_BLOCK_SIZE bytes at a time with
+    IPRBatchDecoder.iter_decode_stream(), and the records are written in
+    row groups of row_group_size rows, so the memory used stays bounded
+    whatever the size of the recording.
+    """
+
+    def __init__(self, export_format=None, row_group_size=ROW_GROUP_SIZE, block_size=EXPORT_BLOCK_SIZE):
+        """
+        Initialize the exporter.
+
+        Args:
+            export_format (str): FORMAT_PARQUET or FORMAT_NPZ (default: Parquet if pyarrow is installed)
+            row_group_size (int): Number of rows per row group / chunk
+            block_size (int): Number of raw bytes decoded at once
+        """
+        self.export_format = export_format or get_default_format()
+        if self.export_format == FORMAT_PARQUET and pyarrow is None:
+            raise ImportError("pyarrow is required for the Parquet export, use FORMAT_NPZ instead")
+        self.row_group_size = row_group_size
+        self.block_size = block_size
+
+        # Statistics of the last export
+        self.record_count = {_name: 0 for _name in PACKET_TYPES}
+        self.invalid_data_number = 0
+
+    def export_file(self, bin_path, output_dir):
+        """
+        Export a binary recording.
+
+        Args:
+            bin_path (str): Path of the binary recording
+            output_dir (str): Directory receiving one file per packet type (created if needed)
+
+        Returns:
+            dict: Packet type name -> path of the written file
+        """
+        with open(bin_path, 'rb') as file:
+            return self.export_stream(file, output_dir)
+
+    def export_stream(self, stream, output_dir):
+        """
+        Export a binary stream.
+
+        Args:
+            stream: Binary stream object (with read() method)
+            output_dir (str): Directory receiving one file per packet type (created if needed)
+
+        Returns:
+            dict: Packet type name -> path of the written file
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        _paths = {_name: os.path.join(output_dir, f"{_name}.{self.export_format}") for _name in PACKET_TYPES}
+        if self.export_format == FORMAT_PARQUET:
+            _writers = {_name: _ParquetWriter(_path) for _name, _path in _paths.items()}
+        else:
+            _writers = {_name: _NpzWriter(_path) for _name, _path in _paths.items()}
+
+        self.record_count = {_name: 0 for _name in PACKET_TYPES}
+        _pending = {_name: list() for _name in PACKET_TYPES}
+        _pending_size = {_name: 0 for _name in PACKET_TYPES}
+        _previous = {_name: None for _name in PACKET_TYPES}
+        _dtypes = dict()
+
+        _decoder = IPRBatchDecoder(read_block_size=self.block_size)
+        for _block_records in _decoder.iter_decode_stream(stream):
+            for _name, _records in _block_records.items():
+                _records, _previous[_name] = add_unwrapped_timestamp(_records, _previous[_name])
+                _dtypes[_name] = _records.dtype
+                if _records.size:
+                    _pending[_name].append(_records)
+                    _pending_size[_name] += _records.size
+                # Write the full row groups, keep the rest for the next block
+                if _pending_size[_name] >= self.row_group_size:
+                    _rows = np.concatenate(_pending[_name])
+                    _full_size = _rows.size - _rows.size % self.row_group_size
+                    for _start in range(0, _full_size, self.row_group_size):
+                        _writers[_name].write_chunk(_rows[_start:_start + self.row_group_size])
+                    _pending[_name] = [_rows[_full_size:]] if _full_size < _rows.size else []
+                    _pending_size[_name] = _rows.size - _full_size
+                self.record_count[_name] += _records.size
+        self.invalid_data_number = _decoder.invalid_data_number
+
+        for _name, _writer in _writers.items():
+            if _pending_size[_name]:
+                _writer.write_chunk(np.concatenate(_pending[_name]))
+            _writer.close(_dtypes[_name])
+        return _paths
+
+
+class IPRColumnarReader:
+    """
+    Reader of the directories written by IPRColumnarExporter.
+
+    Only the requested columns are read, and the row groups / chunks outside
+    the requested time range are skipped using their statistics.
+    """
+
+    def __init__(self, export_dir):
+        """
+        Initialize the reader.
+
+        Args:
+            export_dir (str): Directory written by IPRColumnarExporter
+        """
+        self.export_dir = export_dir
+
+    def _get_path(self, packet_type):
+        """Get the file of a packet type and its format"""
+        for _format in (FORMAT_PARQUET, FORMAT_NPZ):
+            _path = os.path.join(self.export_dir, f"{packet_type}.{_format}")
+            if os.path.exists(_path):
+                return _path, _format
+        raise FileNotFoundError(f"No {packet_type} file in {self.export_dir}")
+
+    def read(self, packet_type, columns=None, t_start=None, t_end=None):
+        """
+        Read the series of a packet type.
+
+        Args:
+            packet_type (str): "STRAIN", "ENVIRONMENT" or "ACCELERATION"
+            columns (list): Names of the columns to read (default: all)
+            t_start (int): First unwrapped device timestamp to keep (default: from the beginning)
+            t_end (int): Last unwrapped device timestamp to keep (default: to the end)
+
+        Returns:
+            dict: Column name -> numpy.ndarray
+        """
+        _path, _format = self._get_path(packet_type)
+        if _format == FORMAT_PARQUET:
+            return self._read_parquet(_path, columns, t_start, t_end)
+        return self._read_npz(_path, columns, t_start, t_end)
+
+    @staticmethod
+    def _read_parquet(path, columns, t_start, t_end):
+        """Read a Parquet file, the row groups are filtered by pyarrow"""
+        if pq is None:
+            raise ImportError("pyarrow is required to read Parquet files")
+        _filters = list()
+        if t_start is not None:
+            _filters.append((UNWRAPPED_TIMESTAMP, '>=', t_start))
+        if t_end is not None:
+            _filters.append((UNWRAPPED_TIMESTAMP, '<=', t_end))
+        _table = pq.read_table(path, columns=columns, filters=_filters or None)
+        return {_name: _table.column(_name).to_numpy() for _name in _table.column_names}
+
+    @staticmethod
+    def _read_npz(path, columns, t_start, t_end):
+        """Read the needed chunks of the needed columns of a .npz archive"""
+        with np.load(path, allow_pickle=False) as archive:
+            _statistics = archive["statistics"]
+            _names = [_field[:-len('_min')] for _field in _statistics.dtype.names if _field.endswith('_min')]
+            _columns = list(columns) if columns is not None else _names
+
+            _selected = np.ones(_statistics.size, dtype=bool)
+            if t_start is not None:
+                _selected &= _statistics[UNWRAPPED_TIMESTAMP + '_max'] >= t_start
+            if t_end is not None:
+                _selected &= _statistics[UNWRAPPED_TIMESTAMP + '_min'] <= t_end
+            _chunks = np.flatnonzero(_selected)
+
+            def _load(name):
+                _parts = [archive[f"{name}/{_chunk:06d}"] for _chunk in _chunks]
+                return np.concatenate(_parts) if _parts else np.zeros(0, dtype=_statistics.dtype[name + '_min'])
+
+            _result = {_name: _load(_name) for _name in _columns}
+            if t_start is not None or t_end is not None:
+                _timestamps = _result[UNWRAPPED_TIMESTAMP] if UNWRAPPED_TIMESTAMP in _result \
+                    else _load(UNWRAPPED_TIMESTAMP)
+                _keep = np.ones(_timestamps.size, dtype=bool)
+                if t_start is not None:
+                    _keep &= _timestamps >= t_start
+                if t_end is not None:
+                    _keep &= _timestamps <= t_end
+                _result = {_name: _values[_keep] for _name, _values in _result.items()}
+            return _result
@@ -0,0 +1,306 @@
+"""
+Min/max/mean decimation pyramid of the strain series, for fast plotting.
+
+Level 0 summarizes every BASE_BIN_SIZE consecutive strain samples into one
+bin (first/last unwrapped device timestamp, sample count, and the min, max
+and sum of each channel), and every level above merges LEVEL_FACTOR bins of
+the level below. A 2.5 h recording at 1 kHz (9 M samples) gives ~280 k bins
+at level 0 and a few dozen at the top level, so any time window can be drawn
+at any pixel width from a few thousand bins.
+
+The pyramid is built in a single streaming pass and saved as a sidecar file
+next to the recording (<recording>.pyr.npz).
+"""
+import numpy as np
+
+from pyipr_sensor_lib.ipr_batch_decoder import IPRBatchDecoder
+from pyipr_sensor_lib.ipr_columnar_export import add_unwrapped_timestamp, UNWRAPPED_TIMESTAMP
+from pyipr_sensor_lib.ipr_stream_reader import STRAIN_FIELDS
+
+BASE_BIN_SIZE = 32      # Samples per bin of level 0
+LEVEL_FACTOR = 4        # Bins of a level merged into one bin of the level above
+LEVEL_COUNT = 8         # Level 7 bins hold 32 * 4^7 = 524288 samples (~9 min at 1 kHz)
+PYRAMID_EXTENSION = ".pyr.npz"
+PYRAMID_BLOCK_SIZE = 4 * 1024 * 1024  # 4 MB of raw data decoded at once
+
+
+def get_bin_dtype(channels):
+    """
+    Get the dtype of the bins of a pyramid.
+
+    Args:
+        channels (tuple): Names of the summarized channels
+
+    Returns:
+        numpy.dtype: t_start, t_end, count, then <channel>_min, <channel>_max, <channel>_sum per channel
+    """
+    _fields = [('t_start', 'u8'), ('t_end', 'u8'), ('count', 'u8')]
+    for _channel in channels:
+        _fields += [(_channel + '_min', 'f4'), (_channel + '_max', 'f4'), (_channel + '_sum', 'f8')]
+    return np.dtype(_fields)
+
+
+class IPRDecimationPyramidBuilder:
+    """
+    Streaming builder of a decimation pyramid.
+
+    Records are pushed block by block with add(). Complete bins are merged
+    into the upper levels as soon as LEVEL_FACTOR of them are available, and
+    only the incomplete bins are carried to the next block. finish() closes
+    the last (partial) bins and returns the pyramid.
+    """
+
+    def __init__(self, channels=STRAIN_FIELDS, base_bin_size=BASE_BIN_SIZE, level_factor=LEVEL_FACTOR,
+                 level_count=LEVEL_COUNT):
+        """
+        Initialize the builder.
+
+        Args:
+            channels (tuple): Names of the fields to summarize
+            base_bin_size (int): Samples per bin of level 0
+            level_factor (int): Bins merged per bin of the level above
+            level_count (int): Number of levels
+        """
+        self.channels = tuple(channels)
+        self.base_bin_size = base_bin_size
+        self.level_factor = level_factor
+        self.level_count = level_count
+        self.bin_dtype = get_bin_dtype(self.channels)
+
+        self._levels = [list() for _ in range(level_count)]  # Complete bins, in chunks
+        self._pending_bins = [np.zeros(0, dtype=self.bin_dtype) for _ in range(level_count)]
+        self._pending_samples = None
+        self._previous_timestamp = None
+
+    def add(self, records):
+        """
+        Add a block of decoded records.
+
+        Args:
+            records (numpy.ndarray): Structured array with a 'timestamp' field and the channel fields,
+                                     e.g. the "STRAIN" array of IPRBatchDecoder
+        """
+        if records.size == 0:
+            return
+        if UNWRAPPED_TIMESTAMP not in records.dtype.names:
+            records, self._previous_timestamp = add_unwrapped_timestamp(records, self._previous_timestamp)
+
+        # Keep only the needed fields, after the samples carried from the previous block
+        _samples = np.zeros(records.size, dtype=[(UNWRAPPED_TIMESTAMP, 'u8')] +
+                            [(_channel, 'f4') for _channel in self.channels])
+        for _name in _samples.dtype.names:
+            _samples[_name] = records[_name]
+        if self._pending_samples is not None:
+            _samples = np.concatenate([self._pending_samples, _samples])
+
+        _full_size = _samples.size - _samples.size % self.base_bin_size
+        self._pending_samples = _samples[_full_size:]
+        if _full_size:
+            self._push(0, self._bin_samples(_samples[:_full_size], self.base_bin_size))
+
+    def finish(self):
+        """
+        Close the partial bins of every level.
+
+        Returns:
+            IPRDecimationPyramid: The pyramid
+        """
+        if self._pending_samples is not None and self._pending_samples.size:
+            self._push(0, self._bin_samples(self._pending_samples, self._pending_samples.size))
+        self._pending_samples = None
+
+        for _level in range(self.level_count):
+            _pending = self._pending_bins[_level]
+            self._pending_bins[_level] = np.zeros(0, dtype=self.bin_dtype)
+            if _pending.size and _level + 1 < self.level_count:
+                self._push(_level + 1, self._merge_bins(_pending, _pending.size))
+
+        _levels = [np.concatenate(_chunks) if _chunks else np.zeros(0, dtype=self.bin_dtype)
+                   for _chunks in self._levels]
+        return IPRDecimationPyramid(_levels, self.channels, self.base_bin_size, self.level_factor)
+
+    def _push(self, level, bins):
+        """Store complete bins of a level and merge them into the level above"""
+        self._levels[level].append(bins)
+        if level + 1 >= self.level_count:
+            return
+        _bins = np.concatenate([self._pending_bins[level], bins])
+        _full_size = _bins.size - _bins.size % self.level_factor
+        self._pending_bins[level] = _bins[_full_size:]
+        if _full_size:
+            self._push(level + 1, self._merge_bins(_bins[:_full_size], self.level_factor))
+
+    def _bin_samples(self, samples, size):
+        """Summarize groups of size consecutive samples"""
+        _timestamps = samples[UNWRAPPED_TIMESTAMP].reshape(-1, size)
+        _bins = np.zeros(_timestamps.shape[0], dtype=self.bin_dtype)
+        _bins['t_start'] = _timestamps[:, 0]
+        _bins['t_end'] = _timestamps[:, -1]
+        _bins['count'] = size
+        for _channel in self.channels:
+            _values = samples[_channel].reshape(-1, size)
+            _bins[_channel + '_min'] = _values.min(axis=1)
+            _bins[_channel + '_max'] = _values.max(axis=1)
+            _bins[_channel + '_sum'] = _values.sum(axis=1, dtype=np.float64)
+        return _bins
+
+    def _merge_bins(self, bins, size):
+        """Merge groups of size consecutive bins"""
+        _groups = bins.reshape(-1, size)
+        _bins = np.zeros(_groups.shape[0], dtype=self.bin_dtype)
+        _bins['t_start'] = _groups['t_start'][:, 0]
+        _bins['t_end'] = _groups['t_end'][:, -1]
+        _bins['count'] = _groups['count'].sum(axis=1)
+        for _channel in self.channels:
+            _bins[_channel + '_min'] = _groups[_channel + '_min'].min(axis=1)
+            _bins[_channel + '_max'] = _groups[_channel + '_max'].max(axis=1)
+            _bins[_channel + '_sum'] = _groups[_channel + '_sum'].sum(axis=1)
+        return _bins
+
+
+class IPRDecimationPyramid:
+    """
+    Multi-resolution min/max/mean envelope of a recording.
+
+    get_window() picks the coarsest level giving at least one bin per pixel
+    of the requested width, and returns the envelope of the requested time
+    window at that level.
+    """
+
+    def __init__(self, levels, channels, base_bin_size=BASE_BIN_SIZE, level_factor=LEVEL_FACTOR):
+        """
+        Initialize the pyramid.
+
+        Args:
+            levels (list): One structured array of bins per level (see get_bin_dtype()), finest first
+            channels (tuple): Names of the summarized channels
+            base_bin_size (int): Samples per bin of level 0
+            level_factor (int): Bins merged per bin of the level above
+        """
+        self.levels = levels
+        self.channels = tuple(channels)
+        self.base_bin_size = base_bin_size
+        self.level_factor = level_factor
+
+    @classmethod
+    def build_from_file(cls, bin_path, pyramid_path=None, channels=STRAIN_FIELDS, block_size=PYRAMID_BLOCK_SIZE):
+        """
+        Build the pyramid of a binary recording in one streaming pass and save it.
+
+        Args:
+            bin_path (str): Path of the binary recording
+            pyramid_path (str): Path of the sidecar file (default: <bin_path>.pyr.npz), None to not save
+            channels (tuple): Strain fields to summarize
+            block_size (int): Number of raw bytes decoded at once
+
+        Returns:
+            IPRDecimationPyramid: The pyramid
+        """
+        _builder = IPRDecimationPyramidBuilder(channels)
+        with open(bin_path, 'rb') as file:
+            for _block_records in IPRBatchDecoder(read_block_size=block_size).iter_decode_stream(file):
+                _builder.add(_block_records["STRAIN"])
+        _pyramid = _builder.finish()
+        _pyramid.save(pyramid_path if pyramid_path is not None else bin_path + PYRAMID_EXTENSION)
+        return _pyramid
+
+    def save(self, path):
+        """
+        Save the pyramid (uncompressed, so it loads in milliseconds).
+
+        Args:
+            path (str): Path of the sidecar file
+        """
+        _arrays = {f"level{_index}": _bins for _index, _bins in enumerate(self.levels)}
+        _arrays['channels'] = np.array(self.channels)
+        _arrays['parameters'] = np.array([self.base_bin_size, self.level_factor])
+        with open(path, 'wb') as file:
+            np.savez(file, **_arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a saved pyramid.
+
+        Args:
+            path (str): Path of the sidecar file
+
+        Returns:
+            IPRDecimationPyramid: The pyramid
+        """
+        with np.load(path, allow_pickle=False) as archive:
+            _base_bin_size, _level_factor = (int(_value) for _value in archive['parameters'])
+            _channels = tuple(str(_channel) for _channel in archive['channels'])
+            _level_count = sum(1 for _name in archive.files if _name.startswith('level'))
+            _levels = [archive[f"level{_index}"] for _index in range(_level_count)]
+        return cls(_levels, _channels, _base_bin_size, _level_factor)
+
+    def get_time_range(self):
+        """
+        Get the time span of the recording.
+
+        Returns:
+            tuple: (first, last) unwrapped device timestamps, or None if empty
+        """
+        if not self.levels or self.levels[0].size == 0:
+            return None
+        return int(self.levels[0]['t_start'][0]), int(self.levels[0]['t_end'][-1])
+
+    def _get_bin_range(self, level, t_start, t_end):
+        """Get the indexes of the bins of a level overlapping a time window"""
+        _bins = self.levels[level]
+        _first = int(np.searchsorted(_bins['t_end'], t_start, side='left'))
+        _last = int(np.searchsorted(_bins['t_start'], t_end, side='right'))
+        return _first, max(_first, _last)
+
+    def select_level(self, t_start, t_end, width):
+        """
+        Choose the level to draw a time window.
+
+        Args:
+            t_start (int): First unwrapped device timestamp of the window
+            t_end (int): Last unwrapped device timestamp of the window
+            width (int): Number of pixels (or points) wanted
+
+        Returns:
+            int: Coarsest level with at least width bins in the window (0 if none)
+        """
+        for _level in range(len(self.levels) - 1, 0, -1):
+            _first, _last = self._get_bin_range(_level, t_start, t_end)
+            if _last - _first >= width:
+                return _level
+        return 0
+
+    def get_window(self, t_start=None, t_end=None, width=1000, channel=STRAIN_FIELDS[0]):
+        """
+        Get the envelope of a channel over a time window.
+
+        Args:
+            t_start (int): First unwrapped device timestamp (default: start of the recording)
+            t_end (int): Last unwrapped device timestamp (default: end of the recording)
+            width (int): Number of pixels (or points) wanted
+            channel (str): Name of the channel
+
+        Returns:
+            dict: level, and one array per bin for t_start, t_end, count, min, max and mean
+        """
+        _time_range = self.get_time_range()
+        if _time_range is None:
+            _empty = np.zeros(0)
+            return {'level': 0, 't_start': _empty, 't_end': _empty, 'count': _empty,
+                    'min': _empty, 'max': _empty, 'mean': _empty}
+        t_start = _time_range[0] if t_start is None else t_start
+        t_end = _time_range[1] if t_end is None else t_end
+
+        _level = self.select_level(t_start, t_end, width)
+        _first, _last = self._get_bin_range(_level, t_start, t_end)
+        _bins = self.levels[_level][_first:_last]
+        return {
+            'level': _level,
+            't_start': _bins['t_start'],
+            't_end': _bins['t_end'],
+            'count': _bins['count'],
+            'min': _bins[channel + '_min'],
+            'max': _bins[channel + '_max'],
+            'mean': _bins[channel + '_sum'] / np.maximum(_bins['count'], 1),
+        }
@@ -0,0 +1,247 @@
+"""
+Persistent store-and-forward spool of MQTT messages.
+
+Messages which cannot be published are appended to segment files in a spool
+directory, and replayed in order once the broker is reachable again:
+
+    <directory>/spool_<number>.seg   Append-only segments of records
+    <directory>/cursor               Segment number and offset of the next record to replay
+
+Each record is a header (CRC32, payload size, topic size) followed by the
+topic and the payload. The data is flushed (and by default fsynced) after
+every append, and the cursor is replaced atomically, so after a crash or a
+power loss the spool resumes at the first record not yet replayed. A record
+torn by the crash fails its size or CRC check and the rest of its segment is
+skipped. Writing always starts a new segment, so a torn tail is never
+appended to.
+
+The spool size is capped: once it is exceeded, the oldest segments are
+deleted, replayed or not.
+"""
+import os
+import re
+import struct
+import zlib
+
+SEGMENT_PREFIX = "spool_"
+SEGMENT_EXTENSION = ".seg"
+CURSOR_FILENAME = "cursor"
+TEMPORARY_SUFFIX = ".part"
+
+SEGMENT_SIZE = 4 * 1024 * 1024      # A new segment is started beyond this size
+MAX_SPOOL_SIZE = 256 * 1024 * 1024  # The oldest segments are evicted beyond this size
+RECORD_HEADER = struct.Struct('<IIH')  # CRC32 of topic + payload, payload size, topic size
+
+_SEGMENT_PATTERN = re.compile(re.escape(SEGMENT_PREFIX) + r'(\d+)' + re.escape(SEGMENT_EXTENSION) + '$')
+
+
+class IPRDiskSpool:
+    """
+    Append-only segment spool with a persistent read cursor.
+
+    Not thread-safe: append(), peek() and advance() are meant to be called
+    by the same publisher thread.
+    """
+
+    def __init__(self, directory, segment_size=SEGMENT_SIZE, max_size=MAX_SPOOL_SIZE, fsync=True):
+        """
+        Open the spool, creating its directory if needed.
+
+        Args:
+            directory (str): Spool directory, one per publisher
+            segment_size (int): Size in bytes beyond which a new segment is started
+            max_size (int): Size in bytes beyond which the oldest segments are evicted
+            fsync (bool): Force every appended record to the disk
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_size = max_size
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self._sizes = dict()  # Segment number -> size in bytes, in order
+        for _name in sorted(os.listdir(directory)):
+            _match = _SEGMENT_PATTERN.match(_name)
+            if _match:
+                self._sizes[int(_match.group(1))] = os.path.getsize(os.path.join(directory, _name))
+        self._sizes = dict(sorted(self._sizes.items()))
+
+        self._write_file = None
+        self._write_segment = None
+        self._read_file = None
+        self._read_segment, self._read_offset = self._load_cursor()
+        self._next_offset = None  # End of the record returned by peek()
+
+        # Statistics
+        self.appended_count = 0
+        self.replayed_count = 0
+        self.evicted_segments = 0
+        self.evicted_bytes = 0
+        self.corrupt_segments = 0
+
+    def _get_path(self, segment):
+        """Path of a segment file"""
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:010d}{SEGMENT_EXTENSION}")
+
+    def _load_cursor(self):
+        """Read the persisted cursor, or start at the oldest segment"""
+        _first = next(iter(self._sizes), 0)
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILENAME), 'r') as file:
+                _segment, _offset = (int(_value) for _value in file.read().split())
+        except (OSError, ValueError):
+            return _first, 0
+        if _segment not in self._sizes:
+            # Segment already replayed or evicted: continue with the next one
+            _later = [_number for _number in self._sizes if _number > _segment]
+            return (_later[0], 0) if _later else (_segment, 0)
+        return _segment, _offset
+
+    def _save_cursor(self):
+        """Persist the cursor, replaced atomically"""
+        _path = os.path.join(self.directory, CURSOR_FILENAME)
+        with open(_path + TEMPORARY_SUFFIX, 'w') as file:
+            file.write(f"{self._read_segment} {self._read_offset}")
+        os.replace(_path + TEMPORARY_SUFFIX, _path)
+
+    def _start_segment(self):
+        """Close the current segment and start writing the next one"""
+        if self._write_file is not None:
+            self._write_file.close()
+        self._write_segment = max(max(self._sizes, default=-1), self._read_segment - 1) + 1
+        self._write_file = open(self._get_path(self._write_segment), 'ab')
+        self._sizes[self._write_segment] = 0
+
+    def _remove_segment(self, segment):
+        """Delete a segment file"""
+        if segment == self._read_segment and self._read_file is not None:
+            self._read_file.close()
+            self._read_file = None
+        try:
+            os.remove(self._get_path(segment))
+        except OSError:
+            pass
+        return self._sizes.pop(segment, 0)
+
+    def _move_to_next_segment(self):
+        """Leave the read segment, deleting it, and read the next one"""
+        _segment = self._read_segment
+        self._remove_segment(_segment)
+        _later = [_number for _number in self._sizes if _number > _segment]
+        self._read_segment = _later[0] if _later else _segment + 1
+        self._read_offset = 0
+        self._next_offset = None
+        self._save_cursor()
+
+    def _evict(self):
+        """Delete the oldest segments while the spool is too large"""
+        while self.get_size() > self.max_size and len(self._sizes) > 1:
+            _oldest = next(iter(self._sizes))
+            if _oldest == self._write_segment:
+                break
+            self.evicted_bytes += self._sizes[_oldest]
+            self.evicted_segments += 1
+            if _oldest == self._read_segment:
+                self._move_to_next_segment()
+            else:
+                self._remove_segment(_oldest)
+
+    def append(self, topic, payload):
+        """
+        Append a message at the end of the spool.
+
+        Args:
+            topic (str): MQTT topic
+            payload (bytes-like): Encoded payload
+        """
+        _topic = topic.encode('utf-8')
+        _crc = zlib.crc32(payload, zlib.crc32(_topic))
+        _record = RECORD_HEADER.pack(_crc, len(payload), len(_topic)) + _topic + bytes(payload)
+
+        if self._write_file is None or (self._sizes[self._write_segment] and
+                                        self._sizes[self._write_segment] + len(_record) > self.segment_size):
+            self._start_segment()
+        self._write_file.write(_record)
+        self._write_file.flush()
+        if self.fsync:
+            os.fsync(self._write_file.fileno())
+        self._sizes[self._write_segment] += len(_record)
+        self.appended_count += 1
+        self._evict()
+
+    def peek(self):
+        """
+        Read the next message to replay, without consuming it (see advance()).
+
+        Returns:
+            tuple: (topic, payload as bytes), or None if everything was replayed
+        """
+        while self._read_segment in self._sizes:
+            _is_write_segment = self._read_segment == self._write_segment
+            if self._read_file is None:
+                self._read_file = open(self._get_path(self._read_segment), 'rb')
+            self._read_file.seek(self._read_offset)
+            _header = self._read_file.read(RECORD_HEADER.size)
+            if len(_header) == RECORD_HEADER.size:
+                _crc, _payload_size, _topic_size = RECORD_HEADER.unpack(_header)
+                _topic = self._read_file.read(_topic_size)
+                _payload = self._read_file.read(_payload_size)
+                if len(_topic) == _topic_size and len(_payload) == _payload_size and \
+                        zlib.crc32(_payload, zlib.crc32(_topic)) == _crc:
+                    self._next_offset = self._read_offset + RECORD_HEADER.size + _topic_size + _payload_size
+                    return _topic.decode('utf-8', errors='replace'), _payload
+                if not _is_write_segment:
+                    self.corrupt_segments += 1  # Torn or damaged record: skip the rest of the segment
+            if _is_write_segment:
+                return None  # Everything written so far was replayed
+            self._move_to_next_segment()
+        return None
+
+    def advance(self):
+        """Consume the message returned by the last peek()"""
+        if self._next_offset is None:
+            return
+        self._read_offset = self._next_offset
+        self._next_offset = None
+        self.replayed_count += 1
+        self._save_cursor()
+
+    def get_size(self):
+        """Get the size of the segment files in bytes"""
+        return sum(self._sizes.values())
+
+    def get_pending_size(self):
+        """Get the size in bytes of the messages not replayed yet"""
+        return sum(_size for _segment, _size in self._sizes.items() if _segment >= self._read_segment) - \
+            (self._read_offset if self._read_segment in self._sizes else 0)
+
+    def is_empty(self):
+        """Check if every message was replayed"""
+        return self.get_pending_size() <= 0
+
+    def close(self):
+        """Close the files, the spool is reopened where it stopped"""
+        for _file in (self._write_file, self._read_file):
+            if _file is not None:
+                _file.close()
+        self._write_file = None
+        self._read_file = None
+        self._write_segment = None
+
+    def get_status(self):
+        """
+        Get the spool statistics.
+
+        Returns:
+            dict: Segments, sizes in bytes and message counts
+        """
+        return {
+            'segments': len(self._sizes),
+            'size': self.get_size(),
+            'pending': self.get_pending_size(),
+            'appended': self.appended_count,
+            'replayed': self.replayed_count,
+            'evicted_segments': self.evicted_segments,
+            'evicted_bytes': self.evicted_bytes,
+            'corrupt_segments': self.corrupt_segments,
+        }
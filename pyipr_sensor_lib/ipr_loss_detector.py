@@ -0,0 +1,320 @@
+"""
+Data loss accounting from the telegram sequence field.
+
+Byte 0 of every telegram holds a 3-bit sequence counter (bits 3-5, see
+IPRParser.parser_get_sequence) incremented for each telegram of a packet
+type. A step of more than one between two telegrams of the same type means
+telegrams were lost. The counter only tells the loss modulo 8, so the device
+timestamps are used to count longer gaps: the loss is rounded to the value,
+congruent with the sequence step, closest to the time gap divided by the
+usual period of the packet type.
+
+Run from the command line to get the summary of recordings:
+
+    python -m pyipr_sensor_lib.ipr_loss_detector FILE.bin [FILE.bin ...]
+"""
+import sys
+
+import numpy as np
+
+from pyipr_sensor_lib.ipr_batch_decoder import IPRBatchDecoder
+from pyipr_sensor_lib.ipr_parser import IPRParser
+from pyipr_sensor_lib.ipr_timebase import TIMESTAMP_RANGE, unwrap_timestamps
+
+SEQUENCE_RANGE = 8          # The sequence counter has 3 bits
+MAX_GAP_RECORDS = 1000      # Gaps kept per packet type for the report, the counts are always complete
+PERIOD_SMOOTHING = 0.01     # Weight of a new time step in the period estimate
+
+PACKET_TYPE_NAMES = {0x00: "STRAIN", 0x01: "ENVIRONMENT", 0x02: "ACCELERATION"}
+_MIN_TELEGRAM_SIZE = {0x00: IPRParser.MIN_TELEGRAM_SIZE_STRAIN,
+                      0x01: IPRParser.MIN_TELEGRAM_SIZE_ENVIRONMENT,
+                      0x02: IPRParser.MIN_TELEGRAM_SIZE_ACCELERATION}
+
+
+class IPRSequenceTracker:
+    """Sequence continuity of one packet type"""
+
+    def __init__(self, name):
+        """
+        Initialize the tracker.
+
+        Args:
+            name (str): Packet type name, used in the reports
+        """
+        self.name = name
+        self.received_count = 0
+        self.lost_count = 0
+        self.gap_count = 0
+        self.gaps = list()  # (unwrapped timestamp before, unwrapped timestamp after, lost telegrams)
+
+        self.period = None  # Usual device timestamp step between two telegrams
+        self._last_sequence = None
+        self._last_timestamp = None
+        self._unwrap_state = None  # See unwrap_timestamps()
+
+    def _estimate_lost(self, sequence_lost, time_step):
+        """Refine a loss counted modulo 8 with the time gap"""
+        if self.period is None or self.period <= 0 or time_step <= 0:
+            return sequence_lost
+        _time_lost = round(time_step / self.period) - 1
+        if _time_lost - sequence_lost < SEQUENCE_RANGE // 2:
+            return sequence_lost
+        return sequence_lost + SEQUENCE_RANGE * round((_time_lost - sequence_lost) / SEQUENCE_RANGE)
+
+    def _record_gap(self, timestamp_before, timestamp_after, lost):
+        """Count a gap and keep its time range"""
+        self.gap_count += 1
+        self.lost_count += lost
+        if len(self.gaps) < MAX_GAP_RECORDS:
+            self.gaps.append((timestamp_before, timestamp_after, lost))
+
+    def update(self, sequence, timestamp):
+        """
+        Account for one telegram.
+
+        Args:
+            sequence (int): Sequence field, byte 0 & 0x38 (as IPRParser.parser_get_sequence)
+            timestamp (int): Raw 27-bit device timestamp
+
+        Returns:
+            int: Number of telegrams lost just before this one
+        """
+        _sequence = (int(sequence) >> 3) % SEQUENCE_RANGE
+        # Scalar version of unwrap_timestamps(), cheaper for a single value
+        _timestamp = int(timestamp)
+        if self._unwrap_state is not None:
+            _delta = (_timestamp - self._unwrap_state[0]) % TIMESTAMP_RANGE
+            if _delta >= TIMESTAMP_RANGE // 2:
+                _delta -= TIMESTAMP_RANGE
+            _timestamp = max(0, self._unwrap_state[1] + _delta)
+        self._unwrap_state = (int(timestamp), _timestamp)
+        self.received_count += 1
+
+        _lost = 0
+        if self._last_sequence is not None:
+            _time_step = _timestamp - self._last_timestamp
+            _lost = self._estimate_lost((_sequence - self._last_sequence - 1) % SEQUENCE_RANGE, _time_step)
+            if _lost:
+                self._record_gap(self._last_timestamp, _timestamp, _lost)
+            elif _time_step > 0:
+                self.period = _time_step if self.period is None else \
+                    (1 - PERIOD_SMOOTHING) * self.period + PERIOD_SMOOTHING * _time_step
+
+        self._last_sequence = _sequence
+        self._last_timestamp = _timestamp
+        return _lost
+
+    def update_batch(self, sequences, timestamps):
+        """
+        Account for a block of telegrams at once.
+
+        Args:
+            sequences (numpy.ndarray): Sequence fields (byte 0 & 0x38), in reception order
+            timestamps (numpy.ndarray): Raw 27-bit device timestamps
+
+        Returns:
+            int: Number of telegrams lost in the block
+        """
+        if len(sequences) == 0:
+            return 0
+        _sequences = (np.asarray(sequences, dtype=np.int64) >> 3) % SEQUENCE_RANGE
+        _timestamps, self._unwrap_state = unwrap_timestamps(timestamps, self._unwrap_state)
+
+        if self._last_sequence is None:
+            _previous_sequences = np.concatenate([_sequences[:1] - 1, _sequences[:-1]])
+            _previous_timestamps = np.concatenate([_timestamps[:1], _timestamps[:-1]])
+        else:
+            _previous_sequences = np.concatenate([[self._last_sequence], _sequences[:-1]])
+            _previous_timestamps = np.concatenate([[self._last_timestamp], _timestamps[:-1]])
+        _lost = (_sequences - _previous_sequences - 1) % SEQUENCE_RANGE
+        _time_steps = _timestamps - _previous_timestamps
+
+        # Usual period from the steps without loss
+        _regular_steps = _time_steps[(_lost == 0) & (_time_steps > 0)]
+        if _regular_steps.size and self.period is not None:
+            _regular_steps = _regular_steps[_regular_steps <= (SEQUENCE_RANGE // 2) * self.period]
+        if _regular_steps.size:
+            _median = float(np.median(_regular_steps))
+            self.period = _median if self.period is None else \
+                (1 - PERIOD_SMOOTHING) * self.period + PERIOD_SMOOTHING * _median
+
+        # Sequence steps, and time gaps long enough to hide a multiple of 8 lost telegrams
+        _is_gap = _lost != 0
+        if self.period is not None and self.period > 0:
+            _is_gap |= _time_steps > (SEQUENCE_RANGE // 2) * self.period
+
+        _total_lost = 0
+        for _index in np.flatnonzero(_is_gap):
+            _gap_lost = self._estimate_lost(int(_lost[_index]), int(_time_steps[_index]))
+            if not _gap_lost:
+                continue
+            self._record_gap(int(_previous_timestamps[_index]), int(_timestamps[_index]), _gap_lost)
+            _total_lost += _gap_lost
+
+        self.received_count += len(_sequences)
+        self._last_sequence = int(_sequences[-1])
+        self._last_timestamp = int(_timestamps[-1])
+        return _total_lost
+
+    def reset_continuity(self):
+        """Forget the last telegram, e.g. when the transmission stops, the counters are kept"""
+        self._last_sequence = None
+        self._last_timestamp = None
+        self._unwrap_state = None
+
+    def get_summary(self):
+        """
+        Get the loss statistics.
+
+        Returns:
+            dict: Received, lost and gap counts, loss rate, timestamp period and gap time ranges
+        """
+        _expected = self.received_count + self.lost_count
+        return {
+            'received': self.received_count,
+            'lost': self.lost_count,
+            'gaps': self.gap_count,
+            'loss_rate': self.lost_count / _expected if _expected else 0.0,
+            'period': self.period,
+            'gap_ranges': list(self.gaps),
+        }
+
+
+class IPRLossDetector:
+    """
+    Streaming data loss detector for all the packet types of a sensor.
+
+    Live, feed it the unescaped telegrams with update_telegrams() (only the
+    header bytes are read, no full decode). Offline, summarize_file() runs it
+    over a recording with the batch decoder.
+    """
+
+    def __init__(self):
+        """Initialize one sequence tracker per packet type."""
+        self.trackers = {_id: IPRSequenceTracker(_name) for _id, _name in PACKET_TYPE_NAMES.items()}
+        self.invalid_count = 0
+
+    def update_telegram(self, telegram):
+        """
+        Account for one unescaped telegram.
+
+        Args:
+            telegram (bytes): Unescaped telegram (see IPRTelegramFramer)
+
+        Returns:
+            int: Number of telegrams of its type lost just before it
+        """
+        if len(telegram) < IPRParser.MIN_TELEGRAM_SIZE:
+            self.invalid_count += 1
+            return 0
+        _byte0 = telegram[0]
+        _packet_id = _byte0 & 0x03
+        _is_crc_valid = ((_byte0 & 0x04) >> 2) == (((_byte0 & 0x02) >> 1) ^ (_byte0 & 0x01))
+        if not _is_crc_valid or len(telegram) < _MIN_TELEGRAM_SIZE.get(_packet_id, 0xFFFF):
+            self.invalid_count += 1
+            return 0
+        _timestamp = (((telegram[4] & 0x01) << 26) + (telegram[3] << 18) + (telegram[2] << 10) +
+                      (telegram[1] << 2) + ((_byte0 & 0xC0) >> 6))
+        return self.trackers[_packet_id].update(_byte0 & 0x38, _timestamp)
+
+    def update_telegrams(self, telegrams):
+        """
+        Account for a list of unescaped telegrams.
+
+        Args:
+            telegrams (list): Unescaped telegrams, in reception order
+
+        Returns:
+            int: Number of telegrams lost
+        """
+        return sum(self.update_telegram(_telegram) for _telegram in telegrams)
+
+    def update_records(self, records):
+        """
+        Account for a block decoded by IPRBatchDecoder.
+
+        Args:
+            records (dict): Packet type name -> structured array with 'sequence' and 'timestamp'
+
+        Returns:
+            int: Number of telegrams lost
+        """
+        _lost = 0
+        for _packet_id, _name in PACKET_TYPE_NAMES.items():
+            if _name in records:
+                _lost += self.trackers[_packet_id].update_batch(records[_name]['sequence'],
+                                                                records[_name]['timestamp'])
+        return _lost
+
+    def reset_continuity(self):
+        """Forget the last telegram of every packet type (see IPRSequenceTracker.reset_continuity())"""
+        for _tracker in self.trackers.values():
+            _tracker.reset_continuity()
+
+    def get_summary(self):
+        """
+        Get the loss statistics of every packet type.
+
+        Returns:
+            dict: Packet type name -> statistics (see IPRSequenceTracker.get_summary())
+        """
+        return {_tracker.name: _tracker.get_summary() for _tracker in self.trackers.values()}
+
+    def get_loss_count(self):
+        """
+        Get the number of telegrams lost, all packet types together.
+
+        Returns:
+            int: Number of lost telegrams
+        """
+        return sum(_tracker.lost_count for _tracker in self.trackers.values())
+
+    def print_summary(self, max_gaps=10):
+        """
+        Print the loss statistics of every packet type.
+
+        Args:
+            max_gaps (int): Number of gap time ranges printed per packet type
+        """
+        for _name, _summary in self.get_summary().items():
+            print(f"{_name}: {_summary['received']} received | {_summary['lost']} lost in {_summary['gaps']} gaps | "
+                  f"loss rate {_summary['loss_rate'] * 100:.3f}%")
+            for _before, _after, _lost in _summary['gap_ranges'][:max_gaps]:
+                print(f"    {_lost} lost between device timestamps {_before} and {_after}")
+
+
+def summarize_file(bin_path):
+    """
+    Run the loss detector over a binary recording.
+
+    Args:
+        bin_path (str): Path of the binary recording
+
+    Returns:
+        IPRLossDetector: The detector, see get_summary() and print_summary()
+    """
+    _detector = IPRLossDetector()
+    _decoder = IPRBatchDecoder()
+    with open(bin_path, 'rb') as file:
+        for _records in _decoder.iter_decode_stream(file):
+            _detector.update_records(_records)
+    _detector.invalid_count = _decoder.invalid_data_number
+    return _detector
+
+
+def main():
+    """
+    Print the data loss summary of recordings.
+
+    Usage: python -m pyipr_sensor_lib.ipr_loss_detector FILE.bin [FILE.bin ...]
+    """
+    if len(sys.argv) < 2:
+        print(main.__doc__)
+        return
+    for _path in sys.argv[1:]:
+        print(f"--- {_path} ---")
+        summarize_file(_path).print_summary()
+
+
+if __name__ == "__main__":
+    main()
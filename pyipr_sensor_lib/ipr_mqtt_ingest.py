@@ -0,0 +1,363 @@
+"""
+Server-side ingest of the MQTT payloads published by IprSensorDatabase.
+
+Each message is decoded according to its codec header (decode_payload()),
+whatever the compression backend and pre-filters of the publisher, and the
+decoded bytes are viewed as a NumPy structured array with np.frombuffer(),
+without unpacking the rows one by one:
+
+    sensor/<id>/data    HIGH_FREQ_DTYPE ('<9fQ': 9 float32 values + host timestamp ns)
+    sensor/<id>/env     ENV_DTYPE ('<4fQB': 4 float32 values + host timestamp ns + sensor id)
+    sensor/<id>/raw     raw telegram batch (raw_mode), decoded with IPRBatchDecoder
+
+Payloads of older publishers (plain zlib, no codec header) are still read:
+they start with the zlib header byte 0x78, never a codec header byte.
+
+The arrays are read-only views of the decoded message, copy them to modify
+them. run_benchmark() measures the ingest throughput through IPRLocalBroker,
+an in-process stand-in of the broker, against the per-row struct.unpack loop:
+
+    python -m pyipr_sensor_lib.ipr_mqtt_ingest [BATCHES] [SAMPLES_PER_BATCH]
+"""
+import math
+import queue
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from pyipr_sensor_lib.ipr_batch_builder import HIGH_FREQ_DTYPE, HIGH_FREQ_STRUCT, IPRHighFreqBatch
+from pyipr_sensor_lib.ipr_batch_decoder import IPRBatchDecoder
+from pyipr_sensor_lib.ipr_payload_codec import (IPRPayloadCodec, LAYOUT_ENV, LAYOUT_HIGH_FREQ, LAYOUT_RAW,
+                                                LAYOUT_RAW_TELEGRAMS, decode_payload, get_available_backends,
+                                                is_encoded_payload)
+from pyipr_sensor_lib.ipr_raw_batch import decode_raw_batch
+
+ENV_DTYPE = np.dtype([('v_batt', '<f4'), ('temperature', '<f4'), ('humidity', '<f4'), ('pressure', '<f4'),
+                      ('timestamp', '<u8'), ('sensor_id', 'u1')])
+TOPIC_LAYOUTS = {'data': LAYOUT_HIGH_FREQ, 'env': LAYOUT_ENV, 'raw': LAYOUT_RAW_TELEGRAMS}  # Legacy payload layouts
+INGEST_TOPICS = [('sensor/+/data', 1), ('sensor/+/env', 1), ('sensor/+/raw', 1)]
+LOCAL_BROKER_QUEUE_SIZE = 64  # Messages buffered by the broker stand-in before publish() blocks
+
+IPRIngestMessage = namedtuple('IPRIngestMessage', ['sensor_id', 'kind', 'records', 'anchors'])
+IPRLocalMessage = namedtuple('IPRLocalMessage', ['topic', 'payload'])
+
+
+def parse_topic(topic):
+    """
+    Split a sensor topic.
+
+    Args:
+        topic (str): MQTT topic, sensor/<id>/<kind>
+
+    Returns:
+        tuple: (sensor id, kind), or None if the topic is not a sensor topic
+    """
+    _parts = topic.split('/')
+    if len(_parts) != 3 or _parts[0] != 'sensor' or not _parts[1].isdigit():
+        return None
+    return int(_parts[1]), _parts[2]
+
+
+def decode_message_payload(payload, kind):
+    """
+    Decode a payload, with a codec header or from a legacy publisher (plain zlib).
+
+    Args:
+        payload (bytes-like): Received MQTT payload
+        kind (str): Last level of the topic ('data', 'env' or 'raw'), layout of the legacy payloads
+
+    Returns:
+        tuple: (decoded bytes, LAYOUT_* of the records)
+    """
+    if is_encoded_payload(payload):
+        return decode_payload(payload)
+    return zlib.decompress(payload), TOPIC_LAYOUTS.get(kind, LAYOUT_RAW)
+
+
+def view_records(data, layout):
+    """
+    View decoded bytes as a structured array, without copying them.
+
+    Args:
+        data (bytes-like): Decoded payload
+        layout (int): LAYOUT_HIGH_FREQ or LAYOUT_ENV
+
+    Returns:
+        numpy.ndarray: Read-only structured array (HIGH_FREQ_DTYPE or ENV_DTYPE)
+    """
+    _dtype = HIGH_FREQ_DTYPE if layout == LAYOUT_HIGH_FREQ else ENV_DTYPE
+    if len(data) % _dtype.itemsize:
+        raise ValueError(f"{len(data)} bytes is not a whole number of {_dtype.itemsize}-byte records")
+    return np.frombuffer(data, dtype=_dtype)
+
+
+class IPRMqttIngest:
+    """Decoder of the sensor MQTT messages into NumPy arrays, usable as a paho on_message callback"""
+
+    def __init__(self, callback=None, decoder=None):
+        """
+        Initialize the ingest.
+
+        Args:
+            callback (callable): Called with each IPRIngestMessage by on_message(), in the client thread
+            decoder (IPRBatchDecoder): Decoder of the raw telegram batches (default: a new one)
+        """
+        self.callback = callback
+        self._decoder = decoder if decoder is not None else IPRBatchDecoder()
+
+        # Statistics
+        self.message_count = 0
+        self.record_count = 0
+        self.received_bytes = 0
+        self.decoded_bytes = 0
+        self.error_count = 0
+        self.decode_time = 0.0
+        self.last_error = None
+
+    def decode_message(self, topic, payload):
+        """
+        Decode a sensor message.
+
+        Args:
+            topic (str): MQTT topic, sensor/<id>/<kind>
+            payload (bytes-like): Received MQTT payload
+
+        Returns:
+            IPRIngestMessage: sensor id, kind, records (structured array, or dict packet type -> structured
+            array for 'raw') and anchors (structured array of the raw batch anchors, None otherwise)
+        """
+        _start = time.perf_counter()
+        _topic = parse_topic(topic)
+        if _topic is None:
+            raise ValueError(f"Not a sensor topic: {topic}")
+        _sensor_id, _kind = _topic
+        _data, _layout = decode_message_payload(payload, _kind)
+
+        if _layout == LAYOUT_RAW_TELEGRAMS:
+            _, _anchors, _records = decode_raw_batch(_data, self._decoder)
+            _count = sum(len(_array) for _array in _records.values())
+        elif _layout in (LAYOUT_HIGH_FREQ, LAYOUT_ENV):
+            _anchors = None
+            _records = view_records(_data, _layout)
+            _count = len(_records)
+        else:
+            raise ValueError(f"Unexpected payload layout {_layout} on {topic}")
+
+        self.message_count += 1
+        self.record_count += _count
+        self.received_bytes += len(payload)
+        self.decoded_bytes += len(_data)
+        self.decode_time += time.perf_counter() - _start
+        return IPRIngestMessage(_sensor_id, _kind, _records, _anchors)
+
+    def on_message(self, client, userdata, message):
+        """paho on_message callback: decode the message and pass it to the callback"""
+        try:
+            _message = self.decode_message(message.topic, message.payload)
+        except Exception as e:
+            self.error_count += 1
+            self.last_error = str(e)
+            print(f"✗ Error decoding {message.topic}: {e}")
+            return
+        if self.callback is not None:
+            self.callback(_message)
+
+    def attach(self, client):
+        """
+        Subscribe a connected MQTT client (paho or IPRLocalBroker) to the sensor topics.
+
+        Args:
+            client: MQTT client, its on_message callback is replaced
+        """
+        client.on_message = self.on_message
+        client.subscribe(INGEST_TOPICS)
+
+    def get_status(self):
+        """
+        Get the ingest statistics.
+
+        Returns:
+            dict: Message, record, byte and error counts, decode time (s) and throughput
+        """
+        return {
+            'messages': self.message_count,
+            'records': self.record_count,
+            'received_bytes': self.received_bytes,
+            'decoded_bytes': self.decoded_bytes,
+            'errors': self.error_count,
+            'decode_time': self.decode_time,
+            'records_per_second': self.record_count / self.decode_time if self.decode_time else 0.0,
+        }
+
+
+class IPRLocalBroker:
+    """
+    In-process stand-in of an MQTT broker and its client, for tests and benchmarks.
+
+    publish() queues the messages and a delivery thread calls on_message()
+    with the messages matching a subscription, as a paho client loop does.
+    """
+
+    def __init__(self, queue_size=LOCAL_BROKER_QUEUE_SIZE):
+        """
+        Initialize the broker, see start().
+
+        Args:
+            queue_size (int): Messages buffered before publish() blocks
+        """
+        self.on_message = None
+        self._subscriptions = list()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+
+    @staticmethod
+    def _matches(pattern, topic):
+        """Check a topic against a subscription with + and # wildcards"""
+        _pattern = pattern.split('/')
+        _topic = topic.split('/')
+        for _index, _level in enumerate(_pattern):
+            if _level == '#':
+                return True
+            if _index >= len(_topic) or (_level != '+' and _level != _topic[_index]):
+                return False
+        return len(_pattern) == len(_topic)
+
+    def subscribe(self, topics, qos=0):
+        """
+        Subscribe to topics.
+
+        Args:
+            topics (str or list): Topic filter, or list of (topic filter, qos)
+            qos (int): Ignored, every message is delivered once
+        """
+        if isinstance(topics, str):
+            topics = [(topics, qos)]
+        self._subscriptions.extend(_topic for _topic, _qos in topics)
+
+    def publish(self, topic, payload, qos=0):
+        """Queue a message for delivery, waiting while the queue is full"""
+        self._queue.put(IPRLocalMessage(topic, bytes(payload)))
+
+    def _deliver_loop(self):
+        """Deliver the queued messages until the stop marker"""
+        while True:
+            _message = self._queue.get()
+            if _message is None:
+                break
+            if self.on_message is not None and \
+                    any(self._matches(_pattern, _message.topic) for _pattern in self._subscriptions):
+                self.on_message(self, None, _message)
+
+    def start(self):
+        """Start the delivery thread"""
+        self._thread = threading.Thread(target=self._deliver_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Deliver the queued messages, then stop the delivery thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+def _make_benchmark_batch(sample_count, start_ns):
+    """High-frequency batch of synthetic strain and acceleration signals"""
+    _batch = IPRHighFreqBatch(sample_count)
+    for _index in range(sample_count):
+        _t = _index / 1000
+        _batch.add(100 * math.sin(2 * math.pi * _t), 50 * math.cos(2 * math.pi * _t), 10 * math.sin(math.pi * _t), 0, 0,
+                   (_index * 0.36) % 360 - 180, 0.2 * math.sin(2 * math.pi * 5 * _t),
+                   0.2 * math.cos(2 * math.pi * 5 * _t), 9.81, _index)
+    _batch.set_timestamps(start_ns + np.arange(sample_count, dtype=np.int64) * 1000000)
+    return _batch
+
+
+def _unpack_rows(payload):
+    """Per-row struct.unpack decoding of a legacy payload, the reference of the benchmark"""
+    _data = zlib.decompress(payload)
+    return [HIGH_FREQ_STRUCT.unpack_from(_data, _offset) for _offset in range(0, len(_data), HIGH_FREQ_STRUCT.size)]
+
+
+def run_benchmark(batch_count=200, sample_count=1000, verbose=True):
+    """
+    Measure the ingest throughput of each codec through the local broker stand-in.
+
+    The same batches are encoded with every available backend (default
+    pre-filters), plus legacy plain zlib, and decoded by IPRMqttIngest behind
+    an IPRLocalBroker. The per-row struct.unpack loop is timed on the legacy
+    payloads for comparison.
+
+    Args:
+        batch_count (int): Number of batches published per codec
+        sample_count (int): Samples per batch
+        verbose (bool): Print a result line per codec
+
+    Returns:
+        list: One dict per codec with the bytes per sample, the ingest time (s) and samples per second
+    """
+    _payload = bytes(_make_benchmark_batch(sample_count, time.time_ns()).get_payload())
+    _codecs = [('legacy zlib', lambda _data: zlib.compress(_data, 6))]
+    for _backend in get_available_backends():
+        _codecs.append((_backend, lambda _data, _codec=IPRPayloadCodec(_backend): _codec.encode(_data,
+                                                                                               LAYOUT_HIGH_FREQ)))
+
+    _results = list()
+    for _name, _encode in _codecs:
+        _encoded = _encode(_payload)
+        _ingest = IPRMqttIngest()
+        _broker = IPRLocalBroker()
+        _ingest.attach(_broker)
+        _broker.start()
+        _start = time.perf_counter()
+        for _ in range(batch_count):
+            _broker.publish('sensor/1/data', _encoded, qos=1)
+        _broker.stop()
+        _elapsed = time.perf_counter() - _start
+        _results.append({
+            'codec': _name,
+            'bytes_per_sample': len(_encoded) / sample_count,
+            'time': _elapsed,
+            'samples_per_second': _ingest.record_count / _elapsed,
+            'errors': _ingest.error_count,
+        })
+
+    # Reference: per-row unpacking of the legacy payloads, without the broker
+    _encoded = zlib.compress(_payload, 6)
+    _start = time.perf_counter()
+    for _ in range(batch_count):
+        _unpack_rows(_encoded)
+    _elapsed = time.perf_counter() - _start
+    _results.append({
+        'codec': 'legacy zlib, struct.unpack rows',
+        'bytes_per_sample': len(_encoded) / sample_count,
+        'time': _elapsed,
+        'samples_per_second': batch_count * sample_count / _elapsed,
+        'errors': 0,
+    })
+
+    if verbose:
+        print(f"{batch_count} batches of {sample_count} samples ({len(_payload)} bytes packed)")
+        for _result in _results:
+            print(f"  {_result['codec']:<32} {_result['bytes_per_sample']:6.2f} bytes/sample | "
+                  f"{_result['samples_per_second'] / 1e6:7.2f} M samples/s | {_result['time']:.3f} s")
+    return _results
+
+
+def main():
+    """
+    Run the ingest benchmark.
+
+    Usage: python -m pyipr_sensor_lib.ipr_mqtt_ingest [BATCHES] [SAMPLES_PER_BATCH]
+    """
+    _batch_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    _sample_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    run_benchmark(_batch_count, _sample_count)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from array import array
 
+from pyipr_sensor_lib.ipr_telegram_framer import ipr_unescape
+
 
 class IPRParser:
     """
@@ -14,6 +16,12 @@ class IPRParser:
     MIN_PACKET_LENGTH_ENVIRONMENT = 20
     MIN_PACKET_LENGTH_ACCELERATION = 20
 
+    # Minimum required size (in bytes) of unescaped binary telegrams
+    MIN_TELEGRAM_SIZE = 11
+    MIN_TELEGRAM_SIZE_STRAIN = 14
+    MIN_TELEGRAM_SIZE_ENVIRONMENT = 10
+    MIN_TELEGRAM_SIZE_ACCELERATION = 9
+
     def __init__(self, packet=0):
         """
         Initialize the parser with optional packet data.
@@ -21,14 +29,14 @@ class IPRParser:
         Args:
             packet: Initial packet data (default: 0)
         """
-        # Store raw byte data and track invalid packets
-        self._byte_data = list()
+        # Store unescaped byte data and track invalid packets
+        self._byte_data = b''
         self.invalid_data_list = list()
         self.invalid_data_number = 0
 
         # Header information arrays
-        # [ID, ID_CRC, Sequence, Timestamp]
-        self.raw_header = array('f', [-1, -1, -1, -1])
+        # [ID, ID_CRC, Sequence, Timestamp] - double precision to hold the 27-bit timestamp
+        self.raw_header = array('d', [-1, -1, -1, -1])
         self.packet_type = None
 
         # Raw measurement arrays
@@ -50,13 +58,23 @@ class IPRParser:
         """Set a new packet for parsing."""
         self.packet = packet
 
+    def parser_set_telegram(self, telegram):
+        """
+        Set an unescaped binary telegram (as returned by IPRTelegramFramer) for parsing.
+        The bytes are used directly, without any hexadecimal conversion.
+        """
+        self.packet = telegram
+        self._byte_data = telegram
+
     @staticmethod
     def parser_compute_crc(byte0):
         """
         Compute CRC (Cyclic Redundancy Check) for the first byte.
-        Returns XOR of bits 1 and 0 of BYTE 0.
+        Returns XOR of bits 1 and 0 of BYTE 0 (given as an int or a hex string).
         """
-        return bool(int(byte0, 16) & 0x02) ^ bool(int(byte0, 16) & 0x01)
+        if isinstance(byte0, str):
+            byte0 = int(byte0, 16)
+        return bool(byte0 & 0x02) ^ bool(byte0 & 0x01)
 
     @staticmethod
     def convert_numeric_to_scale(value_to_convert, in_min, in_max, out_min, out_max):
@@ -83,35 +101,20 @@ class IPRParser:
 
     def parser_hex_to_byte(self, _data, _length):
         """
-        Convert hexadecimal string to bytes, processing two characters at a time.
+        Convert hexadecimal string to bytes and undo the 0x07 escape sequences.
         Stores results in self._byte_data.
         """
-        self._byte_data = list()
-        for i in range(0, _length, 2):
-            self._byte_data.append(_data[i:i + 2])
+        self._byte_data = bytes.fromhex(_data[:_length])
 
         if len(self._byte_data) >= 2:
-            previous_byte = '00'
-            new_byte_list = list()
-            for current_byte in self._byte_data:
-                if previous_byte == '07':
-                    previous_byte = '00'
-                    if current_byte == '55':
-                        new_byte_list.append('08')
-                    elif current_byte == 'aa':
-                        new_byte_list.append('07')
-                else:
-                    if current_byte == '07':
-                        previous_byte = current_byte
-                    else:
-                        new_byte_list.append(current_byte)
-
-            self._byte_data = new_byte_list.copy()
+            self._byte_data = ipr_unescape(self._byte_data)
 
     def parser_check_telegram_validity(self, telegram):
         """
         Validate incoming telegram data.
 
+        The telegram is either a hexadecimal string or unescaped bytes.
+
         Checks:
         1. Minimum length
         2. Valid CRC
@@ -121,10 +124,15 @@ class IPRParser:
         """
         _is_valid = False
         if len(telegram) >= 1:
-            self.parser_hex_to_byte(telegram, 2)  # Convert first byte for CRC check
+            if isinstance(telegram, str):
+                self.parser_hex_to_byte(telegram, 2)  # Convert first byte for CRC check
+                _is_too_short = len(telegram) <= 20
+            else:
+                self.parser_set_telegram(telegram)
+                _is_too_short = len(telegram) < self.MIN_TELEGRAM_SIZE
             _id_crc_computed = self.parser_compute_crc(self._byte_data[0])
 
-            if (self.parser_get_id_crc() != _id_crc_computed) or (len(telegram) <= 20):
+            if (self.parser_get_id_crc() != _id_crc_computed) or _is_too_short:
                 self.invalid_data_list.append(telegram)
                 self.invalid_data_number += 1
             else:
@@ -137,7 +145,7 @@ class IPRParser:
 
     def parser_get_id(self):
         """Extract telegram ID from first two bits of BYTE 0."""
-        self.raw_header[0] = int(self._byte_data[0], 16) & 0x03
+        self.raw_header[0] = self._byte_data[0] & 0x03
         return self.raw_header[0]
 
     def parser_get_id_name(self):
@@ -161,12 +169,12 @@ class IPRParser:
 
     def parser_get_id_crc(self):
         """Extract CRC bit (3rd bit) from BYTE 0."""
-        self.raw_header[1] = (int(self._byte_data[0], 16) & 0x04) >> 2
+        self.raw_header[1] = (self._byte_data[0] & 0x04) >> 2
         return self.raw_header[1]
 
     def parser_get_sequence(self):
         """Extract sequence number bits from BYTE 0."""
-        self.raw_header[2] = int(self._byte_data[0], 16) & 0x38
+        self.raw_header[2] = self._byte_data[0] & 0x38
         return self.raw_header[2]
 
     def parser_get_timestamp(self):
@@ -174,11 +182,11 @@ class IPRParser:
         Extract timestamp from header bytes.
         Combines bits from BYTE 0-4 to form complete timestamp.
         """
-        self.raw_header[3] = (((int(self._byte_data[4], 16) & 0x01) << 26) +
-                              (int(self._byte_data[3], 16) << 18) +
-                              (int(self._byte_data[2], 16) << 10) +
-                              (int(self._byte_data[1], 16) << 2) +
-                              ((int(self._byte_data[0], 16) & 0xC0) >> 6))
+        self.raw_header[3] = (((self._byte_data[4] & 0x01) << 26) +
+                              (self._byte_data[3] << 18) +
+                              (self._byte_data[2] << 10) +
+                              (self._byte_data[1] << 2) +
+                              ((self._byte_data[0] & 0xC0) >> 6))
         return self.raw_header[3]
 
     def parser_get_header(self):
@@ -197,17 +205,17 @@ class IPRParser:
         - Angle (index 5)
         """
         # Extract strain XYZ from bytes 4-8
-        self.raw_strain[0] = ((int(self._byte_data[5], 16) & 0x3F) << 7) + ((int(self._byte_data[4], 16) & 0xFE) >> 1)
-        self.raw_strain[1] = ((int(self._byte_data[7], 16) & 0x07) << 10) + (int(self._byte_data[6], 16) << 2) + (
-                    (int(self._byte_data[5], 16) & 0xC0) >> 6)
-        self.raw_strain[2] = (int(self._byte_data[8], 16) << 5) + ((int(self._byte_data[7], 16) & 0xF8) >> 3)
+        self.raw_strain[0] = ((self._byte_data[5] & 0x3F) << 7) + ((self._byte_data[4] & 0xFE) >> 1)
+        self.raw_strain[1] = ((self._byte_data[7] & 0x07) << 10) + (self._byte_data[6] << 2) + (
+                    (self._byte_data[5] & 0xC0) >> 6)
+        self.raw_strain[2] = (self._byte_data[8] << 5) + ((self._byte_data[7] & 0xF8) >> 3)
 
         # Extract principal strains and angle from bytes 9-13
-        self.raw_strain[3] = ((int(self._byte_data[10], 16) & 0x1F) << 8) + int(self._byte_data[9], 16)
+        self.raw_strain[3] = ((self._byte_data[10] & 0x1F) << 8) + self._byte_data[9]
         self.raw_strain[4] = (
-                    ((int(self._byte_data[12], 16) & 0x03) << 11) + ((int(self._byte_data[11], 16) & 0x1F) << 3) + (
-                        (int(self._byte_data[10], 16) & 0xE0) >> 5))
-        self.raw_strain[5] = ((int(self._byte_data[13], 16) & 0x7F) << 6) + ((int(self._byte_data[12], 16) & 0xFC) >> 2)
+                    ((self._byte_data[12] & 0x03) << 11) + ((self._byte_data[11] & 0x1F) << 3) + (
+                        (self._byte_data[10] & 0xE0) >> 5))
+        self.raw_strain[5] = ((self._byte_data[13] & 0x7F) << 6) + ((self._byte_data[12] & 0xFC) >> 2)
         return self.raw_strain
 
     def parser_get_environment(self):
@@ -219,10 +227,10 @@ class IPRParser:
         - Humidity (index 2)
         - Temperature (index 3)
         """
-        self.raw_env[0] = ((int(self._byte_data[5], 16) & 0x02) << 7) + ((int(self._byte_data[4], 16) & 0xFE) >> 1)
-        self.raw_env[1] = (int(self._byte_data[6], 16) << 6) + ((int(self._byte_data[5], 16) & 0xFC) >> 2)
-        self.raw_env[2] = ((int(self._byte_data[8], 16) & 0x03) << 8) + int(self._byte_data[7], 16)
-        self.raw_env[3] = ((int(self._byte_data[9], 16) & 0x1F) << 6) + ((int(self._byte_data[8], 16) & 0xFC) >> 2)
+        self.raw_env[0] = ((self._byte_data[5] & 0x02) << 7) + ((self._byte_data[4] & 0xFE) >> 1)
+        self.raw_env[1] = (self._byte_data[6] << 6) + ((self._byte_data[5] & 0xFC) >> 2)
+        self.raw_env[2] = ((self._byte_data[8] & 0x03) << 8) + self._byte_data[7]
+        self.raw_env[3] = ((self._byte_data[9] & 0x1F) << 6) + ((self._byte_data[8] & 0xFC) >> 2)
         return self.raw_env
 
     def parser_get_acceleration(self):
@@ -230,10 +238,10 @@ class IPRParser:
         Extract acceleration measurements from packet.
         Returns array containing XYZ acceleration values.
         """
-        self.raw_acc[0] = ((int(self._byte_data[5], 16) & 0x1F) << 7) + ((int(self._byte_data[4], 16) & 0xFE) >> 1)
-        self.raw_acc[1] = ((int(self._byte_data[7], 16) & 0x01) << 11) + (int(self._byte_data[6], 16) << 3) + (
-                    (int(self._byte_data[5], 16) & 0xE0) >> 5)
-        self.raw_acc[2] = ((int(self._byte_data[8], 16) & 0x1F) << 7) + ((int(self._byte_data[7], 16) & 0xFE) >> 1)
+        self.raw_acc[0] = ((self._byte_data[5] & 0x1F) << 7) + ((self._byte_data[4] & 0xFE) >> 1)
+        self.raw_acc[1] = ((self._byte_data[7] & 0x01) << 11) + (self._byte_data[6] << 3) + (
+                    (self._byte_data[5] & 0xE0) >> 5)
+        self.raw_acc[2] = ((self._byte_data[8] & 0x1F) << 7) + ((self._byte_data[7] & 0xFE) >> 1)
         return self.raw_acc
 
     def parser_scale_strain_xyz(self):
@@ -0,0 +1,283 @@
+"""
+Codecs of the MQTT payloads.
+
+Every encoded payload starts with a 5-byte header identifying how it was
+encoded, so the receivers decode it with decode_payload() whatever the
+settings of the publisher:
+
+    byte 0      CODEC_VERSION
+    byte 1      compression backend (BACKEND_IDS)
+    byte 2      pre-filters (FILTER_* flags)
+    bytes 3-4   record layout (LAYOUT_*), uint16 little-endian
+
+Uncompressed payloads have a 1-byte header instead, COMPACT_HEADER | layout
+(version in the high bits, no backend nor filters), so a 25-byte environment
+packet is sent as 26 bytes.
+
+The pre-filters rearrange fixed-size records before the compression, which
+then finds far more redundancy than in the interleaved rows:
+
+- FILTER_TRANSPOSE stores each field of the records as a column
+- FILTER_DELTA replaces the integer fields (timestamps) by the difference with
+  the previous value and the float fields by the XOR with the previous value
+- FILTER_SHUFFLE stores the bytes of each column by significance (byte planes)
+
+Payloads smaller than min_size are sent as they are (BACKEND_NONE), since a
+compressed tiny message comes out larger than it went in. The same happens
+when the compression does not reduce the size.
+"""
+import bz2
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC_VERSION = 1
+PAYLOAD_HEADER = struct.Struct('<BBBH')  # Version, backend, filters, layout
+COMPACT_HEADER = 0x80 | (CODEC_VERSION << 4)  # 1-byte header of the uncompressed payloads, | layout (< 16)
+
+# Compression backends
+BACKEND_NONE = "none"
+BACKEND_ZLIB = "zlib"
+BACKEND_LZMA = "lzma"
+BACKEND_BZ2 = "bz2"
+BACKEND_ZSTD = "zstd"  # Requires the zstandard package
+BACKEND_IDS = {BACKEND_NONE: 0, BACKEND_ZLIB: 1, BACKEND_LZMA: 2, BACKEND_BZ2: 3, BACKEND_ZSTD: 4}
+DEFAULT_LEVELS = {BACKEND_NONE: 0, BACKEND_ZLIB: 6, BACKEND_LZMA: 6, BACKEND_BZ2: 9, BACKEND_ZSTD: 3}
+LEVEL_RANGES = {BACKEND_NONE: (0, 0), BACKEND_ZLIB: (0, 9), BACKEND_LZMA: (0, 9), BACKEND_BZ2: (1, 9),
+                BACKEND_ZSTD: (1, 22)}  # Lowest and highest compression level of each backend
+
+# Pre-filters, only applied to payloads with a record layout
+FILTER_TRANSPOSE = 0x01
+FILTER_DELTA = 0x02    # Requires FILTER_TRANSPOSE
+FILTER_SHUFFLE = 0x04  # Requires FILTER_TRANSPOSE
+DEFAULT_FILTERS = FILTER_TRANSPOSE | FILTER_DELTA | FILTER_SHUFFLE
+
+# Record layouts: fields as (kind, size in bytes), 'f' float (XOR delta), 'u' unsigned integer (difference)
+LAYOUT_RAW = 0          # Opaque bytes, never filtered
+LAYOUT_HIGH_FREQ = 1    # '<9fQ': 9 float values + host timestamp (ns)
+LAYOUT_ENV = 2          # '<4fQB': 4 float values + host timestamp (ns) + sensor id
+LAYOUT_RAW_TELEGRAMS = 3  # Raw telegram batch (see ipr_raw_batch), never filtered
+LAYOUTS = {
+    LAYOUT_RAW: (),
+    LAYOUT_HIGH_FREQ: (('f', 4),) * 9 + (('u', 8),),
+    LAYOUT_ENV: (('f', 4),) * 4 + (('u', 8), ('u', 1)),
+    LAYOUT_RAW_TELEGRAMS: (),
+}
+
+MIN_COMPRESS_SIZE = 128  # Smaller payloads are sent uncompressed
+
+
+def get_available_backends():
+    """
+    Get the compression backends usable here.
+
+    Returns:
+        list: Backend names
+    """
+    return [_backend for _backend in BACKEND_IDS if _backend != BACKEND_ZSTD or zstandard is not None]
+
+
+def _compress(data, backend, level):
+    """Compress with a backend"""
+    if backend == BACKEND_ZLIB:
+        return zlib.compress(data, level)
+    if backend == BACKEND_LZMA:
+        return lzma.compress(data, preset=level)
+    if backend == BACKEND_BZ2:
+        return bz2.compress(data, compresslevel=level)
+    if backend == BACKEND_ZSTD:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return bytes(data)
+
+
+def _decompress(data, backend_id):
+    """Decompress with a backend, identified by its header id"""
+    if backend_id == BACKEND_IDS[BACKEND_ZLIB]:
+        return zlib.decompress(data)
+    if backend_id == BACKEND_IDS[BACKEND_LZMA]:
+        return lzma.decompress(data)
+    if backend_id == BACKEND_IDS[BACKEND_BZ2]:
+        return bz2.decompress(data)
+    if backend_id == BACKEND_IDS[BACKEND_ZSTD]:
+        if zstandard is None:
+            raise ImportError("zstandard is required to decode this payload")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if backend_id == BACKEND_IDS[BACKEND_NONE]:
+        return bytes(data)
+    raise ValueError(f"Unknown payload compression backend {backend_id}")
+
+
+def _get_record_size(layout):
+    """Size in bytes of a record of a layout"""
+    return sum(_size for _kind, _size in LAYOUTS[layout])
+
+
+def apply_filters(payload, layout, filters):
+    """
+    Rearrange fixed-size records before the compression.
+
+    Args:
+        payload (bytes-like): Packed records of the layout
+        layout (int): LAYOUT_* of the records
+        filters (int): FILTER_* flags
+
+    Returns:
+        bytes: Filtered payload, same size
+    """
+    _record_size = _get_record_size(layout)
+    _rows = np.frombuffer(payload, dtype=np.uint8).reshape(-1, _record_size)
+    _parts = list()
+    _offset = 0
+    for _kind, _size in LAYOUTS[layout]:
+        _column = np.ascontiguousarray(_rows[:, _offset:_offset + _size]).view(f'<u{_size}').ravel()
+        if filters & FILTER_DELTA and _column.size > 1:
+            _previous = _column[:-1]
+            _column = _column.copy()
+            if _kind == 'f':
+                _column[1:] ^= _previous
+            else:
+                _column[1:] -= _previous  # Wraps around, undone exactly by the cumulative sum
+        if filters & FILTER_SHUFFLE and _size > 1:
+            _column = _column.view(np.uint8).reshape(-1, _size).T
+        _parts.append(np.ascontiguousarray(_column).tobytes())
+        _offset += _size
+    return b''.join(_parts)
+
+
+def remove_filters(payload, layout, filters):
+    """
+    Undo apply_filters().
+
+    Args:
+        payload (bytes-like): Filtered payload
+        layout (int): LAYOUT_* of the records
+        filters (int): FILTER_* flags used to encode it
+
+    Returns:
+        bytes: Packed records
+    """
+    _record_size = _get_record_size(layout)
+    _data = np.frombuffer(payload, dtype=np.uint8)
+    _count = _data.size // _record_size
+    _rows = np.empty((_count, _record_size), dtype=np.uint8)
+    _position = 0
+    _offset = 0
+    for _kind, _size in LAYOUTS[layout]:
+        _column = _data[_position:_position + _count * _size]
+        if filters & FILTER_SHUFFLE and _size > 1:
+            _column = np.ascontiguousarray(_column.reshape(_size, _count).T)
+        _column = np.ascontiguousarray(_column).view(f'<u{_size}')
+        if filters & FILTER_DELTA:
+            if _kind == 'f':
+                _column = np.bitwise_xor.accumulate(_column)
+            else:
+                _column = np.cumsum(_column, dtype=_column.dtype)
+        _rows[:, _offset:_offset + _size] = _column.view(np.uint8).reshape(_count, _size)
+        _position += _count * _size
+        _offset += _size
+    return _rows.tobytes()
+
+
+def is_encoded_payload(payload):
+    """
+    Check if a payload starts with a codec header (full or compact).
+
+    Args:
+        payload (bytes-like): Received MQTT payload
+
+    Returns:
+        bool: True if decode_payload() can read it
+    """
+    return len(payload) > 0 and (payload[0] == CODEC_VERSION or payload[0] & 0xF0 == COMPACT_HEADER)
+
+
+def _pack_uncompressed(payload, layout):
+    """Prefix an uncompressed payload with the shortest header of its layout"""
+    if layout < 0x10:
+        return bytes([COMPACT_HEADER | layout]) + bytes(payload)
+    return PAYLOAD_HEADER.pack(CODEC_VERSION, BACKEND_IDS[BACKEND_NONE], 0, layout) + bytes(payload)
+
+
+def decode_payload(payload):
+    """
+    Decode a payload encoded by IPRPayloadCodec.
+
+    Args:
+        payload (bytes-like): Received MQTT payload, header included
+
+    Returns:
+        tuple: (packed records as bytes, LAYOUT_* of the records)
+    """
+    if len(payload) and payload[0] & 0xF0 == COMPACT_HEADER:
+        return bytes(memoryview(payload)[1:]), payload[0] & 0x0F
+    if len(payload) < PAYLOAD_HEADER.size:
+        raise ValueError(f"Payload too short for its header: {len(payload)} bytes")
+    _version, _backend_id, _filters, _layout = PAYLOAD_HEADER.unpack_from(payload)
+    if _version != CODEC_VERSION:
+        raise ValueError(f"Unknown payload codec version {_version}")
+    _data = _decompress(memoryview(payload)[PAYLOAD_HEADER.size:], _backend_id)
+    if _filters & FILTER_TRANSPOSE:
+        if _layout not in LAYOUTS:
+            raise ValueError(f"Unknown payload layout {_layout}")
+        _data = remove_filters(_data, _layout, _filters)
+    return _data, _layout
+
+
+class IPRPayloadCodec:
+    """
+    Encoder of the MQTT payloads: pre-filters, compression backend and level.
+
+    The settings only affect the publisher, the receivers read them from the
+    header of each payload (see decode_payload()).
+    """
+
+    def __init__(self, backend=BACKEND_ZLIB, level=None, filters=DEFAULT_FILTERS, min_size=MIN_COMPRESS_SIZE):
+        """
+        Initialize the codec.
+
+        Args:
+            backend (str): Compression backend, see get_available_backends()
+            level (int): Compression level of the backend (default: DEFAULT_LEVELS)
+            filters (int): FILTER_* flags applied to the payloads with a record layout
+            min_size (int): Payloads smaller than this are not compressed
+        """
+        if backend not in BACKEND_IDS:
+            raise ValueError(f"Unknown compression backend {backend}")
+        if backend == BACKEND_ZSTD and zstandard is None:
+            raise ImportError("zstandard is required for the zstd backend")
+        if filters & (FILTER_DELTA | FILTER_SHUFFLE) and not filters & FILTER_TRANSPOSE:
+            raise ValueError("FILTER_DELTA and FILTER_SHUFFLE require FILTER_TRANSPOSE")
+        self.backend = backend
+        self.level = DEFAULT_LEVELS[backend] if level is None else level
+        self.filters = filters
+        self.min_size = min_size
+
+    def encode(self, payload, layout=LAYOUT_RAW):
+        """
+        Encode a payload.
+
+        Args:
+            payload (bytes-like): Packed records of the layout, or bytes without records (LAYOUT_RAW...)
+            layout (int): LAYOUT_* of the records
+
+        Returns:
+            bytes: Header followed by the encoded payload
+        """
+        if self.backend == BACKEND_NONE or len(payload) < self.min_size:
+            return _pack_uncompressed(payload, layout)
+
+        _filters = self.filters if LAYOUTS.get(layout) else 0
+        if _filters and len(payload) % _get_record_size(layout):
+            _filters = 0  # Not whole records, compress as they are
+        _data = apply_filters(payload, layout, _filters) if _filters else payload
+        _compressed = _compress(_data, self.backend, self.level)
+        if len(_compressed) + PAYLOAD_HEADER.size >= len(payload) + 1:
+            return _pack_uncompressed(payload, layout)
+        return PAYLOAD_HEADER.pack(CODEC_VERSION, BACKEND_IDS[self.backend], _filters, layout) + _compressed
@@ -0,0 +1,152 @@
+"""
+Batches of raw telegrams, published without decoding them on the edge.
+
+In pass-through mode the publisher sends the unescaped telegrams as they were
+framed from the serial stream (about 14 bytes each instead of 44 bytes per
+decoded sample) and the server decodes them with IPRBatchDecoder. A batch
+payload is:
+
+    RAW_BATCH_HEADER    sensor id, telegram count, anchor count
+    anchors             ANCHOR_STRUCT per anchor: raw 27-bit device timestamp of the
+                        last telegram of a received chunk and its host reception time (ns)
+    lengths             1 byte per telegram
+    telegrams           the unescaped telegrams, back to back
+
+The anchors let the server rebuild the host timestamps with IPRTimebase, as
+the publisher does for the decoded batches.
+"""
+import struct
+
+import numpy as np
+
+from pyipr_sensor_lib.ipr_batch_decoder import IPRBatchDecoder, TELEGRAM_WIDTH
+from pyipr_sensor_lib.ipr_parser import IPRParser
+
+RAW_BATCH_HEADER = struct.Struct('<HIH')  # Sensor id, telegram count, anchor count
+ANCHOR_STRUCT = struct.Struct('<IQ')      # Raw device timestamp, host time (ns)
+ANCHOR_DTYPE = np.dtype([('device_timestamp', '<u4'), ('host_ns', '<u8')])
+MAX_RAW_TELEGRAM_SIZE = 255  # Length stored on one byte, longer telegrams are line noise
+
+
+def get_raw_timestamp(telegram):
+    """
+    Get the raw device timestamp of a telegram, as IPRParser.parser_get_timestamp.
+
+    Args:
+        telegram (bytes): Unescaped telegram
+
+    Returns:
+        int: 27-bit device timestamp, or None if the telegram is too short
+    """
+    if len(telegram) < IPRParser.MIN_TELEGRAM_SIZE:
+        return None
+    return (((telegram[4] & 0x01) << 26) + (telegram[3] << 18) + (telegram[2] << 10) +
+            (telegram[1] << 2) + ((telegram[0] & 0xC0) >> 6))
+
+
+class IPRRawTelegramBatch:
+    """Raw telegrams of a batch in reusable buffers"""
+
+    def __init__(self):
+        """Initialize an empty batch."""
+        self._lengths = bytearray()
+        self._data = bytearray()
+        self.anchors = list()  # (raw device timestamp, host time ns)
+        self.dropped_count = 0  # Telegrams too long to be stored
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add_telegrams(self, telegrams, host_ns=None):
+        """
+        Append a received chunk of telegrams.
+
+        Args:
+            telegrams (list): Unescaped telegrams, in reception order
+            host_ns (int): Host reception time of the chunk in ns, anchored on its last telegram
+        """
+        if any(len(_telegram) > MAX_RAW_TELEGRAM_SIZE for _telegram in telegrams):
+            _count = len(telegrams)
+            telegrams = [_telegram for _telegram in telegrams if len(_telegram) <= MAX_RAW_TELEGRAM_SIZE]
+            self.dropped_count += _count - len(telegrams)
+        if not telegrams:
+            return
+        self._lengths.extend(map(len, telegrams))
+        self._data += b''.join(telegrams)
+        if host_ns is not None:
+            _timestamp = get_raw_timestamp(telegrams[-1])
+            if _timestamp is not None:
+                self.anchors.append((_timestamp, host_ns))
+
+    def get_payload(self, sensor_id):
+        """
+        Pack the batch.
+
+        Args:
+            sensor_id (int): Sensor ID written in the header
+
+        Returns:
+            bytes: Batch payload (see the module description)
+        """
+        _anchors = b''.join(ANCHOR_STRUCT.pack(_timestamp, _host_ns) for _timestamp, _host_ns in self.anchors)
+        return b''.join((RAW_BATCH_HEADER.pack(sensor_id, len(self._lengths), len(self.anchors)),
+                         _anchors, self._lengths, self._data))
+
+    def get_size(self):
+        """Get the size of the telegrams in bytes"""
+        return len(self._data)
+
+    def clear(self):
+        """Empty the batch, the buffers are reused"""
+        del self._lengths[:]
+        del self._data[:]
+        self.anchors.clear()
+
+
+def unpack_raw_batch(payload, width=TELEGRAM_WIDTH):
+    """
+    Split a raw telegram batch.
+
+    Args:
+        payload (bytes-like): Batch payload, once decoded by decode_payload()
+        width (int): Number of bytes kept per telegram
+
+    Returns:
+        tuple: (sensor id, structured array of the anchors (ANCHOR_DTYPE),
+                numpy.ndarray (N, width) of uint8 zero padded telegrams, numpy.ndarray (N,) of lengths)
+    """
+    _sensor_id, _count, _anchor_count = RAW_BATCH_HEADER.unpack_from(payload)
+    _position = RAW_BATCH_HEADER.size
+    _anchors = np.frombuffer(payload, dtype=ANCHOR_DTYPE, count=_anchor_count, offset=_position)
+    _position += _anchor_count * ANCHOR_STRUCT.size
+    _lengths = np.frombuffer(payload, dtype=np.uint8, count=_count, offset=_position).astype(np.int64)
+    _position += _count
+    _data = np.frombuffer(payload, dtype=np.uint8, offset=_position)
+    if _data.size != int(_lengths.sum()):
+        raise ValueError(f"Raw batch of {_count} telegrams holds {_data.size} bytes instead of {_lengths.sum()}")
+
+    # Scatter the telegrams in a zero padded matrix, as frame_buffer() does
+    _starts = np.cumsum(_lengths) - _lengths
+    _row = np.repeat(np.arange(_count), _lengths)
+    _column = np.arange(_data.size) - np.repeat(_starts, _lengths)
+    _matrix = np.zeros((_count, width), dtype=np.uint8)
+    _in_width = _column < width
+    _matrix[_row[_in_width], _column[_in_width]] = _data[_in_width]
+    return _sensor_id, _anchors, _matrix, _lengths
+
+
+def decode_raw_batch(payload, decoder=None):
+    """
+    Decode the telegrams of a raw telegram batch.
+
+    Args:
+        payload (bytes-like): Batch payload, once decoded by decode_payload()
+        decoder (IPRBatchDecoder): Decoder to use (default: a new one)
+
+    Returns:
+        tuple: (sensor id, anchors structured array, dict packet type name -> structured array of records)
+    """
+    _decoder = decoder if decoder is not None else IPRBatchDecoder()
+    _sensor_id, _anchors, _matrix, _lengths = unpack_raw_batch(payload)
+    _decoder.invalid_data_number = 0
+    return _sensor_id, _anchors, _decoder.decode_telegrams(_matrix, _lengths)
@@ -0,0 +1,314 @@
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+from pyipr_sensor_lib.ipr_parser import IPRParser
+from pyipr_sensor_lib.ipr_telegram_framer import ipr_unescape
+
+# Sidecar file layout:
+# - header: magic, version, number of bytes of the recording already scanned
+# - entries: telegram offset, device timestamp (unwrapped), telegram size, packet type
+INDEX_MAGIC = b'IPRX'
+INDEX_VERSION = 2  # 2: running maximum of the timestamps, version 1 indexes are rebuilt
+INDEX_HEADER = struct.Struct('<4sHQ')
+INDEX_ENTRY = struct.Struct('<QQHB')
+INDEX_FILE_EXTENSION = '.idx'
+
+# The device timestamp is a 27-bit counter (see IPRParser.parser_get_timestamp)
+TIMESTAMP_RANGE = 1 << 27
+# Steps larger than this are only followed once the next telegram confirms them (corrupted timestamps)
+MAX_TIMESTAMP_JUMP = TIMESTAMP_RANGE // 16
+
+# Minimum telegram size (in bytes) of each packet type ID
+_MIN_TELEGRAM_SIZE = {
+    0x00: IPRParser.MIN_TELEGRAM_SIZE_STRAIN,
+    0x01: IPRParser.MIN_TELEGRAM_SIZE_ENVIRONMENT,
+    0x02: IPRParser.MIN_TELEGRAM_SIZE_ACCELERATION,
+}
+
+
+class IPRRecordingIndex:
+    """
+    Random access to a binary recording through a sidecar telegram index.
+
+    The recording written by IprSensorSerialLoggerThread is scanned once and the
+    offset, size, packet type and device timestamp of every valid telegram are
+    stored in a compact sidecar file (recording name + '.idx'). Telegrams and
+    time ranges are then served from a memory map of the recording, without
+    reading the rest of the file. update() only scans the data appended since
+    the last call, so the index can follow a recording which is still growing.
+
+    Device timestamps are unwrapped across the 27-bit counter rollovers and
+    indexed as a running maximum, so they never decrease along the recording
+    and the time range lookups can bisect them: a telegram stamped before its
+    predecessor (jitter, or a corrupted timestamp that passed the 1-bit CRC)
+    is indexed at the timestamp of its predecessor. A telegram jumping by more
+    than MAX_TIMESTAMP_JUMP is indexed the same way, as a corrupted timestamp,
+    and the jump is only followed if the next telegram confirms it.
+    """
+
+    def __init__(self, bin_path, index_path=None):
+        """
+        Initialize the index. The sidecar file is loaded if it already exists.
+
+        Args:
+            bin_path (str): Path of the binary recording
+            index_path (str): Path of the sidecar index file (default: bin_path + '.idx')
+        """
+        self.bin_path = bin_path
+        self.index_path = index_path if index_path else bin_path + INDEX_FILE_EXTENSION
+
+        # Index entries, one column per field
+        self.offsets = array('Q')
+        self.timestamps = array('Q')
+        self.sizes = array('H')
+        self.packet_types = array('B')
+        self.scanned_size = 0  # Bytes of the recording already indexed
+        # (unwrapped, raw) device timestamp of the last telegram, before the maximum, and unconfirmed jump
+        self._unwrap_state = None
+
+        self._file = None
+        self._mmap = None
+
+        self._load()
+
+    def _load(self):
+        """Load the sidecar file, entries beyond the scanned size are ignored."""
+        if not os.path.exists(self.index_path):
+            return
+
+        with open(self.index_path, 'rb') as file:
+            _header = file.read(INDEX_HEADER.size)
+            if len(_header) < INDEX_HEADER.size:
+                return
+            _magic, _version, _scanned_size = INDEX_HEADER.unpack(_header)
+            if _magic != INDEX_MAGIC or _version != INDEX_VERSION:
+                print("Invalid index file {}, it will be rebuilt".format(self.index_path))
+                return
+
+            _content = file.read()
+
+        _usable_size = len(_content) - len(_content) % INDEX_ENTRY.size
+        for _offset, _timestamp, _size, _packet_type in INDEX_ENTRY.iter_unpack(_content[:_usable_size]):
+            if _offset + _size > _scanned_size:
+                break  # Entry written after the header was last saved
+            self.offsets.append(_offset)
+            self.timestamps.append(_timestamp)
+            self.sizes.append(_size)
+            self.packet_types.append(_packet_type)
+        self.scanned_size = _scanned_size
+
+    def _save(self, first_new_entry):
+        """
+        Append the new entries to the sidecar file, then update its header.
+
+        Args:
+            first_new_entry (int): Index of the first entry not saved yet
+        """
+        _mode = 'r+b' if os.path.exists(self.index_path) and first_new_entry > 0 else 'wb'
+        with open(self.index_path, _mode) as file:
+            file.seek(INDEX_HEADER.size + first_new_entry * INDEX_ENTRY.size)
+            file.truncate()
+            _entries = bytearray()
+            for i in range(first_new_entry, len(self.offsets)):
+                _entries += INDEX_ENTRY.pack(self.offsets[i], self.timestamps[i], self.sizes[i],
+                                             self.packet_types[i])
+            file.write(_entries)
+            file.flush()
+
+            # The header is written last, a crash leaves a consistent index
+            file.seek(0)
+            file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.scanned_size))
+
+    def open(self):
+        """Map the recording in memory, the mapping is refreshed when the file grew."""
+        _file_size = os.path.getsize(self.bin_path)
+        if self._mmap is not None and len(self._mmap) == _file_size:
+            return
+        self.close()
+        if _file_size == 0:
+            return
+        self._file = open(self.bin_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """Release the memory map of the recording."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def update(self):
+        """
+        Index the telegrams appended to the recording since the last update.
+
+        Only complete telegrams (followed by a SOF byte) are indexed, the
+        telegram being written is picked up by the next update.
+
+        Returns:
+            int: Number of new entries
+        """
+        self.open()
+        if self._mmap is None:
+            return 0
+
+        _mm = self._mmap
+        if self.scanned_size > len(_mm):
+            print("Recording {} is smaller than its index, the index is rebuilt".format(self.bin_path))
+            self.offsets, self.timestamps, self.sizes, self.packet_types = array('Q'), array('Q'), array('H'), array('B')
+            self.scanned_size = 0
+            self._unwrap_state = None
+
+        _first_new_entry = len(self.offsets)
+        _position = self.scanned_size
+
+        # Unwrap state of the device timestamp (from the index alone if it was just loaded)
+        _jump = None  # (unwrapped, raw) device timestamp of an unconfirmed jump
+        if self._unwrap_state is not None:
+            _unwrapped, _previous, _jump = self._unwrap_state
+        elif self.timestamps:
+            _unwrapped = self.timestamps[-1]
+            _previous = _unwrapped % TIMESTAMP_RANGE
+        else:
+            _unwrapped = None
+            _previous = 0
+        _indexed = self.timestamps[-1] if self.timestamps else 0  # Running maximum
+
+        while True:
+            _sof = _mm.find(b'\x08', _position)
+            if _sof < 0:
+                break
+
+            _size = _sof - _position
+            if 0 < _size <= 0xFFFF:
+                _telegram = ipr_unescape(_mm[_position:_sof])
+                _byte0 = _telegram[0] if _telegram else 0
+                _packet_id = _byte0 & 0x03
+                _is_crc_valid = ((_byte0 & 0x04) >> 2) == (((_byte0 & 0x02) >> 1) ^ (_byte0 & 0x01))
+                if (len(_telegram) >= IPRParser.MIN_TELEGRAM_SIZE and _is_crc_valid
+                        and len(_telegram) >= _MIN_TELEGRAM_SIZE.get(_packet_id, 0xFFFF)):
+                    _timestamp = (((_telegram[4] & 0x01) << 26) + (_telegram[3] << 18) + (_telegram[2] << 10) +
+                                  (_telegram[1] << 2) + ((_byte0 & 0xC0) >> 6))
+                    if _unwrapped is None:
+                        _unwrapped = _timestamp
+                        _previous = _timestamp
+                    else:
+                        _delta = self._get_step(_previous, _timestamp)
+                        if abs(_delta) <= MAX_TIMESTAMP_JUMP:
+                            _unwrapped = max(0, _unwrapped + _delta)
+                            _previous = _timestamp
+                            _jump = None
+                        elif _jump is not None and abs(self._get_step(_jump[1], _timestamp)) <= MAX_TIMESTAMP_JUMP:
+                            # Two consecutive telegrams agree: the jump is real (e.g. a pause of the sensor)
+                            _unwrapped = max(0, _jump[0] + self._get_step(_jump[1], _timestamp))
+                            _previous = _timestamp
+                            _jump = None
+                        else:
+                            _jump = (max(0, _unwrapped + _delta), _timestamp)
+                    _indexed = max(_indexed, _unwrapped)
+
+                    self.offsets.append(_position)
+                    self.timestamps.append(_indexed)
+                    self.sizes.append(_size)
+                    self.packet_types.append(_packet_id)
+
+            _position = _sof + 1
+
+        if _unwrapped is not None:
+            self._unwrap_state = (_unwrapped, _previous, _jump)
+        if _position != self.scanned_size:
+            self.scanned_size = _position
+            self._save(_first_new_entry)
+        return len(self.offsets) - _first_new_entry
+
+    @staticmethod
+    def _get_step(previous, timestamp):
+        """Step between two raw device timestamps: small steps backward are jitter, big ones are rollovers"""
+        _delta = (timestamp - previous) % TIMESTAMP_RANGE
+        if _delta >= TIMESTAMP_RANGE // 2:
+            _delta -= TIMESTAMP_RANGE
+        return _delta
+
+    def __len__(self):
+        """Number of indexed telegrams."""
+        return len(self.offsets)
+
+    def __enter__(self):
+        """Context manager entry"""
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit"""
+        self.close()
+
+    def get_telegram(self, entry):
+        """
+        Get an indexed telegram.
+
+        Args:
+            entry (int): Index entry number
+
+        Returns:
+            bytes: Unescaped telegram, ready for IPRSensorDecoder.analyse_packet()
+        """
+        self.open()
+        _offset = self.offsets[entry]
+        return ipr_unescape(self._mmap[_offset:_offset + self.sizes[entry]])
+
+    def find_time_range(self, start_timestamp, end_timestamp):
+        """
+        Find the entries of a device timestamp range.
+
+        Args:
+            start_timestamp (int): First unwrapped device timestamp (included)
+            end_timestamp (int): Last unwrapped device timestamp (included)
+
+        Returns:
+            tuple: (first entry, last entry + 1), empty if first == last
+        """
+        _first = bisect_left(self.timestamps, start_timestamp)
+        _last = bisect_right(self.timestamps, end_timestamp, lo=_first)
+        return _first, _last
+
+    def get_raw_range(self, first_entry, last_entry):
+        """
+        Get the raw bytes holding a range of entries.
+
+        Only this part of the recording is read. The result can be given as is
+        to IPRBatchDecoder.decode_buffer().
+
+        Args:
+            first_entry (int): First entry (included)
+            last_entry (int): Last entry (excluded)
+
+        Returns:
+            bytes: Raw data of the recording, empty if the range is empty
+        """
+        self.open()
+        if first_entry >= last_entry or self._mmap is None:
+            return b''
+        _start = self.offsets[first_entry]
+        _end = self.offsets[last_entry - 1] + self.sizes[last_entry - 1]
+        return self._mmap[_start:_end]
+
+    def iter_time_range(self, start_timestamp, end_timestamp, packet_type=None):
+        """
+        Iterate over the telegrams of a device timestamp range.
+
+        Args:
+            start_timestamp (int): First unwrapped device timestamp (included)
+            end_timestamp (int): Last unwrapped device timestamp (included)
+            packet_type (int): Only yield this packet type ID if given
+
+        Yields:
+            bytes: Unescaped telegrams, ready for IPRSensorDecoder.analyse_packet()
+        """
+        _first, _last = self.find_time_range(start_timestamp, end_timestamp)
+        for _entry in range(_first, _last):
+            if packet_type is None or self.packet_types[_entry] == packet_type:
+                yield self.get_telegram(_entry)
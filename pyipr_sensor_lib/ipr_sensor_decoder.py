@@ -67,21 +67,16 @@ class IPRSensorDecoder:
         Returns:
             list: List of telegrams extracted from the file, each telegram represents
                  a separate sensor measurement
+
+        Notes:
+            - The whole file is held in memory, use IPRStreamReader for long recordings
         """
         # Open file in binary read mode
         with open(filepath + filename, 'rb') as file:
             file_content = file.read()
 
-        # Process content into telegrams
-        packet_list = list()
-        tmp_str = ""
-        # Split data on 0x08 marker bytes
-        for byte_data in file_content:
-            if byte_data == 0x8:  # Check for telegram separator
-                packet_list.append(tmp_str)
-                tmp_str = ""
-            else:
-                tmp_str += f"{byte_data:02x}"  # Convert bytes to hex string
+        # Split data on 0x08 marker bytes, the data after the last marker is incomplete
+        packet_list = [telegram.hex() for telegram in file_content.split(b'\x08')[:-1]]
 
         return packet_list
 
@@ -116,30 +111,42 @@ class IPRSensorDecoder:
         This method:
         1. Creates a new parser instance for the packet
         2. Validates the telegram format
-        3. Converts hex to bytes and extracts header
+        3. Converts hex to bytes (hex strings only) and extracts header
         4. Identifies packet type (strain/environment/acceleration)
         5. Processes data according to packet type
         6. Sets validity flag based on successful processing
 
         Args:
-            packet: Raw packet data to analyze
+            packet: Raw packet data to analyze, either a hexadecimal string or the
+                    unescaped bytes of a telegram (see IPRTelegramFramer)
 
         Notes:
             - Different packet types have different minimum length requirements
+            - Byte telegrams are parsed in place, without any hexadecimal conversion
             - Sets is_packet_valid flag to indicate successful processing
             - Handles three types of measurements: strain, environment, and acceleration
         """
         self.ipr_parser_obj = IPRParser(packet)
 
+        if isinstance(packet, str):
+            _min_length_strain = self.ipr_parser_obj.MIN_PACKET_LENGTH_STRAIN
+            _min_length_environment = self.ipr_parser_obj.MIN_PACKET_LENGTH_ENVIRONMENT
+            _min_length_acceleration = self.ipr_parser_obj.MIN_PACKET_LENGTH_ACCELERATION
+        else:
+            _min_length_strain = self.ipr_parser_obj.MIN_TELEGRAM_SIZE_STRAIN
+            _min_length_environment = self.ipr_parser_obj.MIN_TELEGRAM_SIZE_ENVIRONMENT
+            _min_length_acceleration = self.ipr_parser_obj.MIN_TELEGRAM_SIZE_ACCELERATION
+
         # Validate telegram format
         if self.ipr_parser_obj.parser_check_telegram_validity(packet):
             # Convert hex to bytes and extract header
-            self.ipr_parser_obj.parser_hex_to_byte(packet, len(packet))
+            if isinstance(packet, str):
+                self.ipr_parser_obj.parser_hex_to_byte(packet, len(packet))
             self.ipr_parser_obj.parser_get_header()
 
             # Process based on packet type
             if self.ipr_parser_obj.parser_get_id_name() == "STRAIN":
-                if len(packet) >= self.ipr_parser_obj.MIN_PACKET_LENGTH_STRAIN:
+                if len(packet) >= _min_length_strain:
                     self.packet_type = self.TYPE_STRAIN
                     self.ipr_parser_obj.parser_get_strain()
                     self.ipr_parser_obj.parser_scale_strain_xyz()
@@ -150,7 +157,7 @@ class IPRSensorDecoder:
                     print("STRAIN: Data string too short to be process - Length:{} - Data: {}".format(len(packet),packet))
 
             elif self.ipr_parser_obj.parser_get_id_name() == "ENVIRONMENT":
-                if len(packet) >= self.ipr_parser_obj.MIN_PACKET_LENGTH_ENVIRONMENT:
+                if len(packet) >= _min_length_environment:
                     self.packet_type = self.TYPE_ENVIRONMENT
                     self.ipr_parser_obj.parser_get_environment()
                     self.ipr_parser_obj.parser_scale_environment()
@@ -160,7 +167,7 @@ class IPRSensorDecoder:
                     print("ENVIRONMENT: Data string too short to be process")
 
             elif self.ipr_parser_obj.parser_get_id_name() == "ACCELERATION":
-                if len(packet) >= self.ipr_parser_obj.MIN_PACKET_LENGTH_ACCELERATION:
+                if len(packet) >= _min_length_acceleration:
                     self.packet_type = self.TYPE_ACCELERATION
                     self.ipr_parser_obj.parser_get_acceleration()
                     self.ipr_parser_obj.parser_scale_acceleration()
@@ -168,6 +175,8 @@ class IPRSensorDecoder:
                 else:
                     self.is_packet_valid = False
                     print("ACCELERATION: Data string too short to be process")
+            else:
+                self.is_packet_valid = False
         else:
             self.is_packet_valid = False
 
@@ -283,6 +292,15 @@ class IPRSensorDecoder:
         """
         return self.packet_type
 
+    def get_timestamp(self):
+        """
+        Get the device timestamp of the current packet.
+
+        Returns:
+            int: 27-bit device counter (see ipr_timebase to unwrap it and convert it to host time)
+        """
+        return int(self.ipr_parser_obj.raw_header[3])
+
     def ipr_decoder_is_packet_valid(self):
         """
         Check if the current packet was successfully decoded.
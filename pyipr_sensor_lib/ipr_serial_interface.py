@@ -1,5 +1,9 @@
+from collections import deque
+
 import serial
 
+from pyipr_sensor_lib.ipr_telegram_framer import IPRTelegramFramer
+
 # Global configuration flags for debugging purposes
 DEBUG_MODE = False  # Enable/disable general debug information
 DEBUG_SERIAL_RECEIVE = False  # Enable/disable serial data reception debugging
@@ -40,6 +44,9 @@ class IPRSerialInterface:
         self._serial_port_obj = serial.Serial()
         # Flag to track if sensor is in binary reading mode
         self.is_binary_reading_running = True
+        # Bytes-native framing of the binary stream
+        self._telegram_framer = IPRTelegramFramer()
+        self._telegram_queue = deque()
         print("Initiating IPRSerialInterface -> DONE")
 
     def serial_setup(self, com_port_name):
@@ -215,6 +222,23 @@ class IPRSerialInterface:
                 _telegram.append(data)
         return ''.join(_telegram)
 
+    def serial_ipr_read_telegram_bytes(self):
+        """
+        Read a complete telegram from the serial port in binary mode.
+        All bytes waiting in the driver are read at once and split on the Start of
+        Frame (SOF) character (0x08); the 0x07 escape sequences are already removed.
+
+        Returns:
+            bytes: Complete unescaped telegram
+        """
+        while not self._telegram_queue:
+            _waiting = self._serial_port_obj.in_waiting
+            _data = self._serial_port_obj.read(_waiting if _waiting > 0 else 1)
+            if DEBUG_SERIAL_RECEIVE:
+                print(_data)
+            self._telegram_queue.extend(self._telegram_framer.feed(_data))
+        return self._telegram_queue.popleft()
+
     def serial_ipr_read_text_from_sensor(self):
         """
         Read text response from sensor until end character ('>') is found.
@@ -0,0 +1,125 @@
+from pyipr_sensor_lib.ipr_sensor_decoder import IPRSensorDecoder
+from pyipr_sensor_lib.ipr_telegram_framer import IPRTelegramFramer
+
+# Size of the blocks read from the stream
+STREAM_BLOCK_SIZE = 64 * 1024  # 64 kB
+
+# Names of the scaled values of each packet type, in parser order
+STRAIN_FIELDS = ('strain_x', 'strain_y', 'strain_z', 'strain_p1', 'strain_p2', 'strain_pdeg')
+ENVIRONMENT_FIELDS = ('v_batt', 'pressure', 'humidity', 'temperature')
+ACCELERATION_FIELDS = ('accel_x', 'accel_y', 'accel_z')
+
+
+def decode_record(decoder, telegram):
+    """
+    Decode a telegram into a record.
+
+    Args:
+        decoder (IPRSensorDecoder): Decoder used to analyse the telegram
+        telegram (bytes): Unescaped telegram
+
+    Returns:
+        dict: Decoded record with the packet type (IPRSensorDecoder.TYPE_*),
+              the header fields (id, crc, sequence, timestamp) and the scaled values,
+              or None if the telegram is invalid
+    """
+    decoder.analyse_packet(telegram)
+    if not decoder.ipr_decoder_is_packet_valid():
+        return None
+
+    _parser = decoder.ipr_parser_obj
+    _record = {
+        'type': decoder.get_packet_type(),
+        'id': int(_parser.raw_header[0]),
+        'crc': int(_parser.raw_header[1]),
+        'sequence': int(_parser.raw_header[2]),
+        'timestamp': int(_parser.raw_header[3]),
+    }
+    if decoder.get_packet_type() == decoder.TYPE_STRAIN:
+        _record.update(zip(STRAIN_FIELDS, _parser.scaled_strain))
+    elif decoder.get_packet_type() == decoder.TYPE_ENVIRONMENT:
+        _record.update(zip(ENVIRONMENT_FIELDS, _parser.scaled_env))
+    else:
+        _record.update(zip(ACCELERATION_FIELDS, _parser.scaled_acc))
+    return _record
+
+
+class IPRStreamReader:
+    """
+    Lazy reader of IPR binary recordings with bounded memory.
+
+    The data is read in fixed-size blocks from a file or any binary stream.
+    Telegrams split across two blocks are rebuilt by IPRTelegramFramer, and
+    telegrams / decoded records are yielded one at a time, so only one block is
+    held in memory whatever the length of the recording.
+    """
+
+    def __init__(self, stream, block_size=STREAM_BLOCK_SIZE):
+        """
+        Initialize the stream reader.
+
+        Args:
+            stream: Path of a binary file, or binary stream object (with read() method)
+            block_size (int): Number of bytes read at once (default: 64 kB)
+        """
+        self.stream = stream
+        self.block_size = block_size
+
+        # Statistics
+        self.telegram_count = 0
+        self.invalid_data_number = 0
+
+    def iter_blocks(self):
+        """
+        Read the stream block by block.
+
+        Yields:
+            bytes: Raw blocks of at most block_size bytes
+        """
+        if isinstance(self.stream, str):
+            with open(self.stream, 'rb') as file:
+                yield from iter(lambda: file.read(self.block_size), b'')
+        else:
+            while True:
+                _block = self.stream.read(self.block_size)
+                if not _block:
+                    break
+                yield _block
+
+    def iter_telegrams(self):
+        """
+        Split the stream into telegrams.
+
+        Yields:
+            bytes: Unescaped telegrams, ready for IPRSensorDecoder.analyse_packet()
+        """
+        _framer = IPRTelegramFramer()
+        for _block in self.iter_blocks():
+            for _telegram in _framer.feed(_block):
+                self.telegram_count += 1
+                yield _telegram
+
+        # The last telegram of a recording is not followed by any SOF
+        for _telegram in _framer.flush():
+            self.telegram_count += 1
+            yield _telegram
+
+    def iter_records(self):
+        """
+        Decode the stream telegram by telegram.
+
+        Yields:
+            dict: Decoded record with the packet type (IPRSensorDecoder.TYPE_*),
+                  the header fields (id, crc, sequence, timestamp) and the scaled values
+        """
+        _decoder = IPRSensorDecoder()
+        for _telegram in self.iter_telegrams():
+            _record = decode_record(_decoder, _telegram)
+            if _record is None:
+                self.invalid_data_number += 1
+                continue
+            yield _record
+
+    def __iter__(self):
+        """Iterate over the decoded records."""
+        return self.iter_records()
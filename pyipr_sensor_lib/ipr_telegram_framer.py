@@ -0,0 +1,138 @@
+"""
+Bytes-native framing of the IPR binary telegram stream.
+
+The sensor separates telegrams with a Start of Frame (SOF) byte 0x08. Inside a
+telegram, the bytes 0x08 and 0x07 are escaped as 0x07 0x55 and 0x07 0xAA
+respectively, so every 0x08 found in the raw stream is a real frame boundary.
+"""
+
+# Framing characters of the binary stream
+SOF_BYTE = 0x08  # Start of Frame
+ESCAPE_BYTE = 0x07  # Escape character
+ESCAPED_SOF = 0x55  # 0x07 0x55 -> 0x08
+ESCAPED_ESCAPE = 0xAA  # 0x07 0xAA -> 0x07
+
+# A telegram is only a few bytes long, anything bigger is line noise
+MAX_TELEGRAM_SIZE = 256
+
+_SOF = bytes([SOF_BYTE])
+_ESCAPE = bytes([ESCAPE_BYTE])
+
+
+def ipr_unescape(data):
+    """
+    Undo the 0x07 escape sequences of a raw telegram in a single pass.
+
+    Follows the same rules as IPRParser.parser_hex_to_byte: 0x07 0x55 becomes
+    0x08, 0x07 0xAA becomes 0x07 and any other escaped byte is dropped.
+
+    Args:
+        data (bytes, bytearray or memoryview): Raw telegram without the SOF byte
+
+    Returns:
+        bytes: Unescaped telegram
+    """
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    if ESCAPE_BYTE not in data:
+        return bytes(data)  # Fast path: nothing to unescape
+
+    _unescaped = bytearray()
+    _length = len(data)
+    _position = 0
+    while _position < _length:
+        _index = data.find(_ESCAPE, _position)
+        if _index < 0:
+            _unescaped += data[_position:]
+            break
+        _unescaped += data[_position:_index]
+        if _index + 1 < _length:
+            _code = data[_index + 1]
+            if _code == ESCAPED_SOF:
+                _unescaped.append(SOF_BYTE)
+            elif _code == ESCAPED_ESCAPE:
+                _unescaped.append(ESCAPE_BYTE)
+        _position = _index + 2
+    return bytes(_unescaped)
+
+
+class IPRTelegramFramer:
+    """
+    Incremental framer turning a raw IPR byte stream into unescaped telegrams.
+
+    Raw data of any size is pushed with feed(). Complete telegrams (the bytes
+    preceding each 0x08 SOF) are returned as unescaped bytes, ready for
+    IPRSensorDecoder.analyse_packet(). Incomplete data is kept until the next
+    call, so telegrams split across reads are rebuilt transparently.
+    """
+
+    def __init__(self, max_telegram_size=MAX_TELEGRAM_SIZE):
+        """
+        Initialize the framer.
+
+        Args:
+            max_telegram_size (int): Pending data is discarded when it grows
+                                     beyond this size without any SOF byte
+        """
+        self.max_telegram_size = max_telegram_size
+        self._pending = bytearray()
+
+        # Statistics
+        self.telegram_count = 0
+        self.discarded_bytes = 0
+
+    def feed(self, data):
+        """
+        Push raw bytes into the framer.
+
+        Args:
+            data (bytes, bytearray or memoryview): Raw data read from the sensor
+
+        Returns:
+            list: Complete unescaped telegrams (bytes), possibly empty
+        """
+        if not data:
+            return []
+
+        _new_data_start = len(self._pending)
+        self._pending += data
+        if self._pending.find(_SOF, _new_data_start) < 0:
+            if len(self._pending) > self.max_telegram_size:
+                self.discarded_bytes += len(self._pending)
+                self._pending.clear()
+            return []
+
+        _segments = self._pending.split(_SOF)
+        # The last segment has no SOF yet, keep it for the next call
+        self._pending = _segments.pop()
+
+        _telegrams = [ipr_unescape(_segment) for _segment in _segments if _segment]
+        self.telegram_count += len(_telegrams)
+        return _telegrams
+
+    def flush(self):
+        """
+        Return the pending data as a last telegram and reset the framer.
+
+        Returns:
+            list: The last unescaped telegram, or an empty list if nothing is pending
+        """
+        _telegrams = []
+        if self._pending:
+            _telegrams.append(ipr_unescape(self._pending))
+            self.telegram_count += 1
+        self._pending = bytearray()
+        return _telegrams
+
+    def reset(self):
+        """Discard any pending data."""
+        self._pending = bytearray()
+
+    def pending_size(self):
+        """
+        Get the number of bytes waiting for the next SOF.
+
+        Returns:
+            int: Number of pending bytes
+        """
+        return len(self._pending)
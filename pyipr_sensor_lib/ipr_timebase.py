@@ -0,0 +1,205 @@
+"""
+Device timebase of the IPR sensors.
+
+Every telegram carries a 27-bit device counter (IPRParser.parser_get_timestamp)
+which rolls over regularly. This module unwraps it across the rollovers, in
+bulk over arrays, and maps the unwrapped counter to the host clock with a
+linear fit (offset + drift) over anchor points (device counter, host time).
+
+The host time of an anchor is the time the data was received, always later
+than the time it was sampled by the sensor, by a variable delay (USB, OS
+scheduling). The fitted line is therefore moved down to the anchor received
+with the smallest delay (lower envelope), so the jitter of the host clock
+does not reach the reconstructed timestamps.
+"""
+import time
+from collections import deque
+
+import numpy as np
+
+TIMESTAMP_RANGE = 1 << 27   # The device timestamp is a 27-bit counter
+ANCHOR_WINDOW = 2000        # Anchors kept for the fit (one per received chunk: ~1 min at full rate)
+
+
+def unwrap_timestamps(timestamps, previous=None):
+    """
+    Unwrap device timestamps across the 27-bit counter rollovers.
+
+    Consecutive timestamps are expected to be close: a step of more than half
+    the counter range backward is a rollover, a smaller one is jitter.
+
+    Args:
+        timestamps (array-like): Raw 27-bit device timestamps, in reception order
+        previous (tuple): (last raw timestamp, last unwrapped timestamp) returned by the
+                          previous call for the same stream, or None for the first block
+
+    Returns:
+        tuple: (numpy.ndarray of int64 unwrapped timestamps, new previous tuple)
+    """
+    _timestamps = np.asarray(timestamps, dtype=np.int64)
+    if _timestamps.size == 0:
+        return _timestamps, previous
+    if previous is None:
+        previous = (int(_timestamps[0]), int(_timestamps[0]))
+
+    _delta = np.diff(_timestamps, prepend=previous[0]) % TIMESTAMP_RANGE
+    _delta[_delta >= TIMESTAMP_RANGE // 2] -= TIMESTAMP_RANGE
+    _unwrapped = np.maximum(previous[1] + np.cumsum(_delta), 0)
+    return _unwrapped, (int(_timestamps[-1]), int(_unwrapped[-1]))
+
+
+class IPRTimebase:
+    """
+    Mapping from the unwrapped device counter to the host clock (ns).
+
+    Live: feed the raw device timestamps of each batch to unwrap(), add one
+    anchor per received chunk with add_anchor(), and convert whole batches
+    with to_host_ns(). Offline: build it with from_anchors() from known
+    (device counter, host time) pairs, or from one anchor and the counter
+    period (tick_ns).
+    """
+
+    def __init__(self, tick_ns=None, window=ANCHOR_WINDOW):
+        """
+        Initialize the timebase.
+
+        Args:
+            tick_ns (float): Nominal period of the device counter in ns, used until two
+                             anchors are available (default: unknown)
+            window (int): Number of anchors kept for the fit
+        """
+        self.tick_ns = tick_ns
+        self._anchors = deque(maxlen=window)  # (unwrapped device timestamp, host time ns)
+        self._previous = None  # Unwrap state, see unwrap_timestamps()
+
+        # Mapping: host_ns = reference_host_ns + slope * (device - reference_device)
+        self.slope = tick_ns
+        self.reference_device = None
+        self.reference_host_ns = None
+
+    @classmethod
+    def from_anchors(cls, device_timestamps, host_times_ns, tick_ns=None):
+        """
+        Build a timebase from known anchors.
+
+        Args:
+            device_timestamps (array-like): Unwrapped device timestamps
+            host_times_ns (array-like): Host times (ns) of the same samples
+            tick_ns (float): Nominal period of the device counter in ns, used with a single anchor
+
+        Returns:
+            IPRTimebase: The fitted timebase
+        """
+        _timebase = cls(tick_ns, window=max(1, len(device_timestamps)))
+        for _device, _host_ns in zip(device_timestamps, host_times_ns):
+            _timebase.add_anchor(int(_device), int(_host_ns), refit=False)
+        _timebase.fit()
+        return _timebase
+
+    def reset(self):
+        """
+        Forget the anchors and the unwrap state, the counter period is kept.
+
+        To be called when the stream resumes after a pause: the counter may have
+        rolled over any number of times meanwhile.
+        """
+        self._anchors.clear()
+        self._previous = None
+        self.reference_device = None
+        self.reference_host_ns = None
+
+    def unwrap(self, timestamps):
+        """
+        Unwrap the next raw device timestamps of the stream.
+
+        Args:
+            timestamps (array-like): Raw 27-bit device timestamps, in reception order
+
+        Returns:
+            numpy.ndarray: int64 unwrapped timestamps
+        """
+        _unwrapped, self._previous = unwrap_timestamps(timestamps, self._previous)
+        return _unwrapped
+
+    def add_anchor(self, device_timestamp, host_ns=None, refit=True):
+        """
+        Add a (device timestamp, host time) pair.
+
+        Args:
+            device_timestamp (int): Unwrapped device timestamp of the last sample received
+            host_ns (int): Host time of the reception in ns (default: now)
+            refit (bool): Update the mapping
+        """
+        self._anchors.append((int(device_timestamp), time.time_ns() if host_ns is None else int(host_ns)))
+        if refit:
+            self.fit()
+
+    def fit(self):
+        """
+        Fit the mapping to the anchors.
+
+        Returns:
+            bool: True if a mapping is available
+        """
+        if not self._anchors:
+            return False
+
+        _reference_device, _reference_host_ns = self._anchors[-1]
+        _device = np.array([_anchor[0] - _reference_device for _anchor in self._anchors], dtype=np.float64)
+        _host = np.array([_anchor[1] - _reference_host_ns for _anchor in self._anchors], dtype=np.float64)
+
+        _slope = self.slope
+        if _device.size >= 2 and np.ptp(_device) > 0:
+            # Least squares drift, then offset at the anchor received with the smallest delay
+            _device_mean = _device.mean()
+            _fitted_slope = float(np.dot(_device - _device_mean, _host - _host.mean()) /
+                                  np.dot(_device - _device_mean, _device - _device_mean))
+            if _fitted_slope > 0:
+                _slope = _fitted_slope
+        if _slope is None:
+            # Counter period still unknown: anchor only
+            self.reference_device = _reference_device
+            self.reference_host_ns = _reference_host_ns
+            return True
+
+        _offset = float(np.min(_host - _slope * _device))
+        self.slope = _slope
+        self.reference_device = _reference_device
+        self.reference_host_ns = _reference_host_ns + int(round(_offset))
+        return True
+
+    def is_fitted(self):
+        """Check if the device counter period is known (fitted or nominal) and anchored"""
+        return self.slope is not None and self.reference_device is not None
+
+    def to_host_ns(self, device_timestamps):
+        """
+        Convert unwrapped device timestamps to host times.
+
+        Args:
+            device_timestamps (array-like): Unwrapped device timestamps
+
+        Returns:
+            numpy.ndarray: int64 host times in ns. Until the counter period is known,
+                           every sample gets the time of the last anchor (or now)
+        """
+        _device = np.asarray(device_timestamps, dtype=np.int64)
+        if not self.is_fitted():
+            _host_ns = self.reference_host_ns if self.reference_host_ns is not None else time.time_ns()
+            return np.full(_device.shape, _host_ns, dtype=np.int64)
+        _offset = np.rint((_device - self.reference_device) * self.slope).astype(np.int64)
+        return self.reference_host_ns + _offset
+
+    def get_status(self):
+        """
+        Get the mapping parameters.
+
+        Returns:
+            dict: Number of anchors, counter period (ns) and reference point
+        """
+        return {
+            'anchors': len(self._anchors),
+            'tick_ns': self.slope,
+            'reference_device': self.reference_device,
+            'reference_host_ns': self.reference_host_ns,
+        }